@@ -2,14 +2,31 @@
 #Lee Jia Yu - S10256965 - CSF01 - P06
 
 import os
+import re
+import dbm
 import csv
+import json
+import gzip
+import asyncio
+import sqlite3
+import getpass
 import requests
 from requests.exceptions import HTTPError
 import shelve 
+import heapq
+import argparse
+from array import array
+from itertools import compress
+from contextlib import closing
+import carpark_database as cpdb
+import carpark_filter as cpf
+import carpark_coordinates as cpc
+import carpark_fuzzy as cpz
+import carpark_cache as cpq
 
 MENU_DESCRIPTIONS = ["Exit",
-                     "Display Total Number of Carparks in 'carpark-information.csv'",
-                     "Display All Basement Carparks in 'carpark-information.csv'",
+                     "Display Total Number of Carparks in 'carpark-information-full.csv'",
+                     "Display All Basement Carparks in 'carpark-information-full.csv'",
                      "Read Carpark Availability Data File",
                      "Print Total Number of Carparks in the File Read in [3]",
                      "Display Carparks Without Available Lots",
@@ -22,13 +39,24 @@ MENU_DESCRIPTIONS = ["Exit",
                      "Display all information about Favourite Carparks",
                      "Add Favourite Carpark",
                      "Remove Favourite Carpark",
-                     "Display all information about Carparks nearest to the Address"]
+                     "Display all information about Carparks nearest to the Address",
+                     "Set Alert Threshold for a Favourite Carpark",
+                     "Watch Favourite Carparks for Threshold Alerts",
+                     "Display all information about Carparks matching a Filter"]
 
 USER_FOLDER_FILE_PATH = os.path.relpath("user")
 USER_DATA_FILE_PATH = os.path.relpath("user/data")
+USER_FAVOURITES_FILE_PATH = os.path.relpath("user/favourites.db")
 
 API_URL = "https://api.data.gov.sg/v1/transport/carpark-availability"
 
+BASIC_INFORMATION_HEADERS = ["Carpark Number", "Carpark Type", "Type of Parking System", "Address"]
+NEAREST_CARPARKS_LIMIT = 10
+AVAILABILITY_HEADERS = ["Carpark Number", "Total Lots", "Lots Available"]
+QUARANTINE_FILE_NAME = "carpark-availability-quarantine.csv"
+CATEGORICAL_HEADERS = ["Carpark Type", "Type of Parking System", "Shorterm Parking", "Free Parking", 
+                       "Night Parking", "Carpark Basement"]
+
 def generate_menu(menu_description):
     """ 
     Return the formatted main menu with option numbers.
@@ -97,6 +125,23 @@ def get_percentage():
             return float(percentage)
         print("Invalid percentage, please enter a valid number between 0 and 100")
 
+def get_whole_number(prompt, minimum=0):
+    """
+    Returns the whole number given by the user.
+
+        Parameters:
+            prompt (str): The message shown to the user
+            minimum (int): The smallest number accepted
+
+        Returns:
+            number (int): The whole number that the user has choosen
+    """
+    while True:
+        number = input(prompt)
+        if number.isdigit() and int(number) >= minimum:
+            return int(number)
+        print(f"Invalid number, please enter a whole number of at least {minimum}")
+
 def continue_hold():
     #Ask the user to 'Enter' to continue the next iteration of the main loop.
     input("Enter to continue: ")
@@ -114,6 +159,12 @@ def calculate_percentage(total_lots, lots_available):
     """
     return round(lots_available/total_lots * 100, 1) 
 
+def format_percentage(total_lots, lots_available):
+    #Returns the percentage of lots available as text, "0.0" if there are no lots
+    if lots_available == 0 or total_lots == 0:
+        return "0.0"
+    return str(calculate_percentage(total_lots, lots_available))
+
 def get_total_number(data_list):
     #Returns the length of a list
     return len(data_list)
@@ -133,12 +184,7 @@ def append_percentages(carpark_availability):
             carpark_availability (list[dict]): With the percentage of available lots
     """
     for carpark in carpark_availability:
-        total_lots = int(carpark["Total Lots"])
-        lots_available = int(carpark["Lots Available"])
-        if lots_available == 0:
-            carpark["Percentage"] = "0.0"
-        else:
-            carpark["Percentage"] = str(calculate_percentage(total_lots, lots_available)) 
+        carpark["Percentage"] = format_percentage(int(carpark["Total Lots"]), int(carpark["Lots Available"]))
     return carpark_availability
 
 def append_addresses(carpark_availability, carpark_information):
@@ -147,16 +193,15 @@ def append_addresses(carpark_availability, carpark_information):
 
         Parameters:
             carpark_availability (list[dict]): The list of carparks from 'carpark-availability-vX.csv'
-            carpark_information (list[dict]): The list of carparks from 'carpark-information.csv'
+            carpark_information (list[dict]): The list of carparks from the carpark registry
         
         Returns:
             carpark_availability (list[dict]): With the addresses from carpark_information
     """
+    carpark_numbers = {carpark_i["Carpark Number"]: carpark_i for carpark_i in carpark_information}
     for carpark_a in carpark_availability:
-        carpark_a["Address"] = ""
-        for carpark_i in carpark_information:
-            if carpark_i["Carpark Number"] == carpark_a["Carpark Number"]:
-                carpark_a["Address"] = carpark_i["Address"]
+        carpark_i = carpark_numbers.get(carpark_a["Carpark Number"])
+        carpark_a["Address"] = carpark_i["Address"] if carpark_i else ""
     return carpark_availability
 
 def get_carpark_information(file_name):
@@ -195,25 +240,121 @@ def get_carpark_information(file_name):
         print(f"'{file_name}' was successfully read.")
         return carpark_information
 
-def display_total_number_of_carpark_information(file_name, carpark_information):
+def load_carpark_registry(file_name):
+    """
+    Returns the carpark registry, the full carpark information loaded once for every option to share
+
+        Parameters: 
+            file_name (str): The name of the full carpark information file
+
+        Returns: 
+            carpark_registry (dict): The file name, the list of carparks and the carparks by their carpark number
+    """
+    carpark_information = get_carpark_information(file_name)
+    if carpark_information is None:
+        return None
+    return {"File Name": file_name,
+            "Version": cpc.get_registry_version(file_name),
+            "Carpark Information": carpark_information,
+            "Carpark Numbers": {carpark["Carpark Number"]: carpark for carpark in carpark_information},
+            "Carpark Categories": encode_categories(carpark_information, CATEGORICAL_HEADERS)}
+
+def encode_categories(carpark_information, headers):
+    """
+    Dictionary encode the columns that only hold a few distinct values. Each column gets a lookup table of
+    its values and an array of small integer codes, one per carpark. The rows are given the one shared 
+    string of each value instead of a fresh string per row.
+
+        Parameters: 
+            carpark_information (list[dict]): The list of carparks, updated in place
+            headers (list): The headers of the columns to encode
+
+        Returns: 
+            carpark_categories (dict{dict}): The headers mapped to their "Values" (list), "Lookup" (dict of 
+            value to code) and "Codes" (array of the code of each carpark)
+    """
+    carpark_categories = {}
+    for header in headers:
+        values = []
+        lookup = {}
+        codes = []
+        for carpark in carpark_information:
+            value = carpark.get(header, "")
+            code = lookup.get(value)
+            if code is None:
+                code = len(values)
+                lookup[value] = code
+                values.append(value)
+            carpark[header] = values[code]
+            codes.append(code)
+        typecode = "B" if len(values) <= 256 else "H"
+        carpark_categories[header] = {"Values": values, "Lookup": lookup, "Codes": array(typecode, codes)}
+    return carpark_categories
+
+def select_carparks_by_category(carpark_information, carpark_categories, header, value):
+    """
+    Returns the carparks whose encoded column equals value, comparing integer codes instead of strings
+
+        Parameters: 
+            carpark_information (list[dict]): The list of carparks that carpark_categories was encoded from
+            carpark_categories (dict{dict}): The encoded columns of carpark_information
+            header (str): The header of the encoded column
+            value (str): The value that is selected
+
+        Returns: 
+            carparks (list[dict]): The carparks with the value
+    """
+    category = carpark_categories[header]
+    code = category["Lookup"].get(value)
+    if code is None:
+        return []
+    codes = category["Codes"]
+    if codes.typecode == "B":
+        #Translate every code byte at once into a 1 (selected) or 0 (not selected) mask
+        mask = codes.tobytes().translate(bytes(int(byte == code) for byte in range(256)))
+    else:
+        mask = [carpark_code == code for carpark_code in codes]
+    return list(compress(carpark_information, mask))
+
+def get_basic_carpark_information(carpark_registry):
+    """
+    Returns the basic view of the registry used by options 1 to 10. The rows are shared with the
+    full view instead of copied, options 1 to 10 only read the BASIC_INFORMATION_HEADERS of each row.
+
+        Parameters: 
+            carpark_registry (dict): The carpark registry
+
+        Returns: 
+            carpark_information (list[dict]): The list of carparks in the registry
+    """
+    return carpark_registry["Carpark Information"]
+
+def display_total_number_of_carpark_information(file_name, carpark_information, carpark_database=None):
     """
     Option 1: Prints the total number of carparks in carpark_information
 
         Parameters:
             file_name (str): The name of the carpark information file 
             carpark_information (list[dict]): The list of carparks from the carpark information file
+            carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
 
         Returns:
             None 
     """
-    print(f"Total Number of carparks in '{file_name}': {get_total_number(carpark_information)}")
+    if carpark_database:
+        total_number = cpdb.count_carpark_information(carpark_database)
+    else:
+        total_number = get_total_number(carpark_information)
+    print(f"Total Number of carparks in '{file_name}': {total_number}")
 
-def display_basement_carparks(carpark_information):
+def display_basement_carparks(carpark_information, carpark_database=None, carpark_categories=None):
     """
     Option 2: Prints information about the 'BASEMENT CAR PARK's
 
         Parameters: 
             carpark_information (list[dict]): The list of carparks from the carpark information file
+            carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+            carpark_categories (dict{dict}): The encoded columns of carpark_information, if they have been encoded
 
         Returns: 
             None
@@ -225,14 +366,175 @@ def display_basement_carparks(carpark_information):
 
     print(generate_line(headers, spacings, alignments))
 
-    for carpark in carpark_information:
-        if carpark["Carpark Type"] == "BASEMENT CAR PARK":
-            values = [carpark[header] for header in headers]
-            print(generate_line(values, spacings, alignments))
-            total_number += 1
+    if carpark_database:
+        basement_carparks = cpdb.query_carparks_by_type(carpark_database, "BASEMENT CAR PARK")
+    elif carpark_categories:
+        basement_carparks = select_carparks_by_category(carpark_information, carpark_categories, 
+                                                        "Carpark Type", "BASEMENT CAR PARK")
+    else:
+        basement_carparks = [carpark for carpark in carpark_information if carpark["Carpark Type"] == "BASEMENT CAR PARK"]
+
+    for carpark in basement_carparks:
+        values = [carpark[header] for header in headers]
+        print(generate_line(values, spacings, alignments))
+        total_number += 1
     
     print(f"Total Number: {total_number}")
 
+def compile_row_pattern(headers):
+    """
+    Returns the pattern that a valid row of a carpark availability file fully matches: the right number of
+    fields, a carpark number and whole numbers of lots
+
+    Parameters: 
+        headers (list): The headers of the carpark availability file
+
+    Returns: 
+        row_pattern (re.Pattern): The compiled pattern of a valid row
+    """
+    fields = []
+    for header in headers:
+        if header == "Carpark Number":
+            fields.append(r"\s*[^,\s][^,]*")
+        elif header in ("Total Lots", "Lots Available"):
+            fields.append(r"\s*\d+\s*")
+        else:
+            fields.append(r"[^,]*")
+    return re.compile(",".join(fields))
+
+def diagnose_row(values, headers):
+    #Returns why a row that does not match the row pattern is invalid
+    if len(values) != len(headers):
+        return f"Expected {len(headers)} fields, found {len(values)}"
+    for header, value in zip(headers, values):
+        if header == "Carpark Number" and not value.strip():
+            return "Missing Carpark Number"
+        if header in ("Total Lots", "Lots Available") and not value.strip().isdigit():
+            return f"{header} '{value}' is not a whole number"
+    return "Invalid row"
+
+def read_availability_headers(carpark_availability_file):
+    """
+    Reads the timestamp and headers at the top of an open 'carpark-availability-vX.csv' file
+
+    Parameters: 
+        carpark_availability_file (file): The open carpark availability file
+
+    Returns: 
+        timestamp (str): The timestamp of when the carpark availability file was created
+        headers (list): The headers of the rows
+    """
+    timestamp = carpark_availability_file.readline().strip("\n").rstrip(",")
+    headers = [header.strip() for header in carpark_availability_file.readline().strip("\n").split(",")]
+    missing_headers = [header for header in AVAILABILITY_HEADERS if header not in headers]
+    if missing_headers:
+        raise ValueError(f"should contain the {', '.join(missing_headers)} of each carpark")
+    return timestamp, headers
+
+def iterate_availability_rows(carpark_availability_file, headers, reject=None):
+    """
+    Yields the valid rows of an open carpark availability file one at a time. Every row is matched against
+    one compiled pattern, rows that do not match (or have 0 Total Lots) are left out instead of failing later.
+
+    Parameters: 
+        carpark_availability_file (file): The open carpark availability file, after its headers are read
+        headers (list): The headers of the rows
+        reject (function): Called with a dict of the Line, Reason and Row of each left out row, if given
+
+    Yields: 
+        carpark (dict): The headers mapped to the values of a valid row
+    """
+    total_lots_index = headers.index("Total Lots")
+    row_match = compile_row_pattern(headers).fullmatch
+    for line_number, line in enumerate(carpark_availability_file, start=3):
+        line = line.strip("\n")
+        if row_match(line):
+            values = [value.strip() for value in line.split(",")]
+            if values[total_lots_index].lstrip("0"):
+                yield dict(zip(headers, values))
+                continue
+            reason = "Total Lots is 0"
+        elif not line.strip():
+            continue
+        else:
+            reason = diagnose_row(line.split(","), headers)
+        if reject is not None:
+            reject({"Line": line_number, "Reason": reason, "Row": line})
+
+def open_availability_file(file_name):
+    #Opens a carpark availability file to read as text, gzip compressed if its name ends with '.gz'
+    if file_name.endswith(".gz"):
+        return gzip.open(file_name, "rt")
+    return open(file_name, "r")
+
+def read_carpark_availability(file_name, quarantine=None):
+    """
+    Returns the carpark availability and timestamp in a 'carpark-availability-vX.csv' file, leaving out
+    the invalid rows
+
+    Parameters: 
+        file_name (str): The name of the carpark availability file, gzip compressed if it ends with '.gz'
+        quarantine (list): The left out rows are appended to it as dicts of their Line, Reason and Row, if given
+
+    Returns: 
+        carpark_availablility (list[dict]): The carpark availability list from the file
+        timestamp (str): The timestamp of when the carpark availability file was created
+    """
+    with open_availability_file(file_name) as carpark_availability_file:
+        timestamp, headers = read_availability_headers(carpark_availability_file)
+        carpark_availability = list(iterate_availability_rows(carpark_availability_file, headers, 
+                                                              quarantine.append if quarantine is not None else None))
+    return carpark_availability, timestamp
+
+def describe_file_error(file_name, err):
+    #Returns why a carpark availability file could not be read, from the error raised while reading it
+    if isinstance(err, FileNotFoundError):
+        return f"Invalid file name, '{file_name}' is not found, make sure that it is within the same directory."
+    if isinstance(err, ValueError):
+        return f"Invalid file name, '{file_name}' {err}."
+    return f"Invalid file name, '{file_name}' could not be read, {err.strerror or err}."
+
+def load_availability_snapshot(url, file_name=None):
+    """
+    Returns one carpark availability snapshot by carpark number, from the API or from a 
+    'carpark-availability-vX.csv' file. Raises OSError or ValueError if the file cannot be read.
+
+    Parameters: 
+        url (str): The URL of the API to the carpark lots availability endpoint
+        file_name (str): The name of the carpark availability file, the API is requested if None
+
+    Returns: 
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available,
+        None if the request failed
+        timestamp (str): The timestamp of the snapshot, in the form of the first line of an availability file
+    """
+    if file_name is None:
+        snapshot = request_availability_snapshot(url)
+        if snapshot is None:
+            return None, ""
+        return parse_availability(snapshot), f"Timestamp: {snapshot.get('timestamp')}"
+    carpark_availability, timestamp = read_carpark_availability(file_name)
+    return {availability_carpark["Carpark Number"]: availability_carpark
+            for availability_carpark in carpark_availability}, timestamp
+
+def write_quarantine_report(quarantine, file_name, cpa_file_name):
+    """
+    Write the rows left out of a carpark availability file to a report
+
+    Parameters: 
+        quarantine (list[dict]): The Line, Reason and Row of each row left out
+        file_name (str): The name of the report file
+        cpa_file_name (str): The name of the carpark availability file that was read
+
+    Returns: 
+        None
+    """
+    with open(file_name, "w", newline='') as quarantine_file:
+        quarantine_file.write(f"Source: {cpa_file_name}\n")
+        writer = csv.DictWriter(quarantine_file, fieldnames=["Line", "Reason", "Row"])
+        writer.writeheader()
+        writer.writerows(quarantine)
+
 def get_carpark_availability_display_timestamp():
     """
     Option 3: Prompts and returns the carpark-availability from the users input
@@ -244,59 +546,68 @@ def get_carpark_availability_display_timestamp():
         carpark_availablility (list[dict]): The carpark availability list from the file
         timestamp (str): The timestamp of when the carpark availability file was created
     """
-    carpark_availability = []
     while True: 
         cpa_file_name = input("Enter file name: ") 
+        quarantine = []
         try: 
-            with open(cpa_file_name, "r") as carpark_availability_file:
-                timestamp = carpark_availability_file.readline().strip("\n")
-                headers = carpark_availability_file.readline().strip("\n").split(",")
-                assert "Total Lots" in headers
-                for line in carpark_availability_file:
-                    line = line.strip("\n").split(",")
-                    carpark = dict(zip(headers, line))
-                    carpark_availability.append(carpark)
-        except FileNotFoundError:
-            print(f"Invalid file name, '{cpa_file_name}' is not found, make sure that it is within the same directory.")
-        except AssertionError: 
-            print(f"Invalid file name, '{cpa_file_name}' should contain the Total Lots at a carpark.")
-        except Exception as err: 
-            print(f"Error occurred: {err}")
+            carpark_availability, timestamp = read_carpark_availability(cpa_file_name, quarantine)
+        except (OSError, ValueError) as err:
+            print(describe_file_error(cpa_file_name, err))
         else:
             print(f"'{cpa_file_name}' was successfully read.")
+            if quarantine:
+                write_quarantine_report(quarantine, QUARANTINE_FILE_NAME, cpa_file_name)
+                print(f"{len(quarantine)} invalid rows were left out, see '{QUARANTINE_FILE_NAME}'")
             print(timestamp)
             return carpark_availability, timestamp
 
-def display_total_number_of_carpark_availability(carpark_availability):
+def display_total_number_of_carpark_availability(carpark_availability, carpark_database=None, snapshot_id=None):
     """
     Option 4: Prints the total number of carparks in the carpark_availability list
 
     Parameters: 
         carpark_availability (list[dict]): The carpark availability list from the file
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+        snapshot_id (int): The availability snapshot in the carpark database
 
     Returns: 
         None
     """
-    print(f"Total Number of Carparks in the File: {get_total_number(carpark_availability)}")
+    if carpark_database:
+        total_number = cpdb.count_carpark_availability(carpark_database, snapshot_id)
+    else:
+        total_number = get_total_number(carpark_availability)
+    print(f"Total Number of Carparks in the File: {total_number}")
 
-def display_carpark_without_lots(carpark_availability):
+def display_carpark_without_lots(carpark_availability, carpark_database=None, snapshot_id=None):
     """
     Option 5: Prints the carpark numbers with 0 lots available
 
     Parameters: 
         carpark_availability (list[dict]): The carpark availability list from the file
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+        snapshot_id (int): The availability snapshot in the carpark database
 
     Returns: 
         None
     """
     total_number = 0
+    if carpark_database:
+        carpark_availability = cpdb.query_carparks_without_lots(carpark_database, snapshot_id)
     for carpark in carpark_availability:
         if int(carpark["Lots Available"]) == 0:
             print(f"Carpark Number: {carpark["Carpark Number"]}")
             total_number += 1
     print(f"Total Number: {total_number}")
 
-def display_carpark_with_x_available_lots(carpark_availability, with_address = False):
+def find_carparks_above_percentage(carpark_availability, percentage, carpark_database=None, snapshot_id=None):
+    #Returns the carparks with an availability percentage over percentage
+    if carpark_database:
+        return cpdb.query_carparks_above_percentage(carpark_database, snapshot_id, percentage)
+    return [carpark for carpark in carpark_availability if float(carpark["Percentage"]) > percentage]
+
+def display_carpark_with_x_available_lots(carpark_availability, with_address = False, 
+                                          carpark_database=None, snapshot_id=None, query_cache=None):
     """
     Option 6 & 7: Prompts and prints information (w & w/o address) about the carparks that have 
     availability percentage over the users requirement. 
@@ -304,6 +615,9 @@ def display_carpark_with_x_available_lots(carpark_availability, with_address = F
     Parameters: 
         carpark_availability (list[dict]): The carpark availability list from the file
         with_address (bool): Whether the address should be displayed
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+        snapshot_id (int): The availability snapshot in the carpark database
+        query_cache (dict): The cache of query results, if given
 
     Returns: 
         None
@@ -320,23 +634,44 @@ def display_carpark_with_x_available_lots(carpark_availability, with_address = F
         alignments += "<"
 
     percentage = get_percentage()
+    carparks_above_percentage = cpq.get_cached_result(
+        query_cache, "above_percentage", (percentage,), (cpq.REGISTRY_SOURCE, cpq.FILE_SOURCE),
+        lambda: find_carparks_above_percentage(carpark_availability, percentage, carpark_database, snapshot_id))
 
     print(generate_line(headers, spacing, alignments))
-    for carpark in carpark_availability:
-        if float(carpark["Percentage"]) > percentage:
-            line_data = [carpark[header] for header in headers]
-            print(generate_line(line_data, spacing, alignments))
-            total_number += 1
+    for carpark in carparks_above_percentage:
+        line_data = [carpark[header] for header in headers]
+        print(generate_line(line_data, spacing, alignments))
+        total_number += 1
     
     print(f"Total Number: {total_number}")
 
-def display_carpark_at_address(carpark_availability):
+def find_carparks_at_location(carpark_availability, location, carpark_database=None, snapshot_id=None):
+    #Returns the carparks whose address contains the location
+    if carpark_database:
+        return cpdb.query_carparks_at_address(carpark_database, snapshot_id, location)
+    return [carpark for carpark in carpark_availability if location.lower() in carpark["Address"].lower()]
+
+def display_address_suggestions(load_fuzzy_index, location):
+    #Prints the addresses that nearly match the location, load_fuzzy_index returns the fuzzy address index
+    suggestions = cpz.search_addresses(load_fuzzy_index(), location) if load_fuzzy_index else []
+    if suggestions:
+        print("Did you mean:")
+        for suggestion in suggestions:
+            print(f"  {suggestion}")
+
+def display_carpark_at_address(carpark_availability, carpark_database=None, snapshot_id=None, load_fuzzy_index=None, 
+                               query_cache=None):
     """
     Option 8: Prompts and prints information about the carparks that are at the users given
-    location. 
+    location. A location with a typo is corrected with the fuzzy address index.
  
     Parameters: 
         carpark_availability (list[dict]): The carpark availability list from the file
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+        snapshot_id (int): The availability snapshot in the carpark database
+        load_fuzzy_index (function): Returns the fuzzy address index used to correct typos, if given
+        query_cache (dict): The cache of query results, if given
 
     Returns: 
         None   
@@ -347,29 +682,43 @@ def display_carpark_at_address(carpark_availability):
     spacing = [14, 10, 14, 10, 7]
     alignments = "<>>><"
 
+    def find_cached_carparks_at_location(location):
+        return cpq.get_cached_result(
+            query_cache, "at_location", (location.lower(),), (cpq.REGISTRY_SOURCE, cpq.FILE_SOURCE),
+            lambda: find_carparks_at_location(carpark_availability, location, carpark_database, snapshot_id))
+
     location = input("Enter the location: ")
+    carparks_at_location = find_cached_carparks_at_location(location)
+    if not carparks_at_location and load_fuzzy_index:
+        corrected_location = cpz.correct_query(load_fuzzy_index(), location)
+        if corrected_location:
+            carparks_at_location = find_cached_carparks_at_location(corrected_location)
+            if carparks_at_location:
+                print(f"No carparks found in {location}, showing carparks in {corrected_location}")
 
     output = generate_line(headers, spacing, alignments) + "\n"
-    for carpark in carpark_availability:
-        if location.lower() in carpark["Address"].lower():
-            line_data = []
-            for header in headers:
-                line_data.append(carpark[header])
-            output += generate_line(line_data, spacing, alignments) + "\n"
-            total_number += 1
+    for carpark in carparks_at_location:
+        line_data = []
+        for header in headers:
+            line_data.append(carpark[header])
+        output += generate_line(line_data, spacing, alignments) + "\n"
+        total_number += 1
 
     if total_number > 0:
         print(output)
         print(f"Total Number: {total_number}")
     else:
         print(f"No carparks found in {location}")
+        display_address_suggestions(load_fuzzy_index, location)
 
-def display_carpark_with_most_lots(carpark_availability):
+def display_carpark_with_most_lots(carpark_availability, carpark_database=None, snapshot_id=None):
     """
     Option 9: Prints information about the carpark with the most total lots
 
         Parameters: 
             carpark_availability (list[dict]): The carpark availability list from the file
+            carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+            snapshot_id (int): The availability snapshot in the carpark database
 
         Returns: 
             None   
@@ -379,6 +728,12 @@ def display_carpark_with_most_lots(carpark_availability):
     most_lots = 0
     most_lots_index = 0
 
+    if carpark_database:
+        carpark_availability = cpdb.query_carpark_with_most_lots(carpark_database, snapshot_id)
+    if not carpark_availability:
+        print("No carparks found in the carpark availability")
+        return
+
     for index, carpark in enumerate(carpark_availability):
         total_lots = int(carpark["Total Lots"])
         if total_lots > most_lots:
@@ -388,13 +743,15 @@ def display_carpark_with_most_lots(carpark_availability):
     for header in headers:
         print(f"{header}: {carpark_availability[most_lots_index][header]}")
 
-def write_carpark_availability_address(carpark_availability, timestamp):
+def write_carpark_availability_address(carpark_availability, timestamp, carpark_database=None, snapshot_id=None):
     """
     Option 10: Writes the carpark_availability list with the addresses from carpark_information
 
     Parameters: 
         carpark_availability (list[dict]): The carpark availability list from the file
         timestamp (str): The timestamp from the carpark_availability file
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+        snapshot_id (int): The availability snapshot in the carpark database
 
     Returns: 
         None   
@@ -403,8 +760,11 @@ def write_carpark_availability_address(carpark_availability, timestamp):
     headers = ["Carpark Number", "Total Lots", "Lots Available", "Address"]
     cpaa_file_name = "carpark-availability-with-address.csv"
 
-    carpark_availability_sorted = list(sorted(carpark_availability, \
-                                              key=lambda carpark: int(carpark["Lots Available"])))
+    if carpark_database:
+        carpark_availability_sorted = cpdb.query_carparks_by_lots_available(carpark_database, snapshot_id)
+    else:
+        carpark_availability_sorted = list(sorted(carpark_availability, \
+                                                  key=lambda carpark: int(carpark["Lots Available"])))
 
     if is_existing_file(cpaa_file_name):
         print(f"Invalid option, '{cpaa_file_name}' already exists in the directory.")
@@ -421,7 +781,118 @@ def write_carpark_availability_address(carpark_availability, timestamp):
 
     print(f"{no_of_lines} lines were written to '{cpaa_file_name}'")
 
-def display_favourite_carparks(carpark_information, url, option, user_data):
+def get_user_name():
+    """
+    Returns the name of the user whose Favourites are used, from $CARPARK_USER or the login name
+
+    Parameters: 
+        None
+
+    Returns: 
+        user_name (str): The name of the user
+    """
+    user_name = os.environ.get("CARPARK_USER")
+    if user_name:
+        return user_name
+    try:
+        return getpass.getuser()
+    except (OSError, KeyError):
+        #There is no login name in the environment and the user id has no password database entry
+        return "default"
+
+def open_favourites_store(file_name):
+    """
+    Open (and create if needed) the SQLite database that stores every user's Favourites.
+    WAL mode lets many processes read while one writes, and each change is a single row.
+
+    Parameters: 
+        file_name (str): The path of the SQLite database file
+
+    Returns: 
+        favourites_store (sqlite3.Connection): The connection to the database
+    """
+    favourites_store = sqlite3.connect(file_name, timeout=30)
+    favourites_store.execute("PRAGMA journal_mode=WAL")
+    favourites_store.execute("PRAGMA synchronous=NORMAL")
+    with favourites_store:
+        favourites_store.execute("""CREATE TABLE IF NOT EXISTS favourites (
+                                        user_name TEXT NOT NULL,
+                                        carpark_number TEXT NOT NULL,
+                                        threshold INTEGER,
+                                        UNIQUE (user_name, carpark_number))""")
+        favourites_store.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)")
+    return favourites_store
+
+def migrate_shelf_favourites(favourites_store, shelf_file_name, user_name):
+    """
+    Copy the Favourites (and thresholds) in the old shelf file to user_name, only once per store. A missing
+    shelf has nothing to copy, any other error reading the shelf is raised without recording the migration
+    so it is tried again.
+
+    Parameters: 
+        favourites_store (sqlite3.Connection): The database that stores the Favourited carparks
+        shelf_file_name (str): The path of the old shelf file
+        user_name (str): The user that the old Favourites are given to
+
+    Returns: 
+        migrated (int): The number of Favourited carparks copied from the shelf
+    """
+    try:
+        with shelve.open(shelf_file_name, flag="r") as user_data:
+            favourite_carparks = list(user_data.get("Favourite Carparks", []))
+            favourite_thresholds = dict(user_data.get("Favourite Thresholds", {}))
+    except dbm.error[0]:
+        if dbm.whichdb(shelf_file_name) is not None:
+            raise
+        favourite_carparks = []
+        favourite_thresholds = {}
+
+    with favourites_store:
+        favourites_store.execute("BEGIN IMMEDIATE")
+        if favourites_store.execute("SELECT 1 FROM migrations WHERE name = 'shelf'").fetchone():
+            return 0
+        favourites_store.executemany("INSERT OR IGNORE INTO favourites (user_name, carpark_number, threshold) "
+                                     "VALUES (?, ?, ?)",
+                                     [(user_name, carpark_number, favourite_thresholds.get(carpark_number)) 
+                                      for carpark_number in favourite_carparks])
+        favourites_store.execute("INSERT INTO migrations (name) VALUES ('shelf')")
+    return len(favourite_carparks)
+
+def get_favourite_carparks(favourites_store, user_name):
+    #Returns the user's Favourited carpark numbers in the order they were added
+    rows = favourites_store.execute("SELECT carpark_number FROM favourites WHERE user_name = ? ORDER BY rowid", 
+                                    (user_name,))
+    return [carpark_number for (carpark_number,) in rows]
+
+def get_favourite_thresholds(favourites_store, user_name):
+    #Returns the user's Favourited carpark numbers mapped to their alert thresholds
+    rows = favourites_store.execute("SELECT carpark_number, threshold FROM favourites "
+                                    "WHERE user_name = ? AND threshold IS NOT NULL ORDER BY rowid", (user_name,))
+    return dict(rows.fetchall())
+
+def add_favourite(favourites_store, user_name, carpark_number):
+    #Adds one Favourited carpark, returns False if it was already a Favourite
+    with favourites_store:
+        cursor = favourites_store.execute("INSERT OR IGNORE INTO favourites (user_name, carpark_number) VALUES (?, ?)", 
+                                          (user_name, carpark_number))
+    return cursor.rowcount == 1
+
+def remove_favourite(favourites_store, user_name, carpark_number):
+    #Removes one Favourited carpark, returns False if it was not a Favourite
+    with favourites_store:
+        cursor = favourites_store.execute("DELETE FROM favourites WHERE user_name = ? AND carpark_number = ?", 
+                                          (user_name, carpark_number))
+    return cursor.rowcount == 1
+
+def set_favourite_threshold(favourites_store, user_name, carpark_number, threshold):
+    #Sets the alert threshold of one Favourited carpark, returns False if it is not a Favourite
+    with favourites_store:
+        cursor = favourites_store.execute("UPDATE favourites SET threshold = ? WHERE user_name = ? AND carpark_number = ?", 
+                                          (threshold, user_name, carpark_number))
+    return cursor.rowcount == 1
+
+def display_favourite_carparks(carpark_information, url, option, favourites_store, user_name, carpark_database=None, 
+                               query_cache=None):
     """
     Option 12: Displays information about the carparks that have been stored as Favourites
 
@@ -429,7 +900,11 @@ def display_favourite_carparks(carpark_information, url, option, user_data):
         carpark_information (list[dict]): The full carpark availability list
         url (str): The url of the API used to get the carpark's lot availability
         option (int): The option choosen by the user
-        user_data (shelf object): A shelf object that stores the Favourited carparks
+        favourites_store (sqlite3.Connection): The database that stores the Favourited carparks
+        user_name (str): The user whose Favourited carparks are displayed
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+        query_cache (dict): The cache of query results, the results read from the API are dropped if it has a 
+        new snapshot
     
     Returns:
         None
@@ -438,15 +913,18 @@ def display_favourite_carparks(carpark_information, url, option, user_data):
     spacing = [14, 17, 25, 10, 14, 7]
     align = "<<<<<<"
 
-    favourite_carparks = user_data.get("Favourite Carparks") 
+    favourite_carparks = get_favourite_carparks(favourites_store, user_name)
     if not favourite_carparks: 
         print("You have not saved any carparks to your favourite.\n"
                 f"Add carparks to your favourite in option {option + 1}")
         return
 
-    carpark_availability = get_carpark_availability(url)
+    carpark_availability = get_carpark_availability(url, query_cache)
     if not carpark_availability:
         return
+
+    if carpark_database:
+        carpark_information = cpdb.query_carparks_by_number(carpark_database, favourite_carparks)
    
     print(generate_line(headers, spacing, align))
     for favouite_carpark in favourite_carparks:
@@ -457,15 +935,16 @@ def display_favourite_carparks(carpark_information, url, option, user_data):
                 line_data = [information_carpark.get(header, availability_carpark.get(header)) for header in headers]
                 print(generate_line(line_data, spacing, align))
 
-def get_carpark_availability(url):
+def request_availability_snapshot(url):
     """
-    Request the most recent carpark lots availability from the API and parse the results
+    Request the most recent carpark lots availability from the API, the response is decoded once
 
     Parameters: 
         url (str): The URL of the API to the carpark lots availability endpoint 
     
     Returns: 
-        parse_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+        snapshot (dict): The first item of the response, with its "timestamp" and "carpark_data", None if the
+        request failed
     """
     try:
         response = requests.get(url)
@@ -476,46 +955,70 @@ def get_carpark_availability(url):
         print(f'Other error occurred: {err}') 
     else:
         print("Success, Carpark Availability received.")
-        return parse_availability(response)
+        return response.json().get("items")[0]
 
-def parse_availability(response):
+def get_carpark_availability(url, query_cache=None):
     """
-    Parse the response from the API call to return a list of carparks with their total lots and availability
+    Request the most recent carpark lots availability from the API and parse the results
 
     Parameters: 
-        reponse (object): The response from a get request to an API 
+        url (str): The URL of the API to the carpark lots availability endpoint 
+        query_cache (dict): The cache of query results, the results read from the API are dropped if it has a 
+        new snapshot
+    
+    Returns: 
+        parse_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+    """
+    snapshot = request_availability_snapshot(url)
+    if snapshot is None:
+        return None
+    cpq.refresh_source(query_cache, cpq.API_SOURCE, snapshot.get("timestamp"))
+    return parse_availability(snapshot)
+
+def parse_availability(snapshot, carpark_numbers=None):
+    """
+    Parse a snapshot from the API to return a list of carparks with their total lots and availability
+
+    Parameters: 
+        snapshot (dict): The first item of the decoded API response
+        carpark_numbers (set): Only these carpark numbers are parsed, all carparks are parsed if None
     
     Returns:
         carpark_availability (dict{dict}): A dictionary of carpark numbers to a dictionary of their Total 
         Lots and Lots Available
     """
-    items = response.json().get("items")[0]
-    carpark_data = items.get("carpark_data")
+    carpark_data = snapshot.get("carpark_data")
     carpark_availability = {} 
     for carpark in carpark_data:
         carpark_number = carpark.get("carpark_number")
+        if carpark_numbers is not None and carpark_number not in carpark_numbers:
+            continue
         carpark_info = carpark.get("carpark_info")[0]
         carpark_availability[carpark_number] = {"Total Lots": carpark_info.get("total_lots"),
                                                 "Lots Available": carpark_info.get("lots_available")}
     return carpark_availability
 
-def add_favourite_carpark(carpark_information, user_data):
+def add_favourite_carpark(carpark_information, favourites_store, user_name, carpark_database=None):
     """
-    Option 13: Add a carpark to the Favourites dictionary 
+    Option 13: Add a carpark to the user's Favourites 
 
     Parameters: 
         carpark_information (list[dict]): The full carpark availability list
-        user_data (shelf object): A shelf object that stores the Favourited carparks
+        favourites_store (sqlite3.Connection): The database that stores the Favourited carparks
+        user_name (str): The user whose Favourites the carpark is added to
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
     
     Returns: 
-        user_data (shelf object): The shelf object that has a Favourited carpark added
+        None
     """
-    favourite_carparks = user_data.get("Favourite Carparks", [])
+    favourite_carparks = get_favourite_carparks(favourites_store, user_name)
 
     while True:
         is_valid_carpark = False
         msg = "Carpark does not exist"
         possible_carpark_number = input("Enter Carpark Number: ")
+        if carpark_database:
+            carpark_information = cpdb.query_carparks_by_number(carpark_database, [possible_carpark_number])
         for carpark in carpark_information:
             if possible_carpark_number == carpark.get("Carpark Number"):
                 if possible_carpark_number not in favourite_carparks:
@@ -527,23 +1030,22 @@ def add_favourite_carpark(carpark_information, user_data):
             break
         print(f"Invalid Carpark, {msg}")
     
-    favourite_carparks.append(possible_carpark_number)
-    user_data["Favourite Carparks"] = favourite_carparks
+    add_favourite(favourites_store, user_name, possible_carpark_number)
     print(f"Carpark: {possible_carpark_number} has been saved to the file")
-    return user_data
             
-def remove_favourite_carpark(user_data, option):
+def remove_favourite_carpark(favourites_store, user_name, option):
     """
-    Option 14: Remove a carpark from the Favourites dictionary 
+    Option 14: Remove a carpark from the user's Favourites 
 
     Parameters: 
-        user_data (shelf object): A shelf object that stores the Favourited carparks
+        favourites_store (sqlite3.Connection): The database that stores the Favourited carparks
+        user_name (str): The user whose Favourites the carpark is removed from
         option (int): The option that the user has choosen
     
     Returns: 
-        user_data (shelf object): The shelf object that has a Favourited carpark removed
+        None
     """
-    favourite_carparks = user_data.get("Favourite Carparks")
+    favourite_carparks = get_favourite_carparks(favourites_store, user_name)
 
     if not favourite_carparks:
         print("You have not added any carparks to your favourite\n"
@@ -560,10 +1062,8 @@ def remove_favourite_carpark(user_data, option):
             break
         print("Invalid Carpark, Carpark does not exist within Favourites")
 
-    favourite_carparks.remove(possible_carpark_number)
-    user_data["Favourite Carparks"] = favourite_carparks
+    remove_favourite(favourites_store, user_name, possible_carpark_number)
     print(f"Carpark: {possible_carpark_number} has been removed from the file")
-    return user_data
 
 def find_centre(nearby_carpark):
     """
@@ -617,66 +1117,374 @@ def calculate_distance_between_two_points(X1, Y1, X2, Y2):
     """
     return ((X2 - X1)**2 + (Y2 - Y1)**2)**0.5
 
-def display_nearest_carparks(carpark_information, url):
+def find_carparks_near_point(carpark_information, X_origin, Y_origin, limit):
+    """
+    Returns the carpark numbers of the carparks nearest to a SVY21 point
+
+    Parameters: 
+        carpark_information (list[dict]): The full list of carpark information
+        X_origin (float): The X coordinate of the point
+        Y_origin (float): The Y coordinate of the point
+        limit (int): The number of carparks returned, every carpark with coordinates if None
+
+    Returns: 
+        nearest_carparks (list[str]): The carpark numbers, nearest first
+    """
+    distances = []
+    for carpark in carpark_information:
+        try:
+            X, Y = float(carpark.get("X")), float(carpark.get("Y"))
+        except (TypeError, ValueError):
+            continue
+        distances.append((calculate_distance_between_two_points(X_origin, Y_origin, X, Y), carpark.get("Carpark Number")))
+    if limit is None:
+        return [carpark_number for _, carpark_number in sorted(distances)]
+    return [carpark_number for _, carpark_number in heapq.nsmallest(limit, distances)]
+
+def find_nearest_carparks(carpark_information, address, carpark_database=None, limit=NEAREST_CARPARKS_LIMIT):
+    """
+    Returns the carparks closest to the address given, or the carparks nearest to a latitude, longitude given
+
+    Parameters: 
+        carpark_information (list[dict]): The full list of carpark information
+        address (str): The address or latitude, longitude entered by the user
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+        limit (int): The most carparks returned for a latitude, longitude, every carpark if None
+
+    Returns: 
+        carpark_information (list[dict]): The information of the nearest carparks, or the full list
+        sorted_nearby_carparks (list[str]): The carpark numbers, nearest first, empty if the address is invalid
+    """
+    nearby_carparks = {} 
+    coordinate = cpc.parse_latitude_longitude(address)
+    if coordinate:
+        X_coordinates, Y_coordinates = cpc.convert_wgs84_to_svy21([coordinate[0]], [coordinate[1]])
+        if carpark_database:
+            carpark_information = cpdb.query_carparks_near_point(carpark_database, X_coordinates[0], 
+                                                                 Y_coordinates[0], -1 if limit is None else limit)
+            return carpark_information, [carpark.get("Carpark Number") for carpark in carpark_information]
+        return carpark_information, find_carparks_near_point(carpark_information, X_coordinates[0], 
+                                                             Y_coordinates[0], limit)
+    if carpark_database:
+        carpark_information = cpdb.query_nearest_carparks(carpark_database, address)
+        return carpark_information, [carpark.get("Carpark Number") for carpark in carpark_information]
+    for carpark in carpark_information:
+        if address.lower() in carpark.get("Address").lower():
+            try:
+                carpark_coordinate = {"X": float(carpark.get("X")),
+                                      "Y": float(carpark.get("Y"))}
+            except (TypeError, ValueError):
+                continue
+            nearby_carparks[carpark.get("Carpark Number")] = carpark_coordinate
+    if len(nearby_carparks) == 0:
+        return carpark_information, []
+    X_centre, Y_centre = find_centre(nearby_carparks)
+    sorted_nearby_carparks = sorted(nearby_carparks, 
+                                    key=lambda carpark_number: distance_from_centre(nearby_carparks, X_centre, Y_centre, carpark_number))
+    return carpark_information, sorted_nearby_carparks
+
+def display_nearest_carparks(carpark_information, url, carpark_database=None, load_fuzzy_index=None, query_cache=None,
+                             carpark_coordinates=None):
     """
-    Option 15: Display the list of carparks closest to the address given 
+    Option 15: Display the list of carparks closest to the address given, or the carparks nearest 
+    to a latitude, longitude given, with their latitude and longitude
 
     Parameters: 
         carpark_information (list[dict]): The full list of carpark information
         url (str): The API url to the most recent carpark lots availability 
+        carpark_database (sqlite3.Connection): The carpark database that is queried instead, if given
+        load_fuzzy_index (function): Returns the fuzzy address index used to suggest addresses, if given
+        query_cache (dict): The cache of query results, if given
+        carpark_coordinates (dict): The cached latitude, longitude of the registry, the nearest carparks are
+        converted if None
 
     Returns: 
         None  
     """
-    headers = ["Carpark Number", "Carpark Type", "Type of Parking System", "Total Lots", "Lots Available", "Address"]
-    spacing = [14, 29, 25, 10, 14, 7]
-    align = "<<<<<<"
-    nearby_carparks = {} 
+    headers = ["Carpark Number", "Carpark Type", "Type of Parking System", "Total Lots", "Lots Available", 
+               "Latitude", "Longitude", "Address"]
+    spacing = [14, 29, 25, 10, 14, 10, 11, 7]
+    align = "<<<<<>><"
 
     while True: 
-        address = input("Enter the address: ")
-        for carpark in carpark_information:
-            if address.lower() in carpark.get("Address").lower():
-                carpark_coordinate = {"X": float(carpark.get("X")),
-                                    "Y": float(carpark.get("Y"))}
-                nearby_carparks[carpark.get("Carpark Number")] = carpark_coordinate
-        if len(nearby_carparks) != 0:
+        address = input("Enter the address or latitude, longitude: ")
+        nearest_carpark_information, sorted_nearby_carparks = cpq.get_cached_result(
+            query_cache, "nearest", (address.lower(),), (cpq.REGISTRY_SOURCE,),
+            lambda: find_nearest_carparks(carpark_information, address, carpark_database))
+        if len(sorted_nearby_carparks) != 0:
             break
         print("Invalid Address, no carparks are at this location.")
+        display_address_suggestions(load_fuzzy_index, address)
 
-    X_centre, Y_centre = find_centre(nearby_carparks)
-
-    sorted_nearby_carparks = sorted(nearby_carparks, 
-                                    key=lambda carpark_number: distance_from_centre(nearby_carparks, X_centre, Y_centre, carpark_number))
-
-    carpark_availability = get_carpark_availability(url)
+    carpark_availability = get_carpark_availability(url, query_cache)
     if not carpark_availability:
         return
+    if carpark_coordinates is None:
+        carpark_coordinates = cpc.convert_carpark_coordinates(nearest_carpark_information)
    
     print(generate_line(headers, spacing, align))
     for nearby_carpark in sorted_nearby_carparks:
-        for information_carpark in carpark_information: 
+        for information_carpark in nearest_carpark_information: 
             carpark_number = information_carpark.get("Carpark Number")
             availability_carpark = carpark_availability.get(carpark_number)
             if carpark_number == nearby_carpark and availability_carpark: 
-                line_data = [information_carpark.get(header, availability_carpark.get(header)) for header in headers]
+                latitude, longitude = carpark_coordinates.get(carpark_number, ("", ""))
+                line_data = [information_carpark.get(header, availability_carpark.get(header)) for header in headers[:5]]
+                line_data += [str(latitude), str(longitude), information_carpark.get("Address")]
                 print(generate_line(line_data, spacing, align))
 
-def main():
+def set_favourite_carpark_threshold(favourites_store, user_name, option):
+    """
+    Option 16: Set the number of available lots at which a Favourite carpark raises an alert
+
+    Parameters: 
+        favourites_store (sqlite3.Connection): The database that stores the Favourited carparks and their thresholds
+        user_name (str): The user whose Favourite carpark threshold is set
+        option (int): The option choosen by the user
+
+    Returns: 
+        None
+    """
+    favourite_carparks = get_favourite_carparks(favourites_store, user_name)
+    if not favourite_carparks:
+        print("You have not added any carparks to your favourite\n"
+              f"Add carparks to your favourite in option {option - 3}")
+        return
+
+    while True:
+        possible_carpark_number = input("Enter Carpark Number: ")
+        if possible_carpark_number in favourite_carparks:
+            break
+        print("Invalid Carpark, Carpark does not exist within Favourites")
+
+    threshold = get_whole_number("Enter the lots available to alert at: ")
+    set_favourite_threshold(favourites_store, user_name, possible_carpark_number, threshold)
+    print(f"Carpark: {possible_carpark_number} will alert at {threshold} lots")
+
+def check_threshold_crossings(carpark_availability, favourite_thresholds, previous_states):
+    """
+    Compare a snapshot of the Favourite carparks against their thresholds 
+
+    Parameters: 
+        carpark_availability (dict{dict}): Dictionary of the Favourite carpark numbers to their Total Lots and Lots Available
+        favourite_thresholds (dict): Dictionary of carpark numbers to the lots available that raises an alert
+        previous_states (dict): Dictionary of carpark numbers to whether they were below their threshold, 
+        updated in place
+
+    Returns: 
+        alerts (list[dict]): The carparks that have crossed their threshold since the previous snapshot
+    """
+    alerts = []
+    for carpark_number, threshold in favourite_thresholds.items():
+        availability_carpark = carpark_availability.get(carpark_number)
+        if not availability_carpark:
+            continue
+        lots_available = int(availability_carpark.get("Lots Available"))
+        is_below = lots_available < threshold
+        was_below = previous_states.get(carpark_number)
+        previous_states[carpark_number] = is_below
+        if was_below is None or was_below == is_below:
+            continue
+        alerts.append({"Carpark Number": carpark_number,
+                       "Lots Available": lots_available,
+                       "Threshold": threshold,
+                       "Direction": "below" if is_below else "above"})
+    return alerts
+
+def send_alert(alert, webhook_url=None, session=requests):
+    """
+    Print an alert to stdout or POST it as JSON to a local webhook
+
+    Parameters: 
+        alert (dict): The carpark that has crossed its threshold
+        webhook_url (str): The URL of the webhook, the alert is printed if None
+        session (object): The requests session used to POST the alert
+
+    Returns: 
+        None
+    """
+    message = (f"ALERT: Carpark {alert['Carpark Number']} is {alert['Direction']} its threshold of "
+               f"{alert['Threshold']} lots with {alert['Lots Available']} lots available")
+    if not webhook_url:
+        print(message)
+        return
+    try:
+        response = session.post(webhook_url, data=json.dumps(alert), 
+                                 headers={"Content-Type": "application/json"}, timeout=10)
+        response.close()
+        response.raise_for_status()
+    except Exception as err:
+        print(f"Webhook error occurred: {err}")
+        print(message)
+
+async def watch_favourite_carparks(url, favourite_thresholds, interval, webhook_url=None, max_polls=None):
+    """
+    Poll the API every interval and send an alert when a Favourite carpark crosses its threshold.
+    Only the previous state of each Favourite carpark is kept between polls.
+
+    Parameters: 
+        url (str): The API url to the most recent carpark lots availability 
+        favourite_thresholds (dict): Dictionary of carpark numbers to the lots available that raises an alert
+        interval (int): The number of seconds between each poll
+        webhook_url (str): The URL of the webhook, alerts are printed if None
+        max_polls (int): The number of polls before stopping, polls forever if None
+
+    Returns: 
+        None
+    """
+    previous_states = {}
+    carpark_numbers = set(favourite_thresholds)
+    polls = 0
+    with requests.Session() as session:
+        while max_polls is None or polls < max_polls:
+            polls += 1
+            try:
+                response = await asyncio.to_thread(session.get, url, timeout=30)
+                response.raise_for_status()
+                carpark_availability = parse_availability(response.json().get("items")[0], carpark_numbers)
+                response.close()
+            except Exception as err:
+                print(f"Poll error occurred: {err}")
+            else:
+                alerts = check_threshold_crossings(carpark_availability, favourite_thresholds, previous_states)
+                for alert in alerts:
+                    await asyncio.to_thread(send_alert, alert, webhook_url, session)
+            if max_polls is None or polls < max_polls:
+                await asyncio.sleep(interval)
+
+def display_favourite_alerts(url, favourites_store, user_name):
+    """
+    Option 17: Watch the Favourite carparks until the user stops it with Ctrl+C
+
+    Parameters: 
+        url (str): The API url to the most recent carpark lots availability 
+        favourites_store (sqlite3.Connection): The database that stores the Favourited carparks and their thresholds
+        user_name (str): The user whose Favourite carparks are watched
+
+    Returns: 
+        None
+    """
+    favourite_thresholds = get_favourite_thresholds(favourites_store, user_name)
+    if not favourite_thresholds:
+        print("You have not set a threshold for any favourite carparks.\n"
+              "Set a threshold for your favourite carparks in option 16")
+        return
+
+    interval = get_whole_number("Enter the seconds between each check: ", minimum=1)
+    webhook_url = input("Enter the webhook URL (Enter to print alerts): ").strip() or None
+
+    print(f"Watching {len(favourite_thresholds)} carparks, press Ctrl+C to stop.")
+    try:
+        asyncio.run(watch_favourite_carparks(url, favourite_thresholds, interval, webhook_url))
+    except KeyboardInterrupt:
+        print("Stopped watching favourite carparks.")
+
+def display_filtered_carparks(carpark_information, url, carpark_database=None, query_cache=None):
+    """
+    Option 18: Prompts for a filter such as 'Gantry Height >= 2.1 and Night Parking = YES and Percentage >= 30'
+    and displays the carparks that match it, with their most recent lots availability
+
+    Parameters: 
+        carpark_information (list[dict]): The full list of carpark information
+        url (str): The API url to the most recent carpark lots availability 
+        carpark_database (sqlite3.Connection): The carpark database that the carpark information is read from, if given
+        query_cache (dict): The cache of query results, the results read from the API are dropped if it has a 
+        new snapshot
+
+    Returns: 
+        None
+    """
+    headers = ["Carpark Number", "Carpark Type", "Night Parking", "Carpark Deck", "Gantry Height", 
+               "Total Lots", "Lots Available", "Percentage", "Address"]
+    spacing = [14, 29, 13, 12, 13, 10, 14, 10, 7]
+    align = "<<<>>>>><"
+
+    carpark_availability = get_carpark_availability(url, query_cache)
+    if not carpark_availability:
+        return
+
+    #The filter table is only built again when the registry or the API snapshot changes
+    filter_table = cpq.get_cached_result(
+        query_cache, "filter_table", (), (cpq.REGISTRY_SOURCE, cpq.API_SOURCE),
+        lambda: cpf.build_filter_table(cpdb.query_carpark_information(carpark_database) if carpark_database 
+                                       else carpark_information, carpark_availability))
+    filter_headers = list(filter_table["Columns"])
+
+    print(f"Columns: {', '.join(filter_headers)}")
+    print("Operators: =, !=, >, >=, <, <=, ~ (contains), join the conditions with 'and'")
+    while True:
+        expression = input("Enter the filter: ")
+        try:
+            clauses = cpf.parse_filter(expression, filter_headers)
+            break
+        except ValueError as err:
+            print(f"Invalid filter, {err}")
+
+    matches = cpf.run_filter(filter_table, cpf.compile_filter(filter_table, clauses))
+
+    print(generate_line(headers, spacing, align))
+    for information_carpark, availability_carpark in matches:
+        line_data = [information_carpark.get(header, "") for header in headers[:5]]
+        line_data += [str(int(availability_carpark["Total Lots"])), str(int(availability_carpark["Lots Available"])),
+                      str(availability_carpark["Percentage"]), information_carpark.get("Address", "")]
+        print(generate_line(line_data, spacing, align))
+    print(f"Total Number: {len(matches)}")
+
+def parse_arguments():
+    #Returns the command line arguments of the program
+    parser = argparse.ArgumentParser(description="Carpark information and availability menu")
+    parser.add_argument("--database", nargs="?", const=cpdb.CARPARK_DATABASE_FILE_PATH, default=None,
+                        help="answer the options with SQL queries on a SQLite database "
+                             f"(default: '{cpdb.CARPARK_DATABASE_FILE_PATH}')")
+    parser.add_argument("--cache-size", type=int, default=cpq.QUERY_CACHE_SIZE,
+                        help="the number of query results kept for repeated options, 0 to turn off (default: %(default)s)")
+    return parser.parse_args()
+
+def main(database_file_name=None, cache_size=cpq.QUERY_CACHE_SIZE):
     carpark_information = []
     carpark_availability = [] 
     full_carpark_information = []
     timestamp = ""
-    cpi_file_name = "carpark-information.csv"
     fcpi_file_name = "carpark-information-full.csv"
-
-    carpark_information = get_carpark_information(cpi_file_name)
+    carpark_registry = None
+    carpark_database = None
+    snapshot_id = None
+    query_cache = cpq.new_query_cache(cache_size)
+
+    if database_file_name:
+        carpark_database = cpdb.open_carpark_database(database_file_name, fcpi_file_name)
+        snapshot_id, timestamp = cpdb.get_latest_snapshot(carpark_database)
+        print(f"'{database_file_name}' was successfully opened.")
+    else:
+        carpark_registry = load_carpark_registry(fcpi_file_name)
+        if carpark_registry is None:
+            print(f"'{fcpi_file_name}' is needed by every option, make sure that it is within the same directory.")
+            raise SystemExit(1)
+        carpark_information = get_basic_carpark_information(carpark_registry)
+    fuzzy_index = None
+
+    def load_fuzzy_index():
+        #The fuzzy address index is only built the first time a search needs it
+        nonlocal fuzzy_index
+        if fuzzy_index is None:
+            fuzzy_index = cpz.build_fuzzy_index(cpdb.query_carpark_addresses(carpark_database) if carpark_database 
+                                                else [carpark["Address"] for carpark in carpark_information])
+        return fuzzy_index
     menu = generate_menu(MENU_DESCRIPTIONS)
 
     if not os.path.exists(USER_FOLDER_FILE_PATH):
         os.mkdir(USER_FOLDER_FILE_PATH)
-    
-    with shelve.open(USER_DATA_FILE_PATH) as user_data:
+
+    user_name = get_user_name()
+
+    with closing(open_favourites_store(USER_FAVOURITES_FILE_PATH)) as favourites_store:
+        try:
+            migrated = migrate_shelf_favourites(favourites_store, USER_DATA_FILE_PATH, user_name)
+        except (dbm.error[0], OSError) as err:
+            print(f"'{USER_DATA_FILE_PATH}' could not be read, its Favourites will be moved next time: {err}")
+            migrated = 0
+        if migrated:
+            print(f"{migrated} Favourite carparks were moved from '{USER_DATA_FILE_PATH}' to '{user_name}'")
         while True:
             print(menu)
             option = get_option(MENU_DESCRIPTIONS)
@@ -684,43 +1492,71 @@ def main():
             if option == 0: 
                 break
             elif option == 1: 
-                display_total_number_of_carpark_information(cpi_file_name, carpark_information)
+                display_total_number_of_carpark_information(fcpi_file_name, carpark_information, carpark_database)
             elif option == 2:
-                display_basement_carparks(carpark_information)
+                display_basement_carparks(carpark_information, carpark_database, 
+                                          carpark_registry and carpark_registry["Carpark Categories"])
             elif option == 3:
                 carpark_availability, timestamp = get_carpark_availability_display_timestamp()
-                carpark_availability = append_addresses(carpark_availability, carpark_information)
-                carpark_availability = append_percentages(carpark_availability)
-            elif carpark_availability == [] and option < 11: 
+                cpq.invalidate_source(query_cache, cpq.FILE_SOURCE)
+                if carpark_database:
+                    carpark_availability = append_percentages(carpark_availability)
+                    snapshot_id = cpdb.insert_availability_snapshot(carpark_database, timestamp, "file", carpark_availability)
+                    carpark_availability = []
+                else:
+                    carpark_availability = append_addresses(carpark_availability, carpark_information)
+                    carpark_availability = append_percentages(carpark_availability)
+            elif carpark_availability == [] and snapshot_id is None and option < 11: 
                 print(f"Invalid option, select option 3 before selecting {option}")
             elif option == 4:
-                display_total_number_of_carpark_availability(carpark_availability) 
+                display_total_number_of_carpark_availability(carpark_availability, carpark_database, snapshot_id) 
             elif option == 5: 
-                display_carpark_without_lots(carpark_availability)
+                display_carpark_without_lots(carpark_availability, carpark_database, snapshot_id)
             elif option == 6:
-                display_carpark_with_x_available_lots(carpark_availability)
+                display_carpark_with_x_available_lots(carpark_availability, carpark_database=carpark_database, 
+                                                      snapshot_id=snapshot_id, query_cache=query_cache)
             elif option == 7:
-                display_carpark_with_x_available_lots(carpark_availability, with_address=True)
+                display_carpark_with_x_available_lots(carpark_availability, with_address=True, 
+                                                      carpark_database=carpark_database, snapshot_id=snapshot_id, 
+                                                      query_cache=query_cache)
             elif option == 8:
-                display_carpark_at_address(carpark_availability)
+                display_carpark_at_address(carpark_availability, carpark_database, snapshot_id, load_fuzzy_index, 
+                                           query_cache)
             elif option == 9:
-                display_carpark_with_most_lots(carpark_availability)
+                display_carpark_with_most_lots(carpark_availability, carpark_database, snapshot_id)
             elif option == 10:
-                write_carpark_availability_address(carpark_availability, timestamp)
+                write_carpark_availability_address(carpark_availability, timestamp, carpark_database, snapshot_id)
+            elif option == 11 and carpark_database: 
+                print(f"'{fcpi_file_name}' is already loaded in '{database_file_name}'.")
             elif option == 11: 
-                full_carpark_information = get_carpark_information(fcpi_file_name)
-            elif full_carpark_information == []:
+                full_carpark_information = carpark_registry["Carpark Information"]
+                cpq.refresh_source(query_cache, cpq.REGISTRY_SOURCE, carpark_registry["Version"])
+                print(f"'{fcpi_file_name}' is already loaded in the carpark registry.")
+            elif full_carpark_information == [] and not carpark_database:
                 print(f"Invalid option, selection option 11 before selecting {option}")
             elif option == 12: 
-                display_favourite_carparks(full_carpark_information, API_URL, option, user_data)
+                display_favourite_carparks(full_carpark_information, API_URL, option, favourites_store, user_name, 
+                                           carpark_database, query_cache)
             elif option == 13: 
-                user_data = add_favourite_carpark(full_carpark_information, user_data)
+                add_favourite_carpark(full_carpark_information, favourites_store, user_name, carpark_database)
             elif option == 14:
-                user_data = remove_favourite_carpark(user_data, option)
+                remove_favourite_carpark(favourites_store, user_name, option)
             elif option == 15: 
-                display_nearest_carparks(full_carpark_information, API_URL)
+                display_nearest_carparks(full_carpark_information, API_URL, carpark_database, load_fuzzy_index, query_cache,
+                                         carpark_registry and cpc.get_carpark_coordinates(carpark_registry))
+            elif option == 16:
+                set_favourite_carpark_threshold(favourites_store, user_name, option)
+            elif option == 17:
+                display_favourite_alerts(API_URL, favourites_store, user_name)
+            elif option == 18:
+                display_filtered_carparks(full_carpark_information, API_URL, carpark_database, query_cache)
             continue_hold()
 
+    print(cpq.get_query_cache_statistics(query_cache))
+    if carpark_database:
+        carpark_database.close()
+
 if __name__ == "__main__":
-    main()
+    arguments = parse_arguments()
+    main(arguments.database, arguments.cache_size)
     print("See you again, space cowboy!")
\ No newline at end of file
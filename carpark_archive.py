@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import os
+import dbm
+import shelve
+import argparse
+from array import array
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import S10256965_Assignment_Advanced as carpark
+
+OCCUPANCY_TABLE_FILE_PATH = os.path.relpath("user/occupancy")
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+SLOTS = len(DAYS) * 24
+FILES_KEY = "__files__"
+#The weight of a snapshot in the rolling mean and peak halves every HALF_LIFE_DAYS after it
+HALF_LIFE_DAYS = 28
+HALF_LIFE_SECONDS = HALF_LIFE_DAYS * 24 * 60 * 60
+
+def parse_snapshot_timestamp(line):
+    """
+    Returns the time in the first line of a 'carpark-availability-vX.csv' file
+
+    Parameters:
+        line (str): The first line, such as 'Timestamp: 2023-06-19T11:10:27+08:00,,'
+
+    Returns:
+        timestamp (datetime): The time of the snapshot
+    """
+    return datetime.fromisoformat(line.strip().rstrip(",").removeprefix("Timestamp:").strip())
+
+def get_slot(timestamp):
+    #Returns the slot of the day of week and hour of day of a timestamp, Monday 0:00 is slot 0
+    return timestamp.weekday() * 24 + timestamp.hour
+
+def read_snapshot_timestamp(file_name):
+    #Returns the time of the snapshot in an availability file from its first line, None if it cannot be read
+    try:
+        with carpark.open_availability_file(file_name) as carpark_availability_file:
+            return parse_snapshot_timestamp(carpark_availability_file.readline())
+    except (OSError, ValueError, EOFError):
+        return None
+
+def read_snapshot_occupancy(file_name):
+    """
+    Returns the time and the occupancy of every carpark in an availability file. Runs in a worker process.
+
+    Parameters:
+        file_name (str): The name of the carpark availability file, gzip compressed if it ends with '.gz'
+
+    Returns:
+        timestamp (datetime): The time of the snapshot, None if the file cannot be read
+        occupancy (list[tuple]): The (carpark number, fraction of lots taken) of each carpark
+    """
+    occupancy = []
+    try:
+        with carpark.open_availability_file(file_name) as carpark_availability_file:
+            timestamp = parse_snapshot_timestamp(carpark_availability_file.readline())
+            headers = carpark_availability_file.readline().strip("\n").split(",")
+            number_index = headers.index("Carpark Number")
+            total_index = headers.index("Total Lots")
+            available_index = headers.index("Lots Available")
+            for line in carpark_availability_file:
+                values = line.strip("\n").split(",")
+                if len(values) < len(headers):
+                    continue
+                total_lots = values[total_index]
+                lots_available = values[available_index]
+                if not (total_lots.isdigit() and lots_available.isdigit()) or int(total_lots) == 0:
+                    continue
+                taken = max(int(total_lots) - int(lots_available), 0)
+                occupancy.append((values[number_index], min(taken / int(total_lots), 1.0)))
+    except (OSError, ValueError, EOFError):
+        return None, []
+    return timestamp, occupancy
+
+def get_file_key(file_name):
+    #Returns the key that identifies a version of an archived file, so its snapshot time is only read once
+    file_status = os.stat(file_name)
+    return f"{os.path.basename(file_name)}:{file_status.st_size}:{file_status.st_mtime_ns}"
+
+def new_carpark_statistics():
+    """
+    Returns empty statistics for a carpark. Each slot has the number of snapshots, the decayed weight, sum and
+    peak of occupancy, and the time of the latest snapshot in seconds that they are decayed to.
+    """
+    return {"Count": array("I", bytes(4 * SLOTS)),
+            "Weight": array("d", bytes(8 * SLOTS)),
+            "Sum": array("d", bytes(8 * SLOTS)),
+            "Peak": array("d", bytes(8 * SLOTS)),
+            "Updated": array("d", bytes(8 * SLOTS))}
+
+def add_occupancy(carpark_statistics, slot, snapshot_time, fraction):
+    """
+    Add the occupancy of a snapshot to the rolling statistics of a slot. The statistics are kept as of the
+    latest snapshot of the slot, an older snapshot is decayed to that time instead, so the statistics are
+    the same whatever order the snapshots are added in.
+
+    Parameters:
+        carpark_statistics (dict): The statistics of the carpark, see new_carpark_statistics
+        slot (int): The day of week and hour of day slot of the snapshot
+        snapshot_time (float): The time of the snapshot in seconds since the epoch
+        fraction (float): The fraction of lots taken
+
+    Returns:
+        None
+    """
+    updated = carpark_statistics["Updated"][slot]
+    if carpark_statistics["Count"][slot] == 0 or snapshot_time >= updated:
+        decay = 0.5 ** ((snapshot_time - updated) / HALF_LIFE_SECONDS) if carpark_statistics["Count"][slot] else 0.0
+        carpark_statistics["Weight"][slot] = carpark_statistics["Weight"][slot] * decay + 1
+        carpark_statistics["Sum"][slot] = carpark_statistics["Sum"][slot] * decay + fraction
+        carpark_statistics["Peak"][slot] = max(carpark_statistics["Peak"][slot] * decay, fraction)
+        carpark_statistics["Updated"][slot] = snapshot_time
+    else:
+        decay = 0.5 ** ((updated - snapshot_time) / HALF_LIFE_SECONDS)
+        carpark_statistics["Weight"][slot] += decay
+        carpark_statistics["Sum"][slot] += fraction * decay
+        carpark_statistics["Peak"][slot] = max(carpark_statistics["Peak"][slot], fraction * decay)
+    carpark_statistics["Count"][slot] += 1
+
+def ingest_archive(directory, table_file_name, workers=None):
+    """
+    Read every new availability file in a directory in parallel and add it to the occupancy table.
+    The table keeps a rolling mean and peak of each slot, so later files update them without reading the
+    earlier files again. Snapshots are identified by their time, so the same snapshot saved as '.csv'
+    and '.csv.gz' is only added once.
+
+    Parameters:
+        directory (str): The directory of 'carpark-availability-vX.csv' files, or '.csv.gz' files from a backfill
+        table_file_name (str): The path of the occupancy table shelf
+        workers (int): The number of worker processes, the number of CPUs if None
+
+    Returns:
+        ingested (int): The number of files added to the table
+        skipped (int): The number of files that could not be read
+        duplicates (int): The number of files of snapshots that were already added
+    """
+    with shelve.open(table_file_name) as occupancy_table:
+        #The snapshot time of each file that has been seen, so a file is only opened again if it changes
+        file_snapshots = occupancy_table.get(FILES_KEY, {})
+        ingested_snapshots = set(file_snapshots.values())
+        file_names = []
+        file_keys = []
+        skipped = 0
+        duplicates = 0
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+            if not (entry.is_file() and entry.name.endswith((".csv", ".csv.gz"))):
+                continue
+            file_key = get_file_key(entry.path)
+            if file_key in file_snapshots:
+                continue
+            timestamp = read_snapshot_timestamp(entry.path)
+            if timestamp is None:
+                skipped += 1
+                continue
+            file_snapshots[file_key] = timestamp.isoformat()
+            if timestamp.isoformat() in ingested_snapshots:
+                duplicates += 1
+                continue
+            ingested_snapshots.add(timestamp.isoformat())
+            file_names.append(entry.path)
+            file_keys.append(file_key)
+
+        statistics = {}
+        ingested = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(read_snapshot_occupancy, file_names, chunksize=max(len(file_names) // 64, 1))
+            for file_key, (timestamp, occupancy) in zip(file_keys, results):
+                if timestamp is None:
+                    #Read the file again next time, as it may have been cut short while it was written
+                    del file_snapshots[file_key]
+                    skipped += 1
+                    continue
+                slot = get_slot(timestamp)
+                snapshot_time = timestamp.timestamp()
+                for carpark_number, fraction in occupancy:
+                    carpark_statistics = statistics.get(carpark_number)
+                    if carpark_statistics is None:
+                        carpark_statistics = occupancy_table.get(carpark_number) or new_carpark_statistics()
+                        statistics[carpark_number] = carpark_statistics
+                    add_occupancy(carpark_statistics, slot, snapshot_time, fraction)
+                ingested += 1
+
+        for carpark_number, carpark_statistics in statistics.items():
+            occupancy_table[carpark_number] = carpark_statistics
+        occupancy_table[FILES_KEY] = file_snapshots
+    return ingested, skipped, duplicates
+
+def query_occupancy(table_file_name, carpark_number, day, hour):
+    """
+    Returns how full a carpark usually is at an hour on a day of the week, from the occupancy table
+
+    Parameters:
+        table_file_name (str): The path of the occupancy table shelf
+        carpark_number (str): The carpark number
+        day (int): The day of the week, Monday is 0
+        hour (int): The hour of the day, 0 to 23
+
+    Returns:
+        occupancy (dict): The number of "Snapshots", the rolling "Mean" and "Peak" fraction of lots taken as of
+        the latest snapshot, None if the carpark is not in the table
+    """
+    with shelve.open(table_file_name, flag="r") as occupancy_table:
+        carpark_statistics = occupancy_table.get(carpark_number)
+    if carpark_statistics is None:
+        return None
+    slot = day * 24 + hour
+    weight = carpark_statistics["Weight"][slot]
+    return {"Snapshots": carpark_statistics["Count"][slot],
+            "Mean": carpark_statistics["Sum"][slot] / weight if weight else 0.0,
+            "Peak": carpark_statistics["Peak"][slot]}
+
+def parse_day(text):
+    #Returns the day of the week of a full name such as 'Friday' or its first three letters 'fri', Monday is 0
+    day_text = text.strip().lower()
+    for day, name in enumerate(DAYS):
+        if day_text in (name.lower(), name[:3].lower()):
+            return day
+    raise ValueError(f"Invalid day '{text}', it should be one of {', '.join(DAYS)}")
+
+def parse_hour(text):
+    #Returns the hour in text such as '18' or '6pm'
+    hour_text = text.strip().lower()
+    suffix = hour_text[-2:] if hour_text.endswith(("am", "pm")) else ""
+    hour_text = hour_text.removesuffix(suffix).strip()
+    if suffix and hour_text.isdigit() and 1 <= int(hour_text) <= 12:
+        return int(hour_text) % 12 + (12 if suffix == "pm" else 0)
+    if not suffix and hour_text.isdigit() and 0 <= int(hour_text) <= 23:
+        return int(hour_text)
+    raise ValueError(f"Invalid hour '{text}', it should be 0 to 23 or 1am to 12pm")
+
+def parse_arguments():
+    #Returns the command line arguments of the archive analysis
+    parser = argparse.ArgumentParser(description="Occupancy statistics by hour of day and day of week")
+    parser.add_argument("--table", default=OCCUPANCY_TABLE_FILE_PATH,
+                        help="the occupancy table (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="add a directory of availability files to the table")
+    ingest_parser.add_argument("directory")
+    ingest_parser.add_argument("--workers", type=int, default=None,
+                               help="the number of worker processes (default: the number of CPUs)")
+    query_parser = subparsers.add_parser("query", help="how full a carpark usually is")
+    query_parser.add_argument("carpark_number")
+    query_parser.add_argument("--day", type=parse_day, required=True, help="the day of the week, such as Friday")
+    query_parser.add_argument("--hour", type=parse_hour, required=True, help="the hour, such as 18 or 6pm")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    table_folder = os.path.dirname(arguments.table)
+    if table_folder and not os.path.exists(table_folder):
+        os.mkdir(table_folder)
+
+    if arguments.command == "ingest":
+        ingested, skipped, duplicates = ingest_archive(arguments.directory, arguments.table, arguments.workers)
+        print(f"{ingested} files were added to '{arguments.table}', {skipped} files could not be read, "
+              f"{duplicates} files were snapshots already added.")
+        return
+
+    try:
+        occupancy = query_occupancy(arguments.table, arguments.carpark_number, arguments.day, arguments.hour)
+    except dbm.error:
+        print(f"Invalid table, '{arguments.table}' has not been created, ingest an archive first.")
+        return
+    when = f"{DAYS[arguments.day]} {arguments.hour:02d}:00"
+    if occupancy is None:
+        print(f"Carpark {arguments.carpark_number} is not in '{arguments.table}'")
+    elif occupancy["Snapshots"] == 0:
+        print(f"Carpark {arguments.carpark_number} has no snapshots on {when}")
+    else:
+        print(f"Carpark {arguments.carpark_number} on {when}: usually {occupancy['Mean'] * 100:.1f}% full, "
+              f"peak {occupancy['Peak'] * 100:.1f}% ({occupancy['Snapshots']} snapshots, "
+              f"{HALF_LIFE_DAYS} day half-life)")
+
+if __name__ == "__main__":
+    main()
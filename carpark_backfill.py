@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import os
+import gzip
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+
+import S10256965_Assignment_Advanced as carpark
+import carpark_server
+
+BACKFILL_ARCHIVE_FOLDER_PATH = os.path.relpath("archive")
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+#The API takes and returns Singapore times, which have been UTC+08:00 without daylight saving since 1982
+SINGAPORE_TIME_ZONE = timezone(timedelta(hours=8), "Asia/Singapore")
+
+def to_singapore_time(date_time):
+    #Returns date_time as a Singapore time without a time zone, converted to Singapore if it has a time zone
+    if date_time.tzinfo is not None:
+        date_time = date_time.astimezone(SINGAPORE_TIME_ZONE)
+    return date_time.replace(tzinfo=None)
+
+def parse_date_time(text):
+    #Returns the Singapore date and time in text such as '2023-06-19T08:00' or '2023-06-19T00:00Z', seconds are dropped
+    try:
+        return to_singapore_time(datetime.fromisoformat(text.strip())).replace(second=0, microsecond=0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date and time '{text}', it should be like 2023-06-19T08:00")
+
+def generate_date_times(start, end, step_minutes):
+    #Returns the date and times from start to end inclusive, step_minutes apart
+    date_times = []
+    date_time = start
+    while date_time <= end:
+        date_times.append(date_time)
+        date_time += timedelta(minutes=step_minutes)
+    return date_times
+
+def get_archive_file_name(archive_folder, date_time):
+    #Returns the archive file of the snapshot requested at date_time
+    return os.path.join(archive_folder, f"carpark-availability-{date_time:%Y%m%dT%H%M}.csv.gz")
+
+def write_snapshot(file_name, timestamp, carpark_availability):
+    """
+    Write a snapshot to a gzip compressed file in the 'carpark-availability-vX.csv' format. The file is
+    written under a temporary name and renamed, so a file in the archive is always complete and marks its
+    snapshot as done when a backfill is resumed.
+
+    Parameters:
+        file_name (str): The name of the archive file
+        timestamp (str): The timestamp of the snapshot from the API
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+
+    Returns:
+        None
+    """
+    temporary_file_name = file_name + ".tmp"
+    with gzip.open(temporary_file_name, "wt", newline="") as snapshot_file:
+        snapshot_file.write(f"Timestamp: {timestamp}\n")
+        snapshot_file.write(",".join(carpark.AVAILABILITY_HEADERS) + "\n")
+        for carpark_number, availability in carpark_availability.items():
+            snapshot_file.write(f"{carpark_number},{availability['Total Lots']},{availability['Lots Available']}\n")
+    os.replace(temporary_file_name, file_name)
+
+async def wait_for_rate_limit(rate_limit):
+    """
+    Wait until the next request may be sent. Each request takes the next free slot, 1 / rate seconds after
+    the slot before it, so the workers together never send more than rate requests per second.
+
+    Parameters:
+        rate_limit (dict): The "Interval" between requests in seconds and the "Next" free slot
+
+    Returns:
+        None
+    """
+    now = time.monotonic()
+    slot = max(now, rate_limit["Next"])
+    rate_limit["Next"] = slot + rate_limit["Interval"]
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+async def fetch_snapshot(session, url, date_time, rate_limit, retries, backoff):
+    """
+    Fetch the snapshot at date_time from the API, retrying connection errors and busy or failing servers
+    with an exponential backoff
+
+    Parameters:
+        session (requests.Session): The session of the worker
+        url (str): The URL of the carpark availability API
+        date_time (datetime): The date and time of the snapshot
+        rate_limit (dict): The rate limit shared by the workers
+        retries (int): The number of times a failed request is retried
+        backoff (float): The seconds waited before the first retry, doubled for each retry after
+
+    Returns:
+        timestamp (str): The timestamp of the snapshot
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+    """
+    parameters = {"date_time": date_time.isoformat(timespec="seconds")}
+    for attempt in range(retries + 1):
+        await wait_for_rate_limit(rate_limit)
+        try:
+            response = await asyncio.to_thread(session.get, url, params=parameters, timeout=30)
+            if response.status_code not in RETRY_STATUS_CODES:
+                response.raise_for_status()
+                snapshot = response.json().get("items")[0]
+                return snapshot.get("timestamp"), carpark.parse_availability(snapshot)
+            error = requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as err:
+            error = err
+        if attempt == retries:
+            raise error
+        #Jitter keeps the workers that failed together from retrying together
+        await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+async def backfill(url, date_times, archive_folder, workers, rate, retries, backoff):
+    """
+    Fetch the snapshots at date_times into the archive with a bounded pool of workers. Snapshots that are
+    already in the archive are skipped, so a stopped backfill resumes where it left off.
+
+    Parameters:
+        url (str): The URL of the carpark availability API
+        date_times (list[datetime]): The date and times of the snapshots
+        archive_folder (str): The folder that the snapshots are written to
+        workers (int): The number of concurrent requests
+        rate (float): The most requests sent per second
+        retries (int): The number of times a failed request is retried
+        backoff (float): The seconds waited before the first retry
+
+    Returns:
+        results (dict): The number of snapshots "Fetched" and "Resumed", and the "Failed" date times with errors
+    """
+    queue = asyncio.Queue()
+    resumed = 0
+    for date_time in date_times:
+        if os.path.exists(get_archive_file_name(archive_folder, date_time)):
+            resumed += 1
+        else:
+            queue.put_nowait(date_time)
+    results = {"Fetched": 0, "Resumed": resumed, "Failed": []}
+    rate_limit = {"Interval": 1 / rate, "Next": time.monotonic()}
+
+    async def run_worker():
+        with requests.Session() as session:
+            while not queue.empty():
+                date_time = queue.get_nowait()
+                try:
+                    timestamp, carpark_availability = await fetch_snapshot(session, url, date_time, rate_limit,
+                                                                           retries, backoff)
+                    await asyncio.to_thread(write_snapshot, get_archive_file_name(archive_folder, date_time),
+                                            timestamp, carpark_availability)
+                except Exception as err:
+                    results["Failed"].append((date_time, str(err)))
+                else:
+                    results["Fetched"] += 1
+
+    await asyncio.gather(*[run_worker() for _ in range(max(min(workers, queue.qsize()), 1))])
+    results["Failed"].sort()
+    return results
+
+def load_recordings(recordings_folder):
+    #Returns the recorded API payloads in a folder as (time, payload) pairs, oldest first
+    recordings = []
+    for entry in os.scandir(recordings_folder):
+        if entry.is_file() and entry.name.endswith(".json"):
+            with open(entry.path, "r") as recording_file:
+                payload = json.load(recording_file)
+            timestamp = to_singapore_time(datetime.fromisoformat(payload["items"][0]["timestamp"]))
+            recordings.append((timestamp, payload))
+    if not recordings:
+        raise ValueError(f"No recordings found, '{recordings_folder}' has no .json payloads")
+    return sorted(recordings, key=lambda recording: recording[0])
+
+def select_recording(recordings, date_time_text):
+    #Returns the latest payload recorded at or before date_time_text like the API does, the oldest if none is
+    if not date_time_text:
+        return recordings[-1][1]
+    date_time = to_singapore_time(datetime.fromisoformat(date_time_text))
+    payload = recordings[0][1]
+    for timestamp, recorded_payload in recordings:
+        if timestamp > date_time:
+            break
+        payload = recorded_payload
+    return payload
+
+async def handle_fake_connection(reader, writer, recordings, failure_rate):
+    """
+    Serve one request of the fake API and close the connection. A failure_rate fraction of requests are
+    answered with 503 to exercise the retries of a backfill.
+
+    Parameters:
+        reader (asyncio.StreamReader): The stream that the request is read from
+        writer (asyncio.StreamWriter): The stream that the response is written to
+        recordings (list[tuple]): The recorded (time, payload) pairs
+        failure_rate (float): The fraction of requests that fail
+
+    Returns:
+        None
+    """
+    try:
+        request = (await reader.readline()).decode("latin-1").split()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        if len(request) != 3:
+            status, body = 400, {"Error": "Invalid request line"}
+        elif random.random() < failure_rate:
+            status, body = 503, {"Error": "Service temporarily unavailable"}
+        else:
+            query = parse_qs(urlsplit(request[1]).query)
+            try:
+                status, body = 200, select_recording(recordings, query.get("date_time", [""])[0])
+            except ValueError as err:
+                status, body = 400, {"Error": str(err)}
+        writer.write(carpark_server.encode_response(status, body, False))
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def serve_fake_api(recordings, host, port, failure_rate):
+    #Serves the recorded payloads on host:port until the server is stopped
+    server = await asyncio.start_server(lambda reader, writer: handle_fake_connection(reader, writer, recordings,
+                                                                                      failure_rate), host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving {len(recordings)} recordings on "
+          f"http://{address[0]}:{address[1]}{urlsplit(carpark.API_URL).path}, press Ctrl+C to stop.")
+    async with server:
+        await server.serve_forever()
+
+def record_payload(url, recordings_folder, date_time=None):
+    #Saves the API payload at date_time, the latest if None, as a recording for the fake API
+    parameters = {"date_time": date_time.isoformat(timespec="seconds")} if date_time else None
+    response = requests.get(url, params=parameters, timeout=30)
+    response.raise_for_status()
+    payload = response.json()
+    timestamp = datetime.fromisoformat(payload["items"][0]["timestamp"])
+    file_name = os.path.join(recordings_folder, f"{timestamp:%Y%m%dT%H%M%S}.json")
+    with open(file_name, "w") as recording_file:
+        json.dump(payload, recording_file)
+    return file_name
+
+def parse_arguments():
+    #Returns the command line arguments of the backfill
+    parser = argparse.ArgumentParser(description="Backfill historical carpark availability from the API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = subparsers.add_parser("fetch", help="fetch the snapshots of a time range into the archive")
+    fetch_parser.add_argument("--start", type=parse_date_time, required=True,
+                              help="the first snapshot, such as 2023-06-19T00:00")
+    fetch_parser.add_argument("--end", type=parse_date_time, required=True,
+                              help="the last snapshot, such as 2023-06-20T00:00")
+    fetch_parser.add_argument("--step", type=int, default=60,
+                              help="the minutes between snapshots (default: %(default)s)")
+    fetch_parser.add_argument("--url", default=carpark.API_URL, help="the availability API (default: %(default)s)")
+    fetch_parser.add_argument("--archive", default=BACKFILL_ARCHIVE_FOLDER_PATH,
+                              help="the folder the snapshots are written to (default: %(default)s)")
+    fetch_parser.add_argument("--workers", type=int, default=8,
+                              help="the number of concurrent requests (default: %(default)s)")
+    fetch_parser.add_argument("--rate", type=float, default=5.0,
+                              help="the most requests per second (default: %(default)s)")
+    fetch_parser.add_argument("--retries", type=int, default=4,
+                              help="the retries of a failed request (default: %(default)s)")
+    fetch_parser.add_argument("--backoff", type=float, default=1.0,
+                              help="the seconds before the first retry, doubled after each (default: %(default)s)")
+
+    fake_parser = subparsers.add_parser("fake-server", help="serve recorded payloads as an offline API")
+    fake_parser.add_argument("recordings", help="the folder of recorded .json payloads")
+    fake_parser.add_argument("--host", default="127.0.0.1", help="the host to listen on (default: %(default)s)")
+    fake_parser.add_argument("--port", type=int, default=8081, help="the port to listen on (default: %(default)s)")
+    fake_parser.add_argument("--failure-rate", type=float, default=0.0,
+                             help="the fraction of requests answered with 503 (default: %(default)s)")
+
+    record_parser = subparsers.add_parser("record", help="save an API payload for the fake server")
+    record_parser.add_argument("recordings", help="the folder the payload is saved to")
+    record_parser.add_argument("--date-time", type=parse_date_time, default=None,
+                               help="the snapshot (default: the latest)")
+    record_parser.add_argument("--url", default=carpark.API_URL, help="the availability API (default: %(default)s)")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    if arguments.command == "fake-server":
+        try:
+            asyncio.run(serve_fake_api(load_recordings(arguments.recordings), arguments.host, arguments.port,
+                                       arguments.failure_rate))
+        except KeyboardInterrupt:
+            print("Server stopped.")
+        return
+
+    if arguments.command == "record":
+        os.makedirs(arguments.recordings, exist_ok=True)
+        print(f"Recorded '{record_payload(arguments.url, arguments.recordings, arguments.date_time)}'")
+        return
+
+    if arguments.end < arguments.start or arguments.step < 1 or arguments.rate <= 0:
+        print("Invalid range, the end should not be before the start and the step and rate should be positive")
+        return
+    os.makedirs(arguments.archive, exist_ok=True)
+    date_times = generate_date_times(arguments.start, arguments.end, arguments.step)
+    start = time.perf_counter()
+    results = asyncio.run(backfill(arguments.url, date_times, arguments.archive, arguments.workers, arguments.rate,
+                                   arguments.retries, arguments.backoff))
+    elapsed = time.perf_counter() - start
+    print(f"{results['Fetched']} snapshots were fetched into '{arguments.archive}' in {elapsed:.1f}s, "
+          f"{results['Resumed']} were already archived, {len(results['Failed'])} failed.")
+    for date_time, error in results["Failed"]:
+        print(f"Failed {date_time.isoformat(timespec='minutes')}: {error}")
+    if results["Failed"]:
+        print("Run the same command again to retry the failed snapshots.")
+
+if __name__ == "__main__":
+    main()
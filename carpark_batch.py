@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import os
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import S10256965_Assignment_Advanced as carpark
+import carpark_coordinates as cpc
+import carpark_fuzzy as cpz
+
+BATCH_HEADERS = ["Query", "Rank", "Carpark Number", "Carpark Type", "Type of Parking System", "Total Lots",
+                 "Lots Available", "Address"]
+
+#The registry, the carparks with enough lots and the limit of a worker process, set once by initialize_worker
+#instead of being sent with every lookup
+worker_carpark_information = []
+worker_available_carpark_numbers = set()
+worker_limit = carpark.NEAREST_CARPARKS_LIMIT
+#The fuzzy address index of a worker process, built the first time one of its address queries finds nothing
+worker_fuzzy_index = None
+
+def initialize_worker(carpark_information, available_carpark_numbers, limit):
+    #Keeps the prebuilt registry, the carparks with enough lots and the limit in the worker process for its lookups
+    global worker_carpark_information, worker_available_carpark_numbers, worker_limit, worker_fuzzy_index
+    worker_carpark_information = carpark_information
+    worker_available_carpark_numbers = available_carpark_numbers
+    worker_limit = limit
+    worker_fuzzy_index = None
+
+def load_worker_fuzzy_index():
+    #Returns the fuzzy address index of the worker process, building it from the registry on first use
+    global worker_fuzzy_index
+    if worker_fuzzy_index is None:
+        worker_fuzzy_index = cpz.build_fuzzy_index([information_carpark["Address"]
+                                                    for information_carpark in worker_carpark_information])
+    return worker_fuzzy_index
+
+def find_nearest_carpark_numbers(query):
+    """
+    Returns the carpark numbers nearest to an address or latitude, longitude that have enough lots, nearest
+    first. Every carpark is ranked so the lots are filtered before the limit is applied. An address that finds
+    no carparks is searched again with its typos corrected by the fuzzy address index, the same as /nearest.
+    Runs in a worker process.
+
+    Parameters:
+        query (str): The address or latitude, longitude
+
+    Returns:
+        nearest_carpark_numbers (list[str]): At most the limit of carpark numbers, nearest first
+    """
+    _, sorted_nearby_carparks = carpark.find_nearest_carparks(worker_carpark_information, query, limit=None)
+    if not sorted_nearby_carparks and not cpc.parse_latitude_longitude(query):
+        corrected_query = cpz.correct_query(load_worker_fuzzy_index(), query)
+        if corrected_query:
+            _, sorted_nearby_carparks = carpark.find_nearest_carparks(worker_carpark_information, corrected_query,
+                                                                      limit=None)
+    nearest_carpark_numbers = []
+    for carpark_number in sorted_nearby_carparks:
+        if carpark_number in worker_available_carpark_numbers:
+            nearest_carpark_numbers.append(carpark_number)
+            if len(nearest_carpark_numbers) == worker_limit:
+                break
+    return nearest_carpark_numbers
+
+def read_queries(file_name):
+    #Returns the addresses or latitude, longitudes in a file, one per line, leaving out blank lines and # comments
+    with open(file_name, "r") as queries_file:
+        return [line.strip() for line in queries_file if line.strip() and not line.lstrip().startswith("#")]
+
+def run_batch(carpark_information, carpark_availability, queries, limit, min_lots, workers=None):
+    """
+    Find the nearest available carparks of every query across a pool of worker processes. Each distinct query
+    is looked up once, and the workers only return the numbers of carparks with at least min_lots, which are
+    joined to the snapshot here.
+
+    Parameters:
+        carpark_information (list[dict]): The full list of carpark information
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+        queries (list[str]): The addresses or latitude, longitudes
+        limit (int): The most carparks returned for a query
+        min_lots (int): The fewest lots available a returned carpark has
+        workers (int): The number of worker processes, the number of CPUs if None
+
+    Returns:
+        results (list[dict]): The "Query" and its nearest "Carparks", in the order of the queries
+    """
+    distinct_queries = list(dict.fromkeys(queries))
+    available_carpark_numbers = {carpark_number for carpark_number, availability_carpark in carpark_availability.items()
+                                 if int(availability_carpark["Lots Available"]) >= min_lots}
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker,
+                             initargs=(carpark_information, available_carpark_numbers, limit)) as executor:
+        nearest_carpark_numbers = dict(zip(distinct_queries,
+                                           executor.map(find_nearest_carpark_numbers, distinct_queries,
+                                                        chunksize=max(len(distinct_queries) // (workers * 4), 1))))
+
+    information_by_number = {information_carpark["Carpark Number"]: information_carpark
+                             for information_carpark in carpark_information}
+    results = []
+    for query in queries:
+        nearest_carparks = []
+        for carpark_number in nearest_carpark_numbers[query]:
+            information_carpark = information_by_number[carpark_number]
+            availability_carpark = carpark_availability[carpark_number]
+            nearest_carparks.append({header: information_carpark.get(header, availability_carpark.get(header))
+                                     for header in BATCH_HEADERS[2:]})
+        results.append({"Query": query, "Carparks": nearest_carparks})
+    return results
+
+def write_results(results, file_name):
+    #Writes the results as JSON lines if file_name ends with '.jsonl', otherwise as CSV with a row per carpark
+    with open(file_name, "w", newline="") as results_file:
+        if file_name.endswith(".jsonl"):
+            for result in results:
+                results_file.write(json.dumps(result) + "\n")
+            return
+        writer = csv.writer(results_file)
+        writer.writerow(BATCH_HEADERS)
+        for result in results:
+            if not result["Carparks"]:
+                writer.writerow([result["Query"], "", "", "", "", "", "", ""])
+            for rank, nearest_carpark in enumerate(result["Carparks"], start=1):
+                writer.writerow([result["Query"], rank] + [nearest_carpark[header] for header in BATCH_HEADERS[2:]])
+
+def parse_arguments():
+    #Returns the command line arguments of the batch lookup
+    parser = argparse.ArgumentParser(description="Nearest available carparks for a file of addresses")
+    parser.add_argument("queries", help="a file of addresses or 'latitude, longitude', one per line")
+    parser.add_argument("output", help="the results file, JSON lines if it ends with '.jsonl', otherwise CSV")
+    parser.add_argument("--information", default="carpark-information-full.csv",
+                        help="the full carpark information file (default: %(default)s)")
+    parser.add_argument("--availability", default=None,
+                        help="a 'carpark-availability-vX.csv' file used instead of the API snapshot")
+    parser.add_argument("--url", default=carpark.API_URL, help="the availability API (default: %(default)s)")
+    parser.add_argument("--limit", type=int, default=carpark.NEAREST_CARPARKS_LIMIT,
+                        help="the most carparks for each address (default: %(default)s)")
+    parser.add_argument("--min-lots", type=int, default=1,
+                        help="the fewest lots available of a returned carpark (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="the number of worker processes (default: the number of CPUs)")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    try:
+        queries = read_queries(arguments.queries)
+    except FileNotFoundError:
+        print(f"Invalid file name, '{arguments.queries}' is not found.")
+        return
+    carpark_registry = carpark.load_carpark_registry(arguments.information)
+    if carpark_registry is None:
+        return
+    try:
+        carpark_availability, timestamp = carpark.load_availability_snapshot(arguments.url, arguments.availability)
+    except (OSError, ValueError) as err:
+        print(carpark.describe_file_error(arguments.availability, err))
+        return
+    if not carpark_availability:
+        return
+    if arguments.availability:
+        print(f"'{arguments.availability}' was successfully read, {timestamp}")
+
+    start = time.perf_counter()
+    results = run_batch(carpark_registry["Carpark Information"], carpark_availability, queries, arguments.limit,
+                        arguments.min_lots, arguments.workers)
+    write_results(results, arguments.output)
+    elapsed = time.perf_counter() - start
+
+    not_found = sum(1 for result in results if not result["Carparks"])
+    print(f"{len(results)} addresses were written to '{arguments.output}' in {elapsed:.2f}s "
+          f"({len(results) / elapsed if elapsed else 0.0:.1f} addresses/s), {not_found} had no available carparks.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+from collections import OrderedDict
+
+QUERY_CACHE_SIZE = 128
+
+#The data sources a query result can be computed from, each has its own version in the cache
+REGISTRY_SOURCE = "Registry"
+FILE_SOURCE = "File"
+API_SOURCE = "API"
+
+def new_query_cache(max_size=QUERY_CACHE_SIZE):
+    """
+    Returns an empty query result cache. Results are kept for the versions of the data sources they were
+    computed from, the least recently used result is evicted when the cache is full.
+
+    Parameters:
+        max_size (int): The most results kept, nothing is cached if 0
+
+    Returns:
+        query_cache (dict): The cached "Entries", the "Versions" of the data sources and the hit and miss counters
+    """
+    return {"Entries": OrderedDict(),
+            "Max Size": max_size,
+            "Versions": {},
+            "Hits": 0,
+            "Misses": 0,
+            "Evictions": 0,
+            "Invalidations": 0}
+
+def refresh_source(query_cache, source, source_version):
+    """
+    Moves a data source to the version it has loaded. The first version of a source is adopted, the results
+    computed before it was known were computed from that data and are kept for it. If the version is different
+    from the one it had before, the results computed from the source are dropped and the results of the other
+    sources are kept.
+
+    Parameters:
+        query_cache (dict): The query result cache, nothing is done if None
+        source (str): The data source, REGISTRY_SOURCE, FILE_SOURCE or API_SOURCE
+        source_version (object): The version of the data loaded from the source, such as its timestamp
+
+    Returns:
+        None
+    """
+    if query_cache is None or query_cache["Versions"].get(source) == source_version:
+        return
+    entries = query_cache["Entries"]
+    if source not in query_cache["Versions"]:
+        query_cache["Versions"][source] = source_version
+        query_cache["Entries"] = OrderedDict(
+            ((query, parameters, tuple((entry_source, source_version if entry_source == source else entry_version)
+                                       for entry_source, entry_version in versions)), result)
+            for (query, parameters, versions), result in entries.items())
+        return
+    query_cache["Invalidations"] += 1
+    query_cache["Versions"][source] = source_version
+    for key in [key for key in entries if any(entry_source == source for entry_source, _ in key[2])]:
+        del entries[key]
+
+def invalidate_source(query_cache, source):
+    #Moves a data source to a new version after new data is loaded from it, such as a file read again, the
+    #results computed before are dropped even if the source had no version
+    if query_cache is None:
+        return
+    version = query_cache["Versions"].setdefault(source, 0)
+    refresh_source(query_cache, source, version + 1)
+
+def get_cached_result(query_cache, query, parameters, sources, compute):
+    """
+    Returns the result of a query for the current versions of its data sources, computing and caching it on a miss
+
+    Parameters:
+        query_cache (dict): The query result cache, the result is always computed if None
+        query (str): The name of the query
+        parameters (tuple): The hashable parameters of the query
+        sources (tuple): The data sources the query reads, the result is dropped when one of them changes
+        compute (function): Computes the result, called without arguments on a miss
+
+    Returns:
+        result (object): The result of the query, shared with later hits so it should not be changed
+    """
+    if query_cache is None:
+        return compute()
+    key = (query, parameters, tuple((source, query_cache["Versions"].get(source)) for source in sources))
+    entries = query_cache["Entries"]
+    if key in entries:
+        query_cache["Hits"] += 1
+        entries.move_to_end(key)
+        return entries[key]
+
+    query_cache["Misses"] += 1
+    result = compute()
+    if query_cache["Max Size"] > 0:
+        entries[key] = result
+        if len(entries) > query_cache["Max Size"]:
+            entries.popitem(last=False)
+            query_cache["Evictions"] += 1
+    return result
+
+def get_query_cache_statistics(query_cache):
+    #Returns the counters of the cache as a line of text for tuning its size
+    lookups = query_cache["Hits"] + query_cache["Misses"]
+    hit_rate = query_cache["Hits"] / lookups * 100 if lookups else 0.0
+    return (f"Query cache: {query_cache['Hits']} hits, {query_cache['Misses']} misses ({hit_rate:.1f}% hit rate), "
+            f"{query_cache['Evictions']} evictions, {query_cache['Invalidations']} invalidations, "
+            f"{len(query_cache['Entries'])}/{query_cache['Max Size']} entries")
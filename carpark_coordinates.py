@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import os
+import json
+from math import sin, cos, tan, sqrt, radians, degrees, pi
+
+#SVY21 is a Transverse Mercator projection of the WGS84 ellipsoid
+SEMI_MAJOR_AXIS = 6378137.0
+FLATTENING = 1 / 298.257223563
+ORIGIN_LATITUDE = 1.366666
+ORIGIN_LONGITUDE = 103.833333
+ORIGIN_NORTHING = 38744.572
+ORIGIN_EASTING = 28001.642
+SCALE_FACTOR = 1.0
+#The latitudes and longitudes that a coordinate entered by the user must be within, around Singapore
+SINGAPORE_LATITUDES = (1.1, 1.5)
+SINGAPORE_LONGITUDES = (103.5, 104.1)
+
+SEMI_MINOR_AXIS = SEMI_MAJOR_AXIS * (1 - FLATTENING)
+E2 = (2 * FLATTENING) - (FLATTENING * FLATTENING)
+E4 = E2 * E2
+E6 = E4 * E2
+A0 = 1 - (E2 / 4) - (3 * E4 / 64) - (5 * E6 / 256)
+A2 = (3.0 / 8.0) * (E2 + (E4 / 4) + (15 * E6 / 128))
+A4 = (15.0 / 256.0) * (E4 + (3 * E6 / 4))
+A6 = 35 * E6 / 3072
+
+def calculate_meridian_distance(latitude_radians):
+    #Returns the meridian distance from the equator to the latitude
+    return SEMI_MAJOR_AXIS * ((A0 * latitude_radians) - (A2 * sin(2 * latitude_radians))
+                + (A4 * sin(4 * latitude_radians)) - (A6 * sin(6 * latitude_radians)))
+
+ORIGIN_MERIDIAN_DISTANCE = calculate_meridian_distance(radians(ORIGIN_LATITUDE))
+
+def convert_wgs84_to_svy21(latitudes, longitudes):
+    """
+    Convert WGS84 latitudes and longitudes to SVY21 X (easting) and Y (northing) coordinates in one pass
+
+    Parameters:
+        latitudes (list[float]): The latitudes in degrees
+        longitudes (list[float]): The longitudes in degrees
+
+    Returns:
+        X_coordinates (list[float]): The SVY21 eastings
+        Y_coordinates (list[float]): The SVY21 northings
+    """
+    X_coordinates = []
+    Y_coordinates = []
+    origin_longitude_radians = radians(ORIGIN_LONGITUDE)
+    for latitude, longitude in zip(latitudes, longitudes):
+        latitude_radians = radians(latitude)
+        sin_latitude = sin(latitude_radians)
+        sin2_latitude = sin_latitude * sin_latitude
+        cos_latitude = cos(latitude_radians)
+        cos2_latitude = cos_latitude * cos_latitude
+        cos3_latitude = cos2_latitude * cos_latitude
+        cos4_latitude = cos3_latitude * cos_latitude
+        cos5_latitude = cos4_latitude * cos_latitude
+        cos6_latitude = cos5_latitude * cos_latitude
+        cos7_latitude = cos6_latitude * cos_latitude
+
+        rho = SEMI_MAJOR_AXIS * (1 - E2) / ((1 - E2 * sin2_latitude) ** 1.5)
+        v = SEMI_MAJOR_AXIS / sqrt(1 - E2 * sin2_latitude)
+        psi = v / rho
+        psi2 = psi * psi
+        psi3 = psi2 * psi
+        psi4 = psi3 * psi
+        t = tan(latitude_radians)
+        t2 = t * t
+        t4 = t2 * t2
+        t6 = t4 * t2
+        w = radians(longitude) - origin_longitude_radians
+        w2 = w * w
+        w4 = w2 * w2
+        w6 = w4 * w2
+        w8 = w6 * w2
+
+        M = calculate_meridian_distance(latitude_radians)
+        N_term1 = w2 / 2 * v * sin_latitude * cos_latitude
+        N_term2 = w4 / 24 * v * sin_latitude * cos3_latitude * (4 * psi2 + psi - t2)
+        N_term3 = w6 / 720 * v * sin_latitude * cos5_latitude * ((8 * psi4) * (11 - 24 * t2) - (28 * psi3) * (1 - 6 * t2)
+                                                                   + psi2 * (1 - 32 * t2) - psi * 2 * t2 + t4)
+        N_term4 = w8 / 40320 * v * sin_latitude * cos7_latitude * (1385 - 3111 * t2 + 543 * t4 - t6)
+        Y_coordinates.append(ORIGIN_NORTHING + SCALE_FACTOR * (M - ORIGIN_MERIDIAN_DISTANCE
+                                                               + N_term1 + N_term2 + N_term3 + N_term4))
+
+        E_term1 = w2 / 6 * cos2_latitude * (psi - t2)
+        E_term2 = w4 / 120 * cos4_latitude * ((4 * psi3) * (1 - 6 * t2) + psi2 * (1 + 8 * t2) - psi * 2 * t2 + t4)
+        E_term3 = w6 / 5040 * cos6_latitude * (61 - 479 * t2 + 179 * t4 - t6)
+        X_coordinates.append(ORIGIN_EASTING + SCALE_FACTOR * v * w * cos_latitude * (1 + E_term1 + E_term2 + E_term3))
+    return X_coordinates, Y_coordinates
+
+def convert_svy21_to_wgs84(X_coordinates, Y_coordinates):
+    """
+    Convert SVY21 X (easting) and Y (northing) coordinates to WGS84 latitudes and longitudes in one pass
+
+    Parameters:
+        X_coordinates (list[float]): The SVY21 eastings
+        Y_coordinates (list[float]): The SVY21 northings
+
+    Returns:
+        latitudes (list[float]): The latitudes in degrees
+        longitudes (list[float]): The longitudes in degrees
+    """
+    latitudes = []
+    longitudes = []
+    n = (SEMI_MAJOR_AXIS - SEMI_MINOR_AXIS) / (SEMI_MAJOR_AXIS + SEMI_MINOR_AXIS)
+    n2 = n * n
+    n3 = n2 * n
+    n4 = n2 * n2
+    G = SEMI_MAJOR_AXIS * (1 - n) * (1 - n2) * (1 + (9 * n2 / 4) + (225 * n4 / 64)) * (pi / 180)
+    origin_longitude_radians = radians(ORIGIN_LONGITUDE)
+    for X, Y in zip(X_coordinates, Y_coordinates):
+        M_prime = ORIGIN_MERIDIAN_DISTANCE + (Y - ORIGIN_NORTHING) / SCALE_FACTOR
+        sigma = (M_prime / G) * (pi / 180)
+        latitude_prime = (sigma + ((3 * n / 2) - (27 * n3 / 32)) * sin(2 * sigma)
+                          + ((21 * n2 / 16) - (55 * n4 / 32)) * sin(4 * sigma)
+                          + (151 * n3 / 96) * sin(6 * sigma) + (1097 * n4 / 512) * sin(8 * sigma))
+
+        sin_latitude_prime = sin(latitude_prime)
+        sin2_latitude_prime = sin_latitude_prime * sin_latitude_prime
+        rho_prime = SEMI_MAJOR_AXIS * (1 - E2) / ((1 - E2 * sin2_latitude_prime) ** 1.5)
+        v_prime = SEMI_MAJOR_AXIS / sqrt(1 - E2 * sin2_latitude_prime)
+        psi_prime = v_prime / rho_prime
+        psi_prime2 = psi_prime * psi_prime
+        psi_prime3 = psi_prime2 * psi_prime
+        psi_prime4 = psi_prime3 * psi_prime
+        sec_latitude_prime = 1 / cos(latitude_prime)
+        t_prime = tan(latitude_prime)
+        t_prime2 = t_prime * t_prime
+        t_prime4 = t_prime2 * t_prime2
+        t_prime6 = t_prime4 * t_prime2
+        E_prime = X - ORIGIN_EASTING
+        x = E_prime / (SCALE_FACTOR * v_prime)
+        x2 = x * x
+        x3 = x2 * x
+        x5 = x3 * x2
+        x7 = x5 * x2
+
+        latitude_factor = t_prime / (SCALE_FACTOR * rho_prime)
+        latitude_term1 = latitude_factor * ((E_prime * x) / 2)
+        latitude_term2 = latitude_factor * ((E_prime * x3) / 24) * ((-4 * psi_prime2) + (9 * psi_prime) * (1 - t_prime2)
+                                                                     + (12 * t_prime2))
+        latitude_term3 = latitude_factor * ((E_prime * x5) / 720) * ((8 * psi_prime4) * (11 - 24 * t_prime2)
+                                                                      - (12 * psi_prime3) * (21 - 71 * t_prime2)
+                                                                      + (15 * psi_prime2) * (15 - 98 * t_prime2 + 15 * t_prime4)
+                                                                      + (180 * psi_prime) * (5 * t_prime2 - 3 * t_prime4)
+                                                                      + 360 * t_prime4)
+        latitude_term4 = latitude_factor * ((E_prime * x7) / 40320) * (1385 - 3633 * t_prime2 + 4095 * t_prime4
+                                                                        + 1575 * t_prime6)
+        latitudes.append(degrees(latitude_prime - latitude_term1 + latitude_term2 - latitude_term3 + latitude_term4))
+
+        longitude_term1 = x * sec_latitude_prime
+        longitude_term2 = ((x3 * sec_latitude_prime) / 6) * (psi_prime + 2 * t_prime2)
+        longitude_term3 = ((x5 * sec_latitude_prime) / 120) * ((-4 * psi_prime3) * (1 - 6 * t_prime2)
+                                                                + psi_prime2 * (9 - 68 * t_prime2)
+                                                                + 72 * psi_prime * t_prime2 + 24 * t_prime4)
+        longitude_term4 = ((x7 * sec_latitude_prime) / 5040) * (61 + 662 * t_prime2 + 1320 * t_prime4 + 720 * t_prime6)
+        longitudes.append(degrees(origin_longitude_radians + longitude_term1 - longitude_term2
+                                  + longitude_term3 - longitude_term4))
+    return latitudes, longitudes
+
+def get_registry_version(file_name):
+    #Returns the version of a carpark information file, its size and modification time
+    file_status = os.stat(file_name)
+    return f"{file_status.st_size}-{file_status.st_mtime_ns}"
+
+def get_cache_file_name(file_name):
+    #Returns the name of the file that caches the coordinates converted from file_name
+    return os.path.splitext(file_name)[0] + ".wgs84.json"
+
+def convert_carpark_coordinates(carpark_information):
+    #Returns the carpark numbers mapped to their (latitude, longitude), converted together in one pass
+    carpark_numbers = []
+    X_coordinates = []
+    Y_coordinates = []
+    for carpark in carpark_information:
+        try:
+            X, Y = float(carpark["X"]), float(carpark["Y"])
+        except (KeyError, ValueError):
+            continue
+        carpark_numbers.append(carpark["Carpark Number"])
+        X_coordinates.append(X)
+        Y_coordinates.append(Y)
+    latitudes, longitudes = convert_svy21_to_wgs84(X_coordinates, Y_coordinates)
+    return {carpark_number: (round(latitude, 7), round(longitude, 7))
+            for carpark_number, latitude, longitude in zip(carpark_numbers, latitudes, longitudes)}
+
+def get_carpark_coordinates(carpark_registry):
+    """
+    Returns the latitude and longitude of every carpark in the registry. They are converted once per registry
+    version and cached in the registry and in a file next to the carpark information file.
+
+    Parameters:
+        carpark_registry (dict): The carpark registry
+
+    Returns:
+        carpark_coordinates (dict): The carpark numbers mapped to their (latitude, longitude)
+    """
+    if "Carpark Coordinates" in carpark_registry:
+        return carpark_registry["Carpark Coordinates"]
+
+    version = carpark_registry["Version"]
+    cache_file_name = get_cache_file_name(carpark_registry["File Name"])
+    carpark_coordinates = None
+    try:
+        with open(cache_file_name, "r") as cache_file:
+            cache = json.load(cache_file)
+        if cache.get("Version") == version:
+            carpark_coordinates = {carpark_number: tuple(coordinate)
+                                   for carpark_number, coordinate in cache["Carpark Coordinates"].items()}
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if carpark_coordinates is None:
+        carpark_coordinates = convert_carpark_coordinates(carpark_registry["Carpark Information"])
+        try:
+            with open(cache_file_name, "w") as cache_file:
+                json.dump({"Version": version, "Carpark Coordinates": carpark_coordinates}, cache_file)
+        except OSError as err:
+            print(f"Coordinates could not be cached: {err}")
+
+    carpark_registry["Carpark Coordinates"] = carpark_coordinates
+    return carpark_coordinates
+
+def parse_latitude_longitude(text):
+    """
+    Returns the latitude and longitude in text like '1.3521, 103.8198', None if text is not a coordinate
+    in Singapore, so an address such as 'BLK 12 34' is not mistaken for one
+
+    Parameters:
+        text (str): The text entered by the user
+
+    Returns:
+        coordinate (tuple): The (latitude, longitude) in degrees, or None
+    """
+    parts = text.replace(",", " ").split()
+    if len(parts) != 2:
+        return None
+    try:
+        latitude, longitude = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (SINGAPORE_LATITUDES[0] <= latitude <= SINGAPORE_LATITUDES[1]
+            and SINGAPORE_LONGITUDES[0] <= longitude <= SINGAPORE_LONGITUDES[1]):
+        return None
+    return latitude, longitude
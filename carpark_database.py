@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import os
+import csv
+import sqlite3
+
+CARPARK_DATABASE_FILE_PATH = os.path.relpath("carpark.db")
+#The half width in metres of the first box searched around a point, doubled until it holds enough carparks
+NEAR_POINT_RADIUS = 500
+#The number of availability snapshots kept, older snapshots are deleted when a new one is inserted
+KEPT_SNAPSHOTS = 5
+
+INFORMATION_COLUMNS = {"Carpark Number": "carpark_number",
+                       "Address": "address",
+                       "X": "x",
+                       "Y": "y",
+                       "Carpark Type": "carpark_type",
+                       "Type of Parking System": "type_of_parking_system",
+                       "Shorterm Parking": "short_term_parking",
+                       "Free Parking": "free_parking",
+                       "Night Parking": "night_parking",
+                       "Carpark Deck": "carpark_deck",
+                       "Gantry Height": "gantry_height",
+                       "Carpark Basement": "carpark_basement"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS carpark_information (
+    position INTEGER NOT NULL,
+    carpark_number TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    x REAL,
+    y REAL,
+    carpark_type TEXT,
+    type_of_parking_system TEXT,
+    short_term_parking TEXT,
+    free_parking TEXT,
+    night_parking TEXT,
+    carpark_deck TEXT,
+    gantry_height TEXT,
+    carpark_basement TEXT
+);
+CREATE INDEX IF NOT EXISTS carpark_information_type ON carpark_information (carpark_type);
+CREATE INDEX IF NOT EXISTS carpark_information_coordinates ON carpark_information (x, y);
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS carpark_availability (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (snapshot_id),
+    position INTEGER NOT NULL,
+    carpark_number TEXT NOT NULL,
+    total_lots INTEGER NOT NULL,
+    lots_available INTEGER NOT NULL,
+    percentage REAL NOT NULL,
+    PRIMARY KEY (snapshot_id, position)
+);
+CREATE INDEX IF NOT EXISTS carpark_availability_number ON carpark_availability (snapshot_id, carpark_number);
+CREATE INDEX IF NOT EXISTS carpark_availability_lots ON carpark_availability (snapshot_id, lots_available);
+CREATE INDEX IF NOT EXISTS carpark_availability_percentage ON carpark_availability (snapshot_id, percentage);
+CREATE INDEX IF NOT EXISTS carpark_availability_total ON carpark_availability (snapshot_id, total_lots);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def information_select(table):
+    #Returns the select list that names the columns of table with their csv headers
+    return ", ".join(f'{table}.{column} AS "{header}"' for header, column in INFORMATION_COLUMNS.items())
+
+INFORMATION_SELECT = information_select("carpark_information")
+
+AVAILABILITY_SELECT = """
+SELECT a.carpark_number AS "Carpark Number", a.total_lots AS "Total Lots",
+       a.lots_available AS "Lots Available", a.percentage AS "Percentage",
+       COALESCE(i.address, '') AS "Address"
+FROM carpark_availability AS a
+LEFT JOIN carpark_information AS i ON i.carpark_number = a.carpark_number
+WHERE a.snapshot_id = :snapshot_id
+"""
+
+def as_text_row(cursor, row):
+    #Row factory that returns each row as a dict of strings, the same as the rows read from the csv files
+    return {column[0]: "" if value is None else str(value) for column, value in zip(cursor.description, row)}
+
+def open_carpark_database(file_name, information_file_name):
+    """
+    Open the carpark database, (re)building it from the full carpark information file if it is
+    missing or older than the file. If the file is missing, the carparks already in the database are used.
+
+    Parameters:
+        file_name (str): The path of the SQLite database file
+        information_file_name (str): The name of the full carpark information file
+
+    Returns:
+        carpark_database (sqlite3.Connection): The connection to the carpark database
+    """
+    carpark_database = sqlite3.connect(file_name)
+    carpark_database.row_factory = as_text_row
+    carpark_database.executescript(SCHEMA)
+    try:
+        information_mtime = str(os.path.getmtime(information_file_name))
+    except OSError:
+        print(f"Invalid file name, '{information_file_name}' is not found, "
+              f"the carparks already in '{file_name}' are used.")
+        return carpark_database
+    loaded_mtime = carpark_database.execute("SELECT value FROM metadata WHERE key = 'information_mtime'").fetchone()
+    if not loaded_mtime or loaded_mtime["value"] != information_mtime:
+        load_carpark_information(carpark_database, information_file_name)
+        with carpark_database:
+            carpark_database.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES ('information_mtime', ?)",
+                                     (information_mtime,))
+    return carpark_database
+
+def load_carpark_information(carpark_database, information_file_name):
+    """
+    Replace the carpark information table with the rows of the full carpark information file
+    in a single transaction.
+
+    Parameters:
+        carpark_database (sqlite3.Connection): The connection to the carpark database
+        information_file_name (str): The name of the full carpark information file
+
+    Returns:
+        total_number (int): The number of carparks loaded
+    """
+    columns = ", ".join(["position"] + list(INFORMATION_COLUMNS.values()))
+    placeholders = ", ".join("?" * (len(INFORMATION_COLUMNS) + 1))
+    with open(information_file_name, "r", newline="") as carpark_information_file:
+        reader = csv.DictReader(carpark_information_file)
+        rows = [[position] + [carpark.get(header, "").strip() for header in INFORMATION_COLUMNS]
+                for position, carpark in enumerate(reader)]
+    with carpark_database:
+        carpark_database.execute("DELETE FROM carpark_information")
+        carpark_database.executemany(f"INSERT OR REPLACE INTO carpark_information ({columns}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+def insert_availability_snapshot(carpark_database, timestamp, source, carpark_availability):
+    """
+    Insert a carpark availability snapshot (with its percentages) in a single transaction. Reading the same
+    snapshot again reuses the latest snapshot instead of copying it, and only the KEPT_SNAPSHOTS newest
+    snapshots are kept so the database does not grow with every file read.
+
+    Parameters:
+        carpark_database (sqlite3.Connection): The connection to the carpark database
+        timestamp (str): The timestamp of the snapshot
+        source (str): Where the snapshot came from, a file name or an url
+        carpark_availability (list[dict]): The carpark availability list with the percentages appended
+
+    Returns:
+        snapshot_id (int): The id of the inserted or reused snapshot
+    """
+    latest_snapshot = carpark_database.execute("SELECT snapshot_id, timestamp, source FROM snapshots "
+                                               "ORDER BY snapshot_id DESC LIMIT 1").fetchone()
+    if latest_snapshot and (latest_snapshot["timestamp"], latest_snapshot["source"]) == (timestamp, source):
+        return int(latest_snapshot["snapshot_id"])
+    with carpark_database:
+        cursor = carpark_database.execute("INSERT INTO snapshots (timestamp, source) VALUES (?, ?)", (timestamp, source))
+        snapshot_id = cursor.lastrowid
+        carpark_database.executemany("INSERT INTO carpark_availability (snapshot_id, position, carpark_number, "
+                                     "total_lots, lots_available, percentage) VALUES (?, ?, ?, ?, ?, ?)",
+                                     [(snapshot_id, position, carpark["Carpark Number"], int(carpark["Total Lots"]),
+                                       int(carpark["Lots Available"]), float(carpark["Percentage"]))
+                                      for position, carpark in enumerate(carpark_availability)])
+        old_snapshots = "SELECT snapshot_id FROM snapshots ORDER BY snapshot_id DESC LIMIT -1 OFFSET ?"
+        carpark_database.execute(f"DELETE FROM carpark_availability WHERE snapshot_id IN ({old_snapshots})",
+                                 (KEPT_SNAPSHOTS,))
+        carpark_database.execute(f"DELETE FROM snapshots WHERE snapshot_id IN ({old_snapshots})", (KEPT_SNAPSHOTS,))
+    return snapshot_id
+
+def get_latest_snapshot(carpark_database):
+    #Returns the id and timestamp of the most recent availability snapshot, (None, "") if there are none
+    snapshot = carpark_database.execute("SELECT snapshot_id, timestamp FROM snapshots "
+                                        "ORDER BY snapshot_id DESC LIMIT 1").fetchone()
+    if not snapshot:
+        return None, ""
+    return int(snapshot["snapshot_id"]), snapshot["timestamp"]
+
+def count_carpark_information(carpark_database):
+    #Option 1: Returns the number of carparks in the carpark information
+    return int(carpark_database.execute('SELECT COUNT(*) AS "Count" FROM carpark_information').fetchone()["Count"])
+
+def query_carparks_by_type(carpark_database, carpark_type):
+    #Option 2: Returns the carparks of a carpark type, using the carpark type index
+    return carpark_database.execute(f"SELECT {INFORMATION_SELECT} FROM carpark_information "
+                                    "WHERE carpark_type = ? ORDER BY position", (carpark_type,)).fetchall()
+
+def query_carpark_information(carpark_database):
+    #Option 18: Returns every carpark in the carpark information
+    return carpark_database.execute(f"SELECT {INFORMATION_SELECT} FROM carpark_information ORDER BY position").fetchall()
+
+def query_carpark_addresses(carpark_database):
+    #Options 8 & 15: Returns the address of every carpark, for the fuzzy address index
+    return [carpark["Address"] for carpark in 
+            carpark_database.execute('SELECT address AS "Address" FROM carpark_information ORDER BY position')]
+
+def query_carparks_by_number(carpark_database, carpark_numbers):
+    #Options 12, 13 & 15: Returns the carparks with the carpark numbers, in the order of the carpark numbers
+    carpark_numbers = list(carpark_numbers)
+    placeholders = ", ".join("?" * len(carpark_numbers))
+    rows = carpark_database.execute(f"SELECT {INFORMATION_SELECT} FROM carpark_information "
+                                    f"WHERE carpark_number IN ({placeholders})", carpark_numbers).fetchall()
+    carparks = {carpark["Carpark Number"]: carpark for carpark in rows}
+    return [carparks[carpark_number] for carpark_number in carpark_numbers if carpark_number in carparks]
+
+def query_nearest_carparks(carpark_database, address):
+    """
+    Option 15: Returns the carparks at the address, sorted by their distance from the centre of those carparks
+
+    Parameters:
+        carpark_database (sqlite3.Connection): The connection to the carpark database
+        address (str): The address that is searched for
+
+    Returns:
+        nearest_carparks (list[dict]): The carparks at the address, nearest to the centre first
+    """
+    return carpark_database.execute(f"""
+        WITH matches AS (SELECT * FROM carpark_information WHERE instr(lower(address), lower(:address)) > 0),
+             centre AS (SELECT AVG(x) AS x, AVG(y) AS y FROM matches)
+        SELECT {information_select("matches")} FROM matches, centre AS c
+        ORDER BY (matches.x - c.x) * (matches.x - c.x) + (matches.y - c.y) * (matches.y - c.y), matches.position
+        """, {"address": address}).fetchall()
+
+def query_carparks_near_point(carpark_database, X, Y, limit):
+    """
+    Option 15: Returns the carparks nearest to the SVY21 point X, Y. Only the carparks in a box around the point
+    are read with the coordinates index, and the box is doubled until the limit of carparks are in the circle
+    inside it, or it holds every carpark.
+
+    Parameters:
+        carpark_database (sqlite3.Connection): The connection to the carpark database
+        X (float): The X coordinate of the point
+        Y (float): The Y coordinate of the point
+        limit (int): The number of carparks returned, every carpark with coordinates if negative
+
+    Returns:
+        nearest_carparks (list[dict]): The carparks nearest to the point, nearest first
+    """
+    order = "ORDER BY (x - :x) * (x - :x) + (y - :y) * (y - :y), position LIMIT :limit"
+    parameters = {"x": X, "y": Y, "limit": limit}
+    if limit < 0:
+        return carpark_database.execute(f"SELECT {INFORMATION_SELECT} FROM carpark_information "
+                                        f"WHERE typeof(x) = 'real' {order}", parameters).fetchall()
+
+    extent = carpark_database.execute('SELECT MIN(x) AS "Min X", MAX(x) AS "Max X", MIN(y) AS "Min Y", '
+                                      'MAX(y) AS "Max Y" FROM carpark_information WHERE typeof(x) = \'real\'').fetchone()
+    if not extent["Min X"]:
+        return []
+    radius = NEAR_POINT_RADIUS
+    while True:
+        nearest_carparks = carpark_database.execute(
+            f"SELECT {INFORMATION_SELECT} FROM carpark_information WHERE x BETWEEN :min_x AND :max_x "
+            f"AND y BETWEEN :min_y AND :max_y AND typeof(x) = 'real' {order}",
+            dict(parameters, min_x=X - radius, max_x=X + radius, min_y=Y - radius, max_y=Y + radius)).fetchall()
+        #A carpark outside the box is further than radius, so the carparks in the circle are the nearest
+        if len(nearest_carparks) == limit:
+            farthest = nearest_carparks[-1]
+            if (float(farthest["X"]) - X) ** 2 + (float(farthest["Y"]) - Y) ** 2 <= radius ** 2:
+                return nearest_carparks
+        if (X - radius <= float(extent["Min X"]) and X + radius >= float(extent["Max X"])
+                and Y - radius <= float(extent["Min Y"]) and Y + radius >= float(extent["Max Y"])):
+            return nearest_carparks
+        radius *= 2
+
+def count_carpark_availability(carpark_database, snapshot_id):
+    #Option 4: Returns the number of carparks in the availability snapshot
+    return int(carpark_database.execute('SELECT COUNT(*) AS "Count" FROM carpark_availability WHERE snapshot_id = ?',
+                                        (snapshot_id,)).fetchone()["Count"])
+
+def query_carparks_without_lots(carpark_database, snapshot_id):
+    #Option 5: Returns the carparks without available lots, using the lots available index
+    return carpark_database.execute(AVAILABILITY_SELECT + "AND a.lots_available = 0 ORDER BY a.position",
+                                    {"snapshot_id": snapshot_id}).fetchall()
+
+def query_carparks_above_percentage(carpark_database, snapshot_id, percentage):
+    #Options 6 & 7: Returns the carparks with more than percentage of their lots available
+    return carpark_database.execute(AVAILABILITY_SELECT + "AND a.percentage > :percentage ORDER BY a.position",
+                                    {"snapshot_id": snapshot_id, "percentage": percentage}).fetchall()
+
+def query_carparks_at_address(carpark_database, snapshot_id, location):
+    #Option 8: Returns the carparks whose address contains the location
+    return carpark_database.execute(AVAILABILITY_SELECT + "AND instr(lower(i.address), lower(:location)) > 0 "
+                                    "ORDER BY a.position", {"snapshot_id": snapshot_id, "location": location}).fetchall()
+
+def query_carpark_with_most_lots(carpark_database, snapshot_id):
+    #Option 9: Returns a list of the first carpark with the most total lots, empty if the snapshot has no carparks
+    return carpark_database.execute(AVAILABILITY_SELECT + "ORDER BY a.total_lots DESC, a.position LIMIT 1",
+                                    {"snapshot_id": snapshot_id}).fetchall()
+
+def query_carparks_by_lots_available(carpark_database, snapshot_id):
+    #Option 10: Returns the carparks sorted by their lots available
+    return carpark_database.execute(AVAILABILITY_SELECT + "ORDER BY a.lots_available, a.position",
+                                    {"snapshot_id": snapshot_id}).fetchall()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import re
+import operator
+from bisect import bisect_left, bisect_right
+
+NUMERIC_HEADERS = ["X", "Y", "Carpark Deck", "Gantry Height", "Total Lots", "Lots Available", "Percentage"]
+AVAILABILITY_HEADERS = ["Total Lots", "Lots Available", "Percentage"]
+
+OPERATORS = {"=": operator.eq,
+             "==": operator.eq,
+             "!=": operator.ne,
+             ">": operator.gt,
+             ">=": operator.ge,
+             "<": operator.lt,
+             "<=": operator.le,
+             "~": lambda value, text: text in value}
+
+CLAUSE_PATTERN = re.compile(r"^\s*(?P<header>.+?)\s*(?P<operator>>=|<=|!=|==|=|>|<|~)\s*(?P<value>.+?)\s*$")
+AND_PATTERN = re.compile(r"\s+and\s+(?=(?:[^\"]*\"[^\"]*\")*[^\"]*$)", re.IGNORECASE)
+
+def to_number(value):
+    #Returns value as a float, None if it is not a number
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def build_filter_table(carpark_information, carpark_availability):
+    """
+    Build the columns that filters run on, from the carparks in both the carpark information and availability.
+    Numeric columns are stored as floats with a sorted index, text columns with an inverted index of
+    each value to the rows that have it.
+
+    Parameters:
+        carpark_information (list[dict]): The full list of carpark information
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+
+    Returns:
+        filter_table (dict): The "Rows", their "Availability", the "Columns" and the "Indexes" of each header
+    """
+    rows = []
+    availability_rows = []
+    for information_carpark in carpark_information:
+        availability_carpark = carpark_availability.get(information_carpark.get("Carpark Number"))
+        if not availability_carpark:
+            continue
+        total_lots = to_number(availability_carpark.get("Total Lots")) or 0.0
+        lots_available = to_number(availability_carpark.get("Lots Available")) or 0.0
+        percentage = round(lots_available / total_lots * 100, 1) if total_lots and lots_available else 0.0
+        rows.append(information_carpark)
+        availability_rows.append({"Total Lots": total_lots, "Lots Available": lots_available, "Percentage": percentage})
+
+    headers = [header for header in (carpark_information[0] if carpark_information else {})
+               if header not in AVAILABILITY_HEADERS] + AVAILABILITY_HEADERS
+    columns = {}
+    indexes = {}
+    for header in headers:
+        if header in AVAILABILITY_HEADERS:
+            column = [availability_carpark[header] for availability_carpark in availability_rows]
+        elif header in NUMERIC_HEADERS:
+            column = [to_number(carpark.get(header)) for carpark in rows]
+        else:
+            column = [carpark.get(header, "").upper() for carpark in rows]
+        columns[header] = column
+
+        if header in NUMERIC_HEADERS:
+            sorted_pairs = sorted((value, position) for position, value in enumerate(column) if value is not None)
+            indexes[header] = {"Keys": [value for value, _ in sorted_pairs],
+                               "Positions": [position for _, position in sorted_pairs]}
+        else:
+            inverted_index = {}
+            for position, value in enumerate(column):
+                inverted_index.setdefault(value, []).append(position)
+            indexes[header] = inverted_index
+
+    return {"Rows": rows, "Availability": availability_rows, "Columns": columns, "Indexes": indexes}
+
+def parse_filter(expression, headers):
+    """
+    Parse a filter expression such as 'Gantry Height >= 2.1 and Night Parking = YES and Percentage >= 30'
+    into its clauses. Clauses are joined with 'and', the operators are =, !=, >, >=, <, <= and ~ (contains).
+
+    Parameters:
+        expression (str): The filter expression
+        headers (list): The headers that can be filtered on
+
+    Returns:
+        clauses (list[tuple]): The (header, operator, value) of each clause, numeric values as floats
+    """
+    headers_by_name = {header.lower(): header for header in headers}
+    clauses = []
+    for clause_text in AND_PATTERN.split(expression.strip()):
+        match = CLAUSE_PATTERN.match(clause_text)
+        if not match:
+            raise ValueError(f"Invalid clause '{clause_text}', it should be like 'Carpark Deck > 3'")
+        header = headers_by_name.get(match["header"].strip('"').lower())
+        if not header:
+            raise ValueError(f"Invalid column '{match['header']}', the columns are: {', '.join(headers)}")
+        value = match["value"].strip('"')
+        if header in NUMERIC_HEADERS:
+            if match["operator"] == "~":
+                raise ValueError(f"Invalid operator '~' for the numeric column '{header}'")
+            number = to_number(value.rstrip("%"))
+            if number is None:
+                raise ValueError(f"Invalid value '{value}', '{header}' should be compared with a number")
+            clauses.append((header, match["operator"], number))
+        else:
+            if match["operator"] not in ("=", "==", "!=", "~"):
+                raise ValueError(f"Invalid operator '{match['operator']}' for the text column '{header}'")
+            clauses.append((header, match["operator"], value.upper()))
+    return clauses
+
+def compile_clause(filter_table, header, operator_symbol, value):
+    """
+    Compile a clause into the number of rows it matches and two functions, one that selects every matching
+    row from the index and one that tests a single row
+
+    Parameters:
+        filter_table (dict): The filter table built by build_filter_table
+        header (str): The header of the column
+        operator_symbol (str): The operator of the clause
+        value (float or str): The value that the column is compared with
+
+    Returns:
+        compiled_clause (dict): The "Count" of matching rows, the "Select" and "Test" functions
+    """
+    column = filter_table["Columns"][header]
+    index = filter_table["Indexes"][header]
+    compare = OPERATORS[operator_symbol]
+
+    def test(position):
+        column_value = column[position]
+        return column_value is not None and compare(column_value, value)
+
+    if header in NUMERIC_HEADERS and operator_symbol != "!=":
+        keys = index["Keys"]
+        start, end = {"=": (bisect_left(keys, value), bisect_right(keys, value)),
+                      "==": (bisect_left(keys, value), bisect_right(keys, value)),
+                      ">": (bisect_right(keys, value), len(keys)),
+                      ">=": (bisect_left(keys, value), len(keys)),
+                      "<": (0, bisect_left(keys, value)),
+                      "<=": (0, bisect_right(keys, value))}[operator_symbol]
+        return {"Count": max(end - start, 0), "Select": lambda: index["Positions"][start:end], "Test": test}
+
+    if header not in NUMERIC_HEADERS and operator_symbol in ("=", "=="):
+        positions = index.get(value, [])
+        return {"Count": len(positions), "Select": lambda: list(positions), "Test": test}
+
+    if header not in NUMERIC_HEADERS and operator_symbol == "~":
+        matching_values = [indexed_value for indexed_value in index if value in indexed_value]
+        count = sum(len(index[indexed_value]) for indexed_value in matching_values)
+        return {"Count": count,
+                "Select": lambda: [position for indexed_value in matching_values for position in index[indexed_value]],
+                "Test": test}
+
+    if header in NUMERIC_HEADERS:
+        count = len(index["Keys"]) - (bisect_right(index["Keys"], value) - bisect_left(index["Keys"], value))
+    else:
+        count = len(column) - len(index.get(value, []))
+    return {"Count": count, "Select": lambda: [position for position in range(len(column)) if test(position)],
+            "Test": test}
+
+def compile_filter(filter_table, clauses):
+    #Returns the compiled clauses ordered from the most selective (fewest matching rows) to the least
+    compiled_clauses = [compile_clause(filter_table, *clause) for clause in clauses]
+    return sorted(compiled_clauses, key=lambda compiled_clause: compiled_clause["Count"])
+
+def run_filter(filter_table, compiled_clauses):
+    """
+    Returns the rows matching every compiled clause. The most selective clause selects its rows from
+    its index and each following clause only tests the rows that are left.
+
+    Parameters:
+        filter_table (dict): The filter table built by build_filter_table
+        compiled_clauses (list[dict]): The clauses compiled by compile_filter
+
+    Returns:
+        matches (list[tuple]): The (carpark, availability) of each matching row, in the order of the rows
+    """
+    if not compiled_clauses:
+        positions = range(len(filter_table["Rows"]))
+    else:
+        positions = compiled_clauses[0]["Select"]()
+        for compiled_clause in compiled_clauses[1:]:
+            if not positions:
+                break
+            test = compiled_clause["Test"]
+            positions = [position for position in positions if test(position)]
+        positions = sorted(positions)
+    return [(filter_table["Rows"][position], filter_table["Availability"][position]) for position in positions]
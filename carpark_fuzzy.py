@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import re
+from itertools import product
+
+TOKEN_PATTERN = re.compile(r"[A-Z0-9]+")
+#Street name abbreviations and their full words, a query can use either form of a word in an address
+ABBREVIATIONS = {"AVE": "AVENUE", "ST": "STREET", "RD": "ROAD", "DR": "DRIVE", "CRES": "CRESCENT", "NTH": "NORTH",
+                 "STH": "SOUTH", "CTRL": "CENTRAL", "UPP": "UPPER", "JLN": "JALAN", "LOR": "LORONG", "BT": "BUKIT",
+                 "GDNS": "GARDENS", "IND": "INDUSTRIAL", "PK": "PARK"}
+FULL_WORDS = {full_word: abbreviation for abbreviation, full_word in ABBREVIATIONS.items()}
+
+def tokenize(text):
+    #Returns the upper case words and numbers in text
+    return TOKEN_PATTERN.findall(text.upper())
+
+def calculate_edit_distance(word1, word2):
+    """
+    Returns the Levenshtein distance between two words, the number of single character insertions,
+    deletions and substitutions needed to change one into the other
+
+    Parameters:
+        word1 (str): The first word
+        word2 (str): The second word
+
+    Returns:
+        distance (int): The edit distance
+    """
+    if len(word1) < len(word2):
+        word1, word2 = word2, word1
+    previous_row = list(range(len(word2) + 1))
+    for index1, char1 in enumerate(word1, start=1):
+        current_row = [index1]
+        for index2, char2 in enumerate(word2, start=1):
+            current_row.append(min(previous_row[index2] + 1,
+                                   current_row[index2 - 1] + 1,
+                                   previous_row[index2 - 1] + (char1 != char2)))
+        previous_row = current_row
+    return previous_row[-1]
+
+def get_max_distance(word):
+    #Returns the number of typos allowed in a word, none for short words and numbers
+    if word.isdigit() or len(word) <= 3:
+        return 0
+    if len(word) <= 6:
+        return 1
+    return 2
+
+def build_fuzzy_index(addresses):
+    """
+    Build the fuzzy address index: a BK-tree of every distinct word in the addresses and the addresses
+    that contain each word. Built once, so a search only compares the query with a few tree nodes.
+
+    Parameters:
+        addresses (list[str]): The addresses of the carparks
+
+    Returns:
+        fuzzy_index (dict): The "Tree" of words and the "Addresses" of each word
+    """
+    word_addresses = {}
+    for address in addresses:
+        for word in tokenize(address):
+            word_addresses.setdefault(word, set()).add(address)
+
+    tree = None
+    for word in word_addresses:
+        if tree is None:
+            tree = [word, {}]
+            continue
+        node = tree
+        while True:
+            distance = calculate_edit_distance(word, node[0])
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [word, {}]
+                break
+            node = child
+    return {"Tree": tree, "Addresses": word_addresses}
+
+def find_similar_words(fuzzy_index, word, max_distance):
+    """
+    Returns the indexed words within max_distance edits of word, nearest first
+
+    Parameters:
+        fuzzy_index (dict): The fuzzy address index
+        word (str): The upper case word that is searched for
+        max_distance (int): The largest edit distance returned
+
+    Returns:
+        similar_words (list[tuple]): The (distance, word) of each similar word
+    """
+    if word in fuzzy_index["Addresses"]:
+        return [(0, word)]
+    similar_words = []
+    nodes = [fuzzy_index["Tree"]] if fuzzy_index["Tree"] else []
+    while nodes:
+        node_word, children = nodes.pop()
+        distance = calculate_edit_distance(word, node_word)
+        if distance <= max_distance:
+            similar_words.append((distance, node_word))
+        #Only the children within max_distance of this node's distance can be within max_distance of word
+        for child_distance in range(distance - max_distance, distance + max_distance + 1):
+            child = children.get(child_distance)
+            if child:
+                nodes.append(child)
+    return sorted(similar_words)
+
+def get_word_forms(fuzzy_index, word):
+    #Returns the forms of a word that are in the addresses, the word itself then its abbreviation or full word
+    return [word_form for word_form in (word, ABBREVIATIONS.get(word) or FULL_WORDS.get(word))
+            if word_form in fuzzy_index["Addresses"]]
+
+def is_in_addresses(fuzzy_index, words, text):
+    #Returns whether text is part of an address that has all of the words
+    addresses = set.intersection(*(fuzzy_index["Addresses"][word] for word in words))
+    return any(text in address for address in addresses)
+
+def correct_query(fuzzy_index, text):
+    """
+    Returns text with each unknown word replaced in place by the nearest indexed word, keeping the spaces and
+    punctuation between the words, None if nothing was corrected. Each word is corrected on its own, then
+    abbreviations such as AVE and AVENUE are swapped for the form the addresses use, so that the corrected
+    text is found in an address.
+
+    Parameters:
+        fuzzy_index (dict): The fuzzy address index
+        text (str): The location entered by the user
+
+    Returns:
+        corrected_text (str): The corrected location in upper case, or None
+    """
+    upper_text = text.strip().upper()
+    words = list(dict.fromkeys(tokenize(upper_text)))
+    if not words:
+        return None
+    word_forms = []
+    for word in words:
+        forms = get_word_forms(fuzzy_index, word)
+        if not forms:
+            similar_words = find_similar_words(fuzzy_index, word, get_max_distance(word))
+            if not similar_words:
+                return None
+            forms = get_word_forms(fuzzy_index, similar_words[0][1])
+        word_forms.append(forms)
+
+    corrected_text = None
+    for corrected_words in product(*word_forms):
+        corrections = dict(zip(words, corrected_words))
+        candidate_text = TOKEN_PATTERN.sub(lambda match: corrections[match.group()], upper_text)
+        if corrected_text is None:
+            corrected_text = candidate_text
+        if is_in_addresses(fuzzy_index, corrected_words, candidate_text):
+            corrected_text = candidate_text
+            break
+    if corrected_text == upper_text:
+        return None
+    return corrected_text
+
+def search_addresses(fuzzy_index, text, limit=5):
+    """
+    Returns the addresses that best match text, allowing typos in each word
+
+    Parameters:
+        fuzzy_index (dict): The fuzzy address index
+        text (str): The location entered by the user
+        limit (int): The number of addresses returned
+
+    Returns:
+        addresses (list[str]): The near matching addresses, best first
+    """
+    scores = {}
+    words = tokenize(text)
+    for word in words:
+        for distance, similar_word in find_similar_words(fuzzy_index, word, get_max_distance(word)):
+            word_score = 1 - distance / max(len(word), 1)
+            for address in fuzzy_index["Addresses"][similar_word]:
+                best_scores = scores.setdefault(address, {})
+                best_scores[word] = max(best_scores.get(word, 0), word_score)
+    ranked_addresses = sorted(scores, key=lambda address: (-sum(scores[address].values()), len(address), address))
+    return ranked_addresses[:limit]
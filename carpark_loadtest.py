@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import math
+import time
+import asyncio
+import argparse
+
+DEFAULT_PATHS = ["/count",
+                 "/basement",
+                 "/threshold?percentage=50",
+                 "/address?location=aljunied",
+                 "/most-lots",
+                 "/nearest?address=bishan",
+                 "/favourites?user=default",
+                 "/tiles?level=3&bbox=1.28,103.80,1.36,103.90"]
+
+def calculate_percentile(sorted_latencies, percentile):
+    """
+    Returns the percentile of the latencies using the nearest-rank method
+
+    Parameters:
+        sorted_latencies (list[float]): The latencies sorted from fastest to slowest
+        percentile (float): The percentile between 0 and 100
+
+    Returns:
+        latency (float): The latency at the percentile
+    """
+    if not sorted_latencies:
+        return 0.0
+    rank = max(math.ceil(percentile / 100 * len(sorted_latencies)), 1)
+    return sorted_latencies[rank - 1]
+
+async def read_response(reader):
+    #Reads a HTTP response and returns its status code
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by the server")
+    content_length = 0
+    while True:
+        header_line = await reader.readline()
+        if header_line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header_line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            content_length = int(value)
+    await reader.readexactly(content_length)
+    return int(status_line.split()[1])
+
+async def run_connection(host, port, paths, number_of_requests, latencies, errors):
+    """
+    Send requests one after another on a keep-alive connection, recording the latency of each
+
+    Parameters:
+        host (str): The host of the server
+        port (int): The port of the server
+        paths (list[str]): The paths that are requested in turn
+        number_of_requests (int): The number of requests sent on this connection
+        latencies (list[float]): The latencies in seconds, appended to
+        errors (list[str]): The errors, appended to
+
+    Returns:
+        None
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request_number in range(number_of_requests):
+            path = paths[request_number % len(paths)]
+            request = f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode("latin-1")
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(f"{path}: HTTP {status}")
+    except (ConnectionError, asyncio.IncompleteReadError) as err:
+        errors.append(f"Connection error occurred: {err}")
+    finally:
+        writer.close()
+
+async def run_load_test(host, port, paths, connections, number_of_requests):
+    """
+    Send number_of_requests requests spread over concurrent connections
+
+    Parameters:
+        host (str): The host of the server
+        port (int): The port of the server
+        paths (list[str]): The paths that are requested in turn
+        connections (int): The number of concurrent connections
+        number_of_requests (int): The total number of requests
+
+    Returns:
+        results (dict): The number of requests, errors, elapsed seconds, throughput and latencies
+    """
+    latencies = []
+    errors = []
+    requests_per_connection = [number_of_requests // connections + (1 if index < number_of_requests % connections else 0)
+                               for index in range(connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*[run_connection(host, port, paths, count, latencies, errors)
+                           for count in requests_per_connection if count])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"Requests": len(latencies),
+            "Errors": len(errors),
+            "Elapsed": elapsed,
+            "Throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "p50": calculate_percentile(latencies, 50),
+            "p99": calculate_percentile(latencies, 99),
+            "Max": latencies[-1] if latencies else 0.0,
+            "Error Messages": errors[:5]}
+
+def display_results(results):
+    #Prints the results of the load test
+    print(f"Requests:   {results['Requests']} ({results['Errors']} errors) in {results['Elapsed']:.2f}s")
+    print(f"Throughput: {results['Throughput']:.1f} requests/s")
+    print(f"Latency:    p50 {results['p50'] * 1000:.2f}ms, p99 {results['p99'] * 1000:.2f}ms, "
+          f"max {results['Max'] * 1000:.2f}ms")
+    for message in results["Error Messages"]:
+        print(f"Error: {message}")
+
+def parse_arguments():
+    #Returns the command line arguments of the load test
+    parser = argparse.ArgumentParser(description="Load test a local carpark_server.py instance")
+    parser.add_argument("--host", default="127.0.0.1", help="the host of the server (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="the port of the server (default: %(default)s)")
+    parser.add_argument("--connections", type=int, default=16,
+                        help="the number of concurrent connections (default: %(default)s)")
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="the total number of requests (default: %(default)s)")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="a path to request, can be repeated (default: every endpoint)")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    results = asyncio.run(run_load_test(arguments.host, arguments.port, arguments.paths or DEFAULT_PATHS,
+                                        max(arguments.connections, 1), arguments.requests))
+    display_results(results)
+
+if __name__ == "__main__":
+    main()
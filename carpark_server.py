@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import os
+import json
+import asyncio
+import argparse
+from urllib.parse import urlsplit, parse_qs
+
+import S10256965_Assignment_Advanced as carpark
+import carpark_coordinates as cpc
+import carpark_fuzzy as cpz
+import carpark_tiles as cpt
+
+AVAILABILITY_HEADERS = ["Carpark Number", "Total Lots", "Lots Available", "Percentage", "Address"]
+INFORMATION_HEADERS = ["Carpark Number", "Carpark Type", "Type of Parking System", "Address"]
+NEAREST_HEADERS = ["Carpark Number", "Carpark Type", "Type of Parking System", "Total Lots", "Lots Available", "Address"]
+
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error",
+                  503: "Service Unavailable"}
+
+def load_dataset(information_file_name, availability_file_name, favourites_file_name):
+    """
+    Load the carpark information and availability once for every request to share
+
+    Parameters:
+        information_file_name (str): The name of the full carpark information file
+        availability_file_name (str): The name of the carpark availability file
+        favourites_file_name (str): The path of the Favourites database
+
+    Returns:
+        dataset (dict): The carpark information and availability, with lookups by carpark number
+    """
+    carpark_registry = carpark.load_carpark_registry(information_file_name)
+    if carpark_registry is None:
+        raise SystemExit(1)
+    carpark_information = carpark_registry["Carpark Information"]
+    try:
+        carpark_availability, timestamp = carpark.read_carpark_availability(availability_file_name)
+    except (OSError, ValueError) as err:
+        print(carpark.describe_file_error(availability_file_name, err))
+        raise SystemExit(1)
+    carpark_availability = carpark.append_addresses(carpark_availability, carpark_information)
+    carpark_availability = carpark.append_percentages(carpark_availability)
+
+    availability_by_number = {availability_carpark["Carpark Number"]: availability_carpark
+                              for availability_carpark in carpark_availability}
+
+    favourites_folder = os.path.dirname(favourites_file_name)
+    if favourites_folder and not os.path.exists(favourites_folder):
+        os.mkdir(favourites_folder)
+
+    return {"Carpark Information": carpark_information,
+            "Information By Number": carpark_registry["Carpark Numbers"],
+            "Carpark Categories": carpark_registry["Carpark Categories"],
+            "Carpark Coordinates": cpc.get_carpark_coordinates(carpark_registry),
+            "Fuzzy Index": cpz.build_fuzzy_index([carpark["Address"] for carpark in carpark_information]),
+            "Carpark Availability": carpark_availability,
+            "Availability By Number": availability_by_number,
+            "Tile Pyramid": cpt.build_tile_pyramid(carpark_information, availability_by_number),
+            "Timestamp": timestamp,
+            "Favourites Store": carpark.open_favourites_store(favourites_file_name)}
+
+def get_parameter(parameters, name):
+    #Returns the first value of a query string parameter, raises ValueError if it is missing
+    values = parameters.get(name)
+    if not values or not values[0].strip():
+        raise ValueError(f"The '{name}' parameter is required")
+    return values[0].strip()
+
+def select(carpark_list, headers):
+    #Returns the carparks with only the headers
+    return [{header: carpark_data.get(header, "") for header in headers} for carpark_data in carpark_list]
+
+def query_count(dataset, parameters):
+    #GET /count: The number of carparks in the carpark information and availability
+    return {"Carpark Information": len(dataset["Carpark Information"]),
+            "Carpark Availability": len(dataset["Carpark Availability"]),
+            "Timestamp": dataset["Timestamp"]}
+
+def query_basement(dataset, parameters):
+    #GET /basement: The 'BASEMENT CAR PARK's
+    carparks = carpark.select_carparks_by_category(dataset["Carpark Information"], dataset["Carpark Categories"],
+                                                   "Carpark Type", "BASEMENT CAR PARK")
+    return {"Total Number": len(carparks), "Carparks": select(carparks, INFORMATION_HEADERS)}
+
+def query_threshold(dataset, parameters):
+    #GET /threshold?percentage=x: The carparks with more than x% of their lots available
+    try:
+        percentage = float(get_parameter(parameters, "percentage"))
+    except ValueError as err:
+        raise ValueError(f"Invalid percentage, {err}") from None
+    if not 0 <= percentage <= 100:
+        raise ValueError("Invalid percentage, it should be between 0 and 100")
+    carparks = carpark.find_carparks_above_percentage(dataset["Carpark Availability"], percentage)
+    return {"Total Number": len(carparks), "Carparks": select(carparks, AVAILABILITY_HEADERS)}
+
+def find_corrected(dataset, text, find):
+    """
+    Returns the result of find for text, or for text with its typos corrected by the fuzzy address index if
+    there is no result, the same as options 8 and 15
+
+    Parameters:
+        dataset (dict): The loaded carpark information and availability
+        text (str): The location or address searched for
+        find (function): Returns the carparks found for a text
+
+    Returns:
+        result (dict): The "Total Number" and "Carparks" found, the "Corrected" text if it was used, and the
+        "Suggestions" of addresses if nothing was found
+    """
+    carparks = find(text)
+    corrected_text = None
+    if not carparks:
+        corrected_text = cpz.correct_query(dataset["Fuzzy Index"], text)
+        carparks = find(corrected_text) if corrected_text else []
+    result = {"Total Number": len(carparks), "Carparks": carparks}
+    if carparks and corrected_text:
+        result["Corrected"] = corrected_text
+    if not carparks:
+        result["Suggestions"] = cpz.search_addresses(dataset["Fuzzy Index"], text)
+    return result
+
+def query_address(dataset, parameters):
+    #GET /address?location=x: The carparks whose address contains x
+    location = get_parameter(parameters, "location")
+    return find_corrected(dataset, location,
+                          lambda text: select(carpark.find_carparks_at_location(dataset["Carpark Availability"], text),
+                                              AVAILABILITY_HEADERS))
+
+def query_most_lots(dataset, parameters):
+    #GET /most-lots: The first carpark with the most total lots
+    carpark_availability = dataset["Carpark Availability"]
+    if not carpark_availability:
+        return {"Carpark": None}
+    most_lots = max(carpark_availability, key=lambda availability_carpark: int(availability_carpark["Total Lots"]))
+    return {"Carpark": select([most_lots], AVAILABILITY_HEADERS)[0]}
+
+def query_nearest(dataset, parameters):
+    #GET /nearest?address=x: The carparks at x, sorted by their distance from the centre of those carparks
+    #GET /nearest?lat=x&lon=y: The carparks nearest to the latitude, longitude
+    if "lat" in parameters or "lon" in parameters:
+        address = f"{get_parameter(parameters, 'lat')}, {get_parameter(parameters, 'lon')}"
+        if not cpc.parse_latitude_longitude(address):
+            raise ValueError("Invalid latitude, longitude")
+    else:
+        address = get_parameter(parameters, "address")
+
+    def find_nearest(text):
+        _, sorted_nearby_carparks = carpark.find_nearest_carparks(dataset["Carpark Information"], text)
+        return join_availability(dataset, sorted_nearby_carparks)
+    return find_corrected(dataset, address, find_nearest)
+
+def query_favourites(dataset, parameters):
+    #GET /favourites?user=x: The Favourite carparks of user x
+    user_name = get_parameter(parameters, "user")
+    favourite_carparks = carpark.get_favourite_carparks(dataset["Favourites Store"], user_name)
+    carparks = join_availability(dataset, favourite_carparks)
+    return {"User": user_name, "Total Number": len(carparks), "Carparks": carparks}
+
+def query_tiles(dataset, parameters):
+    #GET /tiles?level=x&bbox=min_lat,min_lon,max_lat,max_lon: The free lots and occupancy of the tiles at level x
+    level = cpt.parse_level(get_parameter(parameters, "level"))
+    bounding_box = cpt.parse_bounding_box(get_parameter(parameters, "bbox")) if "bbox" in parameters else None
+    tiles = cpt.add_tile_centres(cpt.query_tiles(dataset["Tile Pyramid"], level, bounding_box))
+    return {"Level": level, "Tile Size": cpt.TILE_SIZES[level], "Total Number": len(tiles), "Tiles": tiles}
+
+def join_availability(dataset, carpark_numbers):
+    #Returns the information and availability of the carpark numbers that are in both
+    carparks = []
+    for carpark_number in carpark_numbers:
+        information_carpark = dataset["Information By Number"].get(carpark_number)
+        availability_carpark = dataset["Availability By Number"].get(carpark_number)
+        if information_carpark and availability_carpark:
+            carpark_data = {header: information_carpark.get(header, availability_carpark.get(header))
+                            for header in NEAREST_HEADERS}
+            carpark_data["Latitude"], carpark_data["Longitude"] = dataset["Carpark Coordinates"].get(carpark_number, (None, None))
+            carparks.append(carpark_data)
+    return carparks
+
+ROUTES = {"/count": query_count,
+          "/basement": query_basement,
+          "/threshold": query_threshold,
+          "/address": query_address,
+          "/most-lots": query_most_lots,
+          "/nearest": query_nearest,
+          "/favourites": query_favourites,
+          "/tiles": query_tiles}
+
+def handle_request(dataset, method, target):
+    """
+    Run the query for a request
+
+    Parameters:
+        dataset (dict): The loaded carpark information and availability
+        method (str): The HTTP method of the request
+        target (str): The path and query string of the request
+
+    Returns:
+        status (int): The HTTP status code
+        body (dict): The JSON body of the response
+    """
+    url = urlsplit(target)
+    query = ROUTES.get(url.path.rstrip("/") or "/")
+    if not query:
+        return 404, {"Error": f"Unknown endpoint '{url.path}'", "Endpoints": list(ROUTES)}
+    if method != "GET":
+        return 405, {"Error": f"Invalid method '{method}', only GET is allowed"}
+    try:
+        return 200, query(dataset, parse_qs(url.query))
+    except ValueError as err:
+        return 400, {"Error": str(err)}
+    except Exception as err:
+        return 500, {"Error": f"Error occurred: {err}"}
+
+def encode_response(status, body, keep_alive):
+    #Returns the bytes of a HTTP/1.1 JSON response
+    content = json.dumps(body).encode()
+    head = (f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + content
+
+async def handle_connection(reader, writer, dataset):
+    """
+    Serve the requests on a connection until the client closes it, keeping the connection alive between requests
+
+    Parameters:
+        reader (asyncio.StreamReader): The stream that the requests are read from
+        writer (asyncio.StreamWriter): The stream that the responses are written to
+        dataset (dict): The loaded carpark information and availability
+
+    Returns:
+        None
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                header_line = await reader.readline()
+                if header_line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header_line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            content_length = headers.get("content-length", "0")
+            if content_length.isdigit() and int(content_length) > 0:
+                await reader.readexactly(int(content_length))
+
+            request = request_line.decode("latin-1").split()
+            if len(request) != 3:
+                writer.write(encode_response(400, {"Error": "Invalid request line"}, False))
+                await writer.drain()
+                break
+
+            method, target, version = request
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            status, body = handle_request(dataset, method, target)
+            writer.write(encode_response(status, body, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def serve(dataset, host, port):
+    """
+    Serve the queries on host:port until the server is stopped
+
+    Parameters:
+        dataset (dict): The loaded carpark information and availability
+        host (str): The host that the server listens on
+        port (int): The port that the server listens on
+
+    Returns:
+        None
+    """
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(reader, writer, dataset), host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving {', '.join(ROUTES)} on http://{address[0]}:{address[1]}, press Ctrl+C to stop.")
+    async with server:
+        await server.serve_forever()
+
+def parse_arguments():
+    #Returns the command line arguments of the server
+    parser = argparse.ArgumentParser(description="HTTP/JSON service for the carpark queries")
+    parser.add_argument("--information", default="carpark-information-full.csv",
+                        help="the full carpark information file (default: %(default)s)")
+    parser.add_argument("--availability", default="carpark-availability-v2.csv",
+                        help="the carpark availability file (default: %(default)s)")
+    parser.add_argument("--favourites", default=carpark.USER_FAVOURITES_FILE_PATH,
+                        help="the Favourites database (default: %(default)s)")
+    parser.add_argument("--host", default="127.0.0.1", help="the host to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="the port to listen on (default: %(default)s)")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    dataset = load_dataset(arguments.information, arguments.availability, arguments.favourites)
+    try:
+        asyncio.run(serve(dataset, arguments.host, arguments.port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
+    finally:
+        dataset["Favourites Store"].close()
+
+if __name__ == "__main__":
+    main()
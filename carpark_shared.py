@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import os
+import json
+import mmap
+import time
+import struct
+import argparse
+from array import array
+
+import S10256965_Assignment_Advanced as carpark
+
+SHARED_DATASET_FOLDER_PATH = os.path.relpath("user/shared")
+POINTER_FILE_NAME = "current.json"
+MAGIC = b"CPDS"
+ALIGNMENT = 8
+KEPT_VERSIONS = 2
+
+REGISTRY_COLUMNS = [("Carpark Number", "str"), ("Address", "str"), ("Carpark Type", "str"),
+                    ("Type of Parking System", "str"), ("X", "d"), ("Y", "d")]
+AVAILABILITY_COLUMNS = [("Total Lots", "i"), ("Lots Available", "i")]
+#The value of the availability columns of a carpark that is not in the snapshot, read back as None (unknown)
+MISSING_LOTS = -1
+
+def write_dataset_file(file_name, header, columns):
+    """
+    Write typed columns to a dataset file: the magic bytes, the length of a JSON header describing where each
+    column is, the header, then each column's bytes aligned to 8 bytes. Numeric columns are arrays, text columns
+    are an array of offsets into a blob of UTF-8 text.
+
+    Parameters:
+        file_name (str): The name of the dataset file
+        header (dict): The fields of the header, such as the version
+        columns (list[tuple]): The (header, type code, values) of each column, type 'str' for text
+
+    Returns:
+        None
+    """
+    buffers = []
+    descriptors = {}
+    offset = 0
+    for name, type_code, values in columns:
+        if type_code == "str":
+            encoded_values = [value.encode() for value in values]
+            offsets = array("I", [0])
+            for encoded_value in encoded_values:
+                offsets.append(offsets[-1] + len(encoded_value))
+            parts = {"Offsets": offsets.tobytes(), "Data": b"".join(encoded_values)}
+        else:
+            parts = {"Data": array(type_code, values).tobytes()}
+        descriptors[name] = {"Type": type_code, "Count": len(values)}
+        for part, data in parts.items():
+            descriptors[name][part] = [offset, len(data)]
+            buffers.append(data)
+            offset += len(data)
+            buffers.append(bytes(-offset % ALIGNMENT))
+            offset += -offset % ALIGNMENT
+
+    encoded_header = json.dumps(dict(header, Columns=descriptors)).encode()
+    start = len(MAGIC) + 4 + len(encoded_header)
+    start += -start % ALIGNMENT
+    with open(file_name, "wb") as dataset_file:
+        dataset_file.write(MAGIC + struct.pack("<I", len(encoded_header)) + encoded_header)
+        dataset_file.write(bytes(start - dataset_file.tell()))
+        for data in buffers:
+            dataset_file.write(data)
+        dataset_file.flush()
+        os.fsync(dataset_file.fileno())
+
+def map_dataset_file(file_name):
+    """
+    Map a dataset file read-only. The columns are memoryviews of the mapped file, so every process that maps it
+    shares the same pages and nothing is copied.
+
+    Parameters:
+        file_name (str): The name of the dataset file
+
+    Returns:
+        mapped_dataset (dict): The "Header", the "Columns", and the "Map" and "Views" released by close_dataset_file
+    """
+    with open(file_name, "rb") as dataset_file:
+        memory_map = mmap.mmap(dataset_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if memory_map[:len(MAGIC)] != MAGIC:
+        memory_map.close()
+        raise ValueError(f"'{file_name}' is not a shared dataset file")
+    header_length = struct.unpack_from("<I", memory_map, len(MAGIC))[0]
+    header = json.loads(memory_map[len(MAGIC) + 4:len(MAGIC) + 4 + header_length])
+    start = len(MAGIC) + 4 + header_length
+    start += -start % ALIGNMENT
+
+    whole_view = memoryview(memory_map)
+    views = [whole_view]
+    columns = {}
+    for name, descriptor in header["Columns"].items():
+        offset, size = descriptor["Data"]
+        data = whole_view[start + offset:start + offset + size]
+        views.append(data)
+        if descriptor["Type"] == "str":
+            offset, size = descriptor["Offsets"]
+            offsets = whole_view[start + offset:start + offset + size].cast("I")
+            views.append(offsets)
+            columns[name] = (offsets, data)
+        else:
+            data = data.cast(descriptor["Type"])
+            views.append(data)
+            columns[name] = data
+    return {"Header": header, "Columns": columns, "Map": memory_map, "Views": views}
+
+def close_dataset_file(mapped_dataset):
+    #Releases the views of a mapped dataset file and unmaps it, the columns must not be used after
+    for view in reversed(mapped_dataset["Views"]):
+        view.release()
+    mapped_dataset["Map"].close()
+
+def get_text(text_column, index):
+    #Returns the text at index of a mapped text column
+    offsets, data = text_column
+    return bytes(data[offsets[index]:offsets[index + 1]]).decode()
+
+def read_pointer(folder):
+    #Returns the current version and dataset files of the shared dataset, None if nothing is published
+    try:
+        with open(os.path.join(folder, POINTER_FILE_NAME), "r") as pointer_file:
+            return json.load(pointer_file)
+    except FileNotFoundError:
+        return None
+
+def write_pointer(folder, pointer):
+    #Swaps the pointer to a new version atomically, readers see the old pointer or the new one, never half of each
+    temporary_file_name = os.path.join(folder, POINTER_FILE_NAME + ".tmp")
+    with open(temporary_file_name, "w") as pointer_file:
+        json.dump(pointer, pointer_file)
+        pointer_file.flush()
+        os.fsync(pointer_file.fileno())
+    os.replace(temporary_file_name, os.path.join(folder, POINTER_FILE_NAME))
+
+def remove_old_versions(folder, pointer):
+    #Deletes all but the newest dataset files of each kind, workers still mapping a deleted file keep its data
+    for kind in ("registry", "availability"):
+        file_names = sorted((entry.name for entry in os.scandir(folder)
+                             if entry.name.startswith(f"{kind}-") and entry.name.endswith(".bin")),
+                            key=lambda file_name: int(file_name.split("-")[1].split(".")[0]))
+        for file_name in file_names[:-KEPT_VERSIONS]:
+            if file_name in (pointer["Registry"], pointer["Availability"]):
+                continue
+            try:
+                os.remove(os.path.join(folder, file_name))
+            except OSError:
+                pass
+
+def to_float(value):
+    #Returns value as a float, NaN if it is not a number
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+def write_availability_file(folder, version, registry_file_name, carpark_numbers, carpark_availability, timestamp):
+    """
+    Write an availability snapshot to its own file, in the row order of a registry file. The lots of a registry
+    carpark that is not in the snapshot are MISSING_LOTS, which the header records as its "Missing" value.
+
+    Parameters:
+        folder (str): The folder of the shared dataset
+        version (int): The version the snapshot is published as
+        registry_file_name (str): The registry file whose rows the snapshot follows
+        carpark_numbers (iterable[str]): The carpark numbers of the registry, in row order
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+        timestamp (str): The timestamp of the snapshot
+
+    Returns:
+        availability_file_name (str): The name of the availability file in the folder
+    """
+    columns = {name: array("i") for name, _ in AVAILABILITY_COLUMNS}
+    for carpark_number in carpark_numbers:
+        availability_carpark = carpark_availability.get(carpark_number)
+        for name, _ in AVAILABILITY_COLUMNS:
+            columns[name].append(int(availability_carpark[name]) if availability_carpark else MISSING_LOTS)
+    availability_file_name = f"availability-{version}.bin"
+    write_dataset_file(os.path.join(folder, availability_file_name),
+                       {"Version": version, "Registry": registry_file_name, "Timestamp": timestamp,
+                        "Missing": MISSING_LOTS},
+                       [(name, type_code, columns[name]) for name, type_code in AVAILABILITY_COLUMNS])
+    return availability_file_name
+
+def publish_registry(folder, carpark_information, carpark_availability, timestamp):
+    """
+    Publish the carpark registry and its first availability snapshot as a new version, sorted by carpark number
+    so workers can search it in place. Both files are written before the pointer is swapped once, so workers
+    never see a registry without availability.
+
+    Parameters:
+        folder (str): The folder of the shared dataset
+        carpark_information (list[dict]): The full list of carpark information
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+        timestamp (str): The timestamp of the snapshot
+
+    Returns:
+        version (int): The published version
+    """
+    pointer = read_pointer(folder) or {"Version": 0}
+    version = pointer["Version"] + 1
+    sorted_carparks = sorted(carpark_information, key=lambda carpark_row: carpark_row["Carpark Number"])
+    columns = []
+    for name, type_code in REGISTRY_COLUMNS:
+        if type_code == "str":
+            values = [carpark_row.get(name, "") for carpark_row in sorted_carparks]
+        else:
+            values = [to_float(carpark_row.get(name)) for carpark_row in sorted_carparks]
+        columns.append((name, type_code, values))
+    registry_file_name = f"registry-{version}.bin"
+    write_dataset_file(os.path.join(folder, registry_file_name), {"Version": version}, columns)
+    availability_file_name = write_availability_file(folder, version, registry_file_name, columns[0][2],
+                                                     carpark_availability, timestamp)
+    pointer = {"Version": version, "Registry": registry_file_name, "Availability": availability_file_name,
+               "Timestamp": timestamp}
+    write_pointer(folder, pointer)
+    remove_old_versions(folder, pointer)
+    return version
+
+def publish_availability(folder, carpark_availability, timestamp):
+    """
+    Publish an availability snapshot as a new version of the current registry. The snapshot is written to its
+    own file before the pointer is swapped, so workers never see a partly written snapshot.
+
+    Parameters:
+        folder (str): The folder of the shared dataset
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+        timestamp (str): The timestamp of the snapshot
+
+    Returns:
+        version (int): The published version
+    """
+    pointer = read_pointer(folder)
+    if pointer is None:
+        raise ValueError("no registry has been published")
+    version = pointer["Version"] + 1
+    registry = map_dataset_file(os.path.join(folder, pointer["Registry"]))
+    try:
+        carpark_numbers = registry["Columns"]["Carpark Number"]
+        count = registry["Header"]["Columns"]["Carpark Number"]["Count"]
+        availability_file_name = write_availability_file(folder, version, pointer["Registry"],
+                                                         (get_text(carpark_numbers, index) for index in range(count)),
+                                                         carpark_availability, timestamp)
+    finally:
+        close_dataset_file(registry)
+    pointer = dict(pointer, Version=version, Availability=availability_file_name, Timestamp=timestamp)
+    write_pointer(folder, pointer)
+    remove_old_versions(folder, pointer)
+    return version
+
+def attach_shared_dataset(folder, attempts=3):
+    """
+    Attach to the current version of the shared dataset read-only
+
+    Parameters:
+        folder (str): The folder of the shared dataset
+        attempts (int): The number of times the pointer is read again if its files were replaced while attaching
+
+    Returns:
+        shared_dataset (dict): The "Version", "Timestamp", the mapped "Registry" and "Availability" (None if it
+        has not been published)
+    """
+    for attempt in range(attempts):
+        pointer = read_pointer(folder)
+        if pointer is None:
+            raise ValueError(f"nothing has been published to '{folder}'")
+        mapped_files = []
+        try:
+            for file_name in (pointer["Registry"], pointer["Availability"]):
+                mapped_files.append(map_dataset_file(os.path.join(folder, file_name)) if file_name else None)
+        except FileNotFoundError:
+            for mapped_file in mapped_files:
+                if mapped_file:
+                    close_dataset_file(mapped_file)
+            if attempt == attempts - 1:
+                raise
+            continue
+        return {"Version": pointer["Version"], "Timestamp": pointer["Timestamp"],
+                "Registry": mapped_files[0], "Availability": mapped_files[1]}
+
+def close_shared_dataset(shared_dataset):
+    #Detaches from a version of the shared dataset
+    for kind in ("Registry", "Availability"):
+        if shared_dataset[kind]:
+            close_dataset_file(shared_dataset[kind])
+
+def refresh_shared_dataset(shared_dataset, folder):
+    #Returns the newest version of the shared dataset, detaching from the given version if it is older
+    pointer = read_pointer(folder)
+    if pointer is None or pointer["Version"] == shared_dataset["Version"]:
+        return shared_dataset
+    new_shared_dataset = attach_shared_dataset(folder)
+    close_shared_dataset(shared_dataset)
+    return new_shared_dataset
+
+def find_carpark_index(shared_dataset, carpark_number):
+    #Returns the row of a carpark number by binary search over the sorted registry, None if it is not found
+    carpark_numbers = shared_dataset["Registry"]["Columns"]["Carpark Number"]
+    count = len(carpark_numbers[0]) - 1
+    low = 0
+    high = count
+    while low < high:
+        middle = (low + high) // 2
+        if get_text(carpark_numbers, middle) < carpark_number:
+            low = middle + 1
+        else:
+            high = middle
+    if low < count and get_text(carpark_numbers, low) == carpark_number:
+        return low
+    return None
+
+def get_shared_carpark(shared_dataset, index):
+    """
+    Returns the registry and availability of one row as a dict, the only values copied out of the shared dataset
+
+    Parameters:
+        shared_dataset (dict): The attached version of the shared dataset
+        index (int): The row of the carpark in the registry
+
+    Returns:
+        carpark_row (dict): The values of the row, the lots are None if the carpark is not in the snapshot
+    """
+    carpark_row = {}
+    for kind in ("Registry", "Availability"):
+        if not shared_dataset[kind]:
+            continue
+        missing = shared_dataset[kind]["Header"].get("Missing")
+        for name, column in shared_dataset[kind]["Columns"].items():
+            value = get_text(column, index) if isinstance(column, tuple) else column[index]
+            carpark_row[name] = None if missing is not None and value == missing else value
+    return carpark_row
+
+def parse_arguments():
+    #Returns the command line arguments of the shared dataset
+    parser = argparse.ArgumentParser(description="Carpark dataset shared by worker processes through mapped files")
+    parser.add_argument("--folder", default=SHARED_DATASET_FOLDER_PATH,
+                        help="the folder of the shared dataset (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    publish_parser = subparsers.add_parser("publish", help="publish the registry and an availability snapshot")
+    publish_parser.add_argument("--information", default="carpark-information-full.csv",
+                                help="the full carpark information file (default: %(default)s)")
+    publish_parser.add_argument("--availability", default=None,
+                                help="a 'carpark-availability-vX.csv' file used instead of the API snapshot")
+    publish_parser.add_argument("--url", default=carpark.API_URL, help="the availability API (default: %(default)s)")
+    publish_parser.add_argument("--interval", type=int, default=None,
+                                help="publish a new API snapshot every interval seconds (default: publish once)")
+
+    query_parser = subparsers.add_parser("query", help="attach to the shared dataset and show a carpark")
+    query_parser.add_argument("carpark_number")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    if arguments.command == "query":
+        try:
+            shared_dataset = attach_shared_dataset(arguments.folder)
+        except (ValueError, FileNotFoundError) as err:
+            print(f"Invalid folder, {err}")
+            return
+        try:
+            index = find_carpark_index(shared_dataset, arguments.carpark_number)
+            if index is None:
+                print(f"Carpark {arguments.carpark_number} is not in version {shared_dataset['Version']}")
+                return
+            print(f"Version {shared_dataset['Version']}, {shared_dataset['Timestamp']}")
+            for name, value in get_shared_carpark(shared_dataset, index).items():
+                print(f"{name}: {'unknown' if value is None else value}")
+        finally:
+            close_shared_dataset(shared_dataset)
+        return
+
+    carpark_registry = carpark.load_carpark_registry(arguments.information)
+    if carpark_registry is None:
+        return
+    os.makedirs(arguments.folder, exist_ok=True)
+    version = None
+    try:
+        while True:
+            try:
+                carpark_availability, timestamp = carpark.load_availability_snapshot(arguments.url,
+                                                                                    arguments.availability)
+            except (OSError, ValueError) as err:
+                print(carpark.describe_file_error(arguments.availability, err))
+                return
+            if carpark_availability and version is None:
+                version = publish_registry(arguments.folder, carpark_registry["Carpark Information"],
+                                           carpark_availability, timestamp)
+                print(f"Registry and availability version {version} were published to '{arguments.folder}', "
+                      f"{timestamp}")
+            elif carpark_availability:
+                version = publish_availability(arguments.folder, carpark_availability, timestamp)
+                print(f"Availability version {version} was published, {timestamp}")
+            if arguments.interval is None or arguments.availability:
+                break
+            time.sleep(arguments.interval)
+    except KeyboardInterrupt:
+        print("Publishing stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import sys
+import argparse
+
+import S10256965_Assignment_Advanced as carpark
+
+REJECTED_SAMPLE_SIZE = 5
+
+def read_rows(file_name, statistics):
+    """
+    Yields the valid rows of a carpark availability file lazily, so only one row is in memory at a time
+
+    Parameters:
+        file_name (str): The name of the carpark availability file, gzip compressed if it ends with '.gz'
+        statistics (dict): The "Timestamp" of the file, the number of "Invalid" rows and a "Rejected" sample
+                           of them are set in it while the file is read
+
+    Yields:
+        carpark (dict): The Carpark Number, Total Lots and Lots Available of a row
+    """
+    def reject(rejected_row):
+        statistics["Invalid"] += 1
+        if len(statistics["Rejected"]) < REJECTED_SAMPLE_SIZE:
+            statistics["Rejected"].append(rejected_row)
+
+    statistics.update({"Timestamp": "", "Invalid": 0, "Rejected": []})
+    with carpark.open_availability_file(file_name) as carpark_availability_file:
+        statistics["Timestamp"], headers = carpark.read_availability_headers(carpark_availability_file)
+        yield from carpark.iterate_availability_rows(carpark_availability_file, headers, reject)
+
+def filter_rows(rows, predicate):
+    #Yields the rows that the predicate is true for
+    for row in rows:
+        if predicate(row):
+            yield row
+
+def enrich_percentages(rows):
+    #Yields the rows with the Percentage of lots available
+    for row in rows:
+        row["Percentage"] = carpark.format_percentage(int(row["Total Lots"]), int(row["Lots Available"]))
+        yield row
+
+def enrich_addresses(rows, addresses):
+    #Yields the rows with the Address of their carpark number, looked up in addresses
+    for row in rows:
+        row["Address"] = addresses.get(row["Carpark Number"], "")
+        yield row
+
+def project_rows(rows, headers):
+    #Yields the values of the headers of each row
+    for row in rows:
+        yield [row[header] for header in headers]
+
+def count_rows(rows):
+    #Returns the number of rows, reading them without keeping them
+    return sum(1 for _ in rows)
+
+def build_pipeline(file_name, query, statistics, percentage=0.0, addresses=None):
+    """
+    Chain the stages of a streaming query, the equivalent of options 4 to 7 over a file of any size. Rows are
+    only enriched with the values the next stage needs, and addresses are only joined to rows that pass
+    the filter.
+
+    Parameters:
+        file_name (str): The name of the carpark availability file
+        query (str): "count", "without-lots" or "above"
+        statistics (dict): The statistics of reading the file, see read_rows
+        percentage (float): The percentage of lots available that an "above" row must be over
+        addresses (dict): The carpark numbers mapped to their addresses, joined to "above" rows if given
+
+    Returns:
+        headers (list): The headers of the projected rows, empty for "count"
+        pipeline (generator): The projected rows of the query, or every row for "count"
+    """
+    rows = read_rows(file_name, statistics)
+    if query == "count":
+        return [], rows
+    if query == "without-lots":
+        headers = ["Carpark Number"]
+        rows = filter_rows(rows, lambda row: int(row["Lots Available"]) == 0)
+        return headers, project_rows(rows, headers)
+
+    headers = ["Carpark Number", "Total Lots", "Lots Available", "Percentage"]
+    rows = filter_rows(enrich_percentages(rows), lambda row: float(row["Percentage"]) > percentage)
+    if addresses is not None:
+        headers.append("Address")
+        rows = enrich_addresses(rows, addresses)
+    return headers, project_rows(rows, headers)
+
+def load_addresses(file_name):
+    #Returns the carpark numbers mapped to their addresses in the carpark information file, None if it is not found
+    carpark_registry = carpark.load_carpark_registry(file_name)
+    if carpark_registry is None:
+        return None
+    return {information_carpark["Carpark Number"]: information_carpark["Address"]
+            for information_carpark in carpark_registry["Carpark Information"]}
+
+def parse_arguments():
+    #Returns the command line arguments of the streaming queries
+    parser = argparse.ArgumentParser(description="Options 4 to 7 streamed over availability files of any size")
+    parser.add_argument("query", choices=["count", "without-lots", "above"],
+                        help="count the carparks (4), carparks without lots (5) or above a percentage (6 & 7)")
+    parser.add_argument("file_name", help="the 'carpark-availability-vX.csv' file, or a '.csv.gz' file")
+    parser.add_argument("--percentage", type=float, default=0.0,
+                        help="the percentage of lots available for 'above' (default: %(default)s)")
+    parser.add_argument("--address", action="store_true", help="join the addresses for 'above' (option 7)")
+    parser.add_argument("--information", default="carpark-information-full.csv",
+                        help="the carpark information file the addresses are read from (default: %(default)s)")
+    return parser.parse_args()
+
+def display_pipeline(query, headers, pipeline):
+    #Prints the rows of a streaming query as they arrive, in the format of options 4 to 7
+    if query == "count":
+        print(f"Total Number of Carparks in the File: {count_rows(pipeline)}")
+        return
+    total_number = 0
+    spacing = [14, 10, 14, 10, 7][:len(headers)]
+    alignments = "<>>><"[:len(headers)]
+    if query == "above":
+        print(carpark.generate_line(headers, spacing, alignments))
+    for line_data in pipeline:
+        if query == "without-lots":
+            print(f"Carpark Number: {line_data[0]}")
+        else:
+            print(carpark.generate_line(line_data, spacing, alignments))
+        total_number += 1
+    print(f"Total Number: {total_number}")
+
+def main():
+    arguments = parse_arguments()
+    if not carpark.is_existing_file(arguments.file_name):
+        print(f"Invalid file name, '{arguments.file_name}' is not found.")
+        return
+    addresses = None
+    if arguments.address:
+        addresses = load_addresses(arguments.information)
+        if addresses is None:
+            return
+    statistics = {}
+    headers, pipeline = build_pipeline(arguments.file_name, arguments.query, statistics, arguments.percentage,
+                                       addresses)
+    try:
+        display_pipeline(arguments.query, headers, pipeline)
+    except BrokenPipeError:
+        sys.stderr.close()
+        return
+    except (OSError, ValueError) as err:
+        print(carpark.describe_file_error(arguments.file_name, err))
+        return
+
+    print(statistics["Timestamp"])
+    if statistics["Invalid"]:
+        print(f"{statistics['Invalid']} invalid rows were left out, such as:")
+        for rejected_row in statistics["Rejected"]:
+            print(f"  Line {rejected_row['Line']}: {rejected_row['Reason']}")
+
+if __name__ == "__main__":
+    main()
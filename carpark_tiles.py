@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+#Lee Jia Yu - S10256965 - CSF01 - P06
+
+import time
+import argparse
+
+import S10256965_Assignment_Advanced as carpark
+import carpark_coordinates as cpc
+
+#The width of the square tiles of each level in SVY21 metres, level 0 is the most zoomed out
+TILE_SIZES = [16000, 8000, 4000, 2000, 1000, 500, 250]
+
+def get_lots(availability_carpark):
+    #Returns the (Total Lots, Lots Available) of a carpark in a snapshot, None if it is missing or invalid
+    if not availability_carpark:
+        return None
+    try:
+        return int(availability_carpark["Total Lots"]), int(availability_carpark["Lots Available"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def build_tile_pyramid(carpark_information, carpark_availability, tile_sizes=TILE_SIZES):
+    """
+    Build the tile pyramid: every carpark with coordinates is placed in one tile of each level once, then the
+    lots of the snapshot are added to those tiles
+
+    Parameters:
+        carpark_information (list[dict]): The full list of carpark information
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+        tile_sizes (list[int]): The width of the tiles of each level in metres
+
+    Returns:
+        tile_pyramid (dict): The "Tile Sizes", the "Tiles" of each carpark, the "Lots" of each carpark in the
+        tiles and the "Levels" of tiles, each a dictionary of (column, row) to the carparks and lots in the tile
+    """
+    carpark_tiles = {}
+    for information_carpark in carpark_information:
+        try:
+            X, Y = float(information_carpark["X"]), float(information_carpark["Y"])
+        except (KeyError, ValueError):
+            continue
+        carpark_tiles[information_carpark["Carpark Number"]] = [(int(X // tile_size), int(Y // tile_size))
+                                                                for tile_size in tile_sizes]
+    tile_pyramid = {"Tile Sizes": list(tile_sizes),
+                    "Tiles": carpark_tiles,
+                    "Lots": {},
+                    "Levels": [{} for _ in tile_sizes]}
+    update_tile_pyramid(tile_pyramid, carpark_availability)
+    return tile_pyramid
+
+def update_tile_pyramid(tile_pyramid, carpark_availability):
+    """
+    Update the pyramid to a new snapshot. Only the carparks whose lots changed are applied, and each is applied
+    as a difference to its own tile on each level, so the other tiles are not touched.
+
+    Parameters:
+        tile_pyramid (dict): The tile pyramid built by build_tile_pyramid
+        carpark_availability (dict{dict}): Dictionary of carpark numbers to their Total Lots and Lots Available
+
+    Returns:
+        changed_tiles (int): The number of tiles that were updated
+    """
+    changed_tiles = set()
+    carpark_lots = tile_pyramid["Lots"]
+    for carpark_number, carpark_tiles in tile_pyramid["Tiles"].items():
+        new_lots = get_lots(carpark_availability.get(carpark_number))
+        old_lots = carpark_lots.get(carpark_number)
+        if new_lots == old_lots:
+            continue
+        for level, (tiles, tile) in enumerate(zip(tile_pyramid["Levels"], carpark_tiles)):
+            tile_lots = tiles.setdefault(tile, {"Carparks": 0, "Total Lots": 0, "Lots Available": 0})
+            if old_lots:
+                tile_lots["Carparks"] -= 1
+                tile_lots["Total Lots"] -= old_lots[0]
+                tile_lots["Lots Available"] -= old_lots[1]
+            if new_lots:
+                tile_lots["Carparks"] += 1
+                tile_lots["Total Lots"] += new_lots[0]
+                tile_lots["Lots Available"] += new_lots[1]
+            if tile_lots["Carparks"] == 0:
+                del tiles[tile]
+            changed_tiles.add((level, tile))
+        if new_lots:
+            carpark_lots[carpark_number] = new_lots
+        else:
+            del carpark_lots[carpark_number]
+    return len(changed_tiles)
+
+def query_tiles(tile_pyramid, level, bounding_box=None):
+    """
+    Returns the tiles of a level that overlap a bounding box, with their lots and occupancy
+
+    Parameters:
+        tile_pyramid (dict): The tile pyramid built by build_tile_pyramid
+        level (int): The level of the tiles, 0 is the most zoomed out
+        bounding_box (tuple): The (min X, min Y, max X, max Y) in SVY21 metres, every tile if None
+
+    Returns:
+        tiles (list[dict]): The Column, Row, bounds, Carparks, Total Lots, Lots Available and Occupancy of
+        each tile, sorted by row then column
+    """
+    tile_size = tile_pyramid["Tile Sizes"][level]
+    tiles = tile_pyramid["Levels"][level]
+    if bounding_box is None:
+        tile_keys = list(tiles)
+    else:
+        min_column, min_row = int(bounding_box[0] // tile_size), int(bounding_box[1] // tile_size)
+        max_column, max_row = int(bounding_box[2] // tile_size), int(bounding_box[3] // tile_size)
+        #Look up each tile in the box, or scan the level if the box has more tiles than the level
+        if (max_column - min_column + 1) * (max_row - min_row + 1) <= len(tiles):
+            tile_keys = [(column, row) for row in range(min_row, max_row + 1)
+                         for column in range(min_column, max_column + 1) if (column, row) in tiles]
+        else:
+            tile_keys = [(column, row) for column, row in tiles
+                         if min_column <= column <= max_column and min_row <= row <= max_row]
+
+    results = []
+    for column, row in sorted(tile_keys, key=lambda tile: (tile[1], tile[0])):
+        tile_lots = tiles[(column, row)]
+        total_lots = tile_lots["Total Lots"]
+        results.append({"Column": column,
+                        "Row": row,
+                        "Min X": column * tile_size,
+                        "Min Y": row * tile_size,
+                        "Max X": (column + 1) * tile_size,
+                        "Max Y": (row + 1) * tile_size,
+                        "Carparks": tile_lots["Carparks"],
+                        "Total Lots": total_lots,
+                        "Lots Available": tile_lots["Lots Available"],
+                        "Occupancy": (round((1 - tile_lots["Lots Available"] / total_lots) * 100, 1)
+                                      if total_lots else 0.0)})
+    return results
+
+def add_tile_centres(tiles):
+    #Returns the tiles with the Latitude and Longitude of their centres, converted together in one pass
+    latitudes, longitudes = cpc.convert_svy21_to_wgs84([(tile["Min X"] + tile["Max X"]) / 2 for tile in tiles],
+                                                       [(tile["Min Y"] + tile["Max Y"]) / 2 for tile in tiles])
+    for tile, latitude, longitude in zip(tiles, latitudes, longitudes):
+        tile["Latitude"] = round(latitude, 6)
+        tile["Longitude"] = round(longitude, 6)
+    return tiles
+
+def parse_bounding_box(text):
+    """
+    Returns the SVY21 bounding box of a latitude, longitude box such as '1.28,103.80,1.32,103.86'
+
+    Parameters:
+        text (str): The minimum latitude, minimum longitude, maximum latitude and maximum longitude
+
+    Returns:
+        bounding_box (tuple): The (min X, min Y, max X, max Y) in SVY21 metres
+    """
+    try:
+        min_latitude, min_longitude, max_latitude, max_longitude = [float(value) for value in text.split(",")]
+    except ValueError:
+        raise ValueError(f"Invalid bounding box '{text}', it should be like 1.28,103.80,1.32,103.86") from None
+    if min_latitude > max_latitude or min_longitude > max_longitude:
+        raise ValueError(f"Invalid bounding box '{text}', the minimums should come before the maximums")
+    #The corners are converted as the edges of the box are not exactly straight in SVY21
+    X_coordinates, Y_coordinates = cpc.convert_wgs84_to_svy21(
+        [min_latitude, min_latitude, max_latitude, max_latitude],
+        [min_longitude, max_longitude, min_longitude, max_longitude])
+    return min(X_coordinates), min(Y_coordinates), max(X_coordinates), max(Y_coordinates)
+
+def parse_level(text, tile_sizes=TILE_SIZES):
+    #Returns the level in text, raises ValueError if there is no such level
+    if not text.strip().isdigit() or int(text) >= len(tile_sizes):
+        raise ValueError(f"Invalid level '{text}', it should be 0 to {len(tile_sizes) - 1}")
+    return int(text)
+
+def parse_arguments():
+    #Returns the command line arguments of the tile pyramid
+    parser = argparse.ArgumentParser(description="Free lots and occupancy by map tile at several zoom levels")
+    parser.add_argument("availability", help="the 'carpark-availability-vX.csv' file the pyramid is built from")
+    parser.add_argument("--update", help="a newer availability file applied to the pyramid after it is built")
+    parser.add_argument("--information", default="carpark-information-full.csv",
+                        help="the full carpark information file (default: %(default)s)")
+    parser.add_argument("--level", default="3",
+                        help=f"the level from 0 ({TILE_SIZES[0]}m tiles) to {len(TILE_SIZES) - 1} "
+                             f"({TILE_SIZES[-1]}m tiles) (default: %(default)s)")
+    parser.add_argument("--bbox", default=None, help="the box 'min lat,min lon,max lat,max lon' (default: every tile)")
+    return parser.parse_args()
+
+def main():
+    arguments = parse_arguments()
+    try:
+        level = parse_level(arguments.level)
+        bounding_box = parse_bounding_box(arguments.bbox) if arguments.bbox else None
+    except ValueError as err:
+        print(err)
+        return
+    carpark_registry = carpark.load_carpark_registry(arguments.information)
+    if carpark_registry is None:
+        return
+    snapshots = []
+    for file_name in filter(None, [arguments.availability, arguments.update]):
+        try:
+            carpark_availability, _ = carpark.load_availability_snapshot(carpark.API_URL, file_name)
+        except (OSError, ValueError) as err:
+            print(carpark.describe_file_error(file_name, err))
+            return
+        snapshots.append(carpark_availability)
+
+    start = time.perf_counter()
+    tile_pyramid = build_tile_pyramid(carpark_registry["Carpark Information"], snapshots[0])
+    print(f"Built {sum(len(tiles) for tiles in tile_pyramid['Levels'])} tiles over {len(TILE_SIZES)} levels "
+          f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+    if arguments.update:
+        start = time.perf_counter()
+        changed_tiles = update_tile_pyramid(tile_pyramid, snapshots[1])
+        elapsed = time.perf_counter() - start
+        print(f"Updated {changed_tiles} tiles from '{arguments.update}' in {elapsed * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    tiles = add_tile_centres(query_tiles(tile_pyramid, level, bounding_box))
+    elapsed = time.perf_counter() - start
+
+    headers = ["Latitude", "Longitude", "Carparks", "Total Lots", "Lots Available", "Occupancy"]
+    spacing = [10, 10, 8, 10, 14, 9]
+    print(carpark.generate_line(headers, spacing, ">>>>>>"))
+    for tile in tiles:
+        print(carpark.generate_line([str(tile[header]) for header in headers], spacing, ">>>>>>"))
+    print(f"Total Number: {len(tiles)} tiles of {TILE_SIZES[level]}m, queried in {elapsed * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import io
+import dbm
+import gzip
+import shelve
+from contextlib import closing
+
+import pytest
+
+import S10256965_Assignment_Advanced as carpark
+
+HEADERS = ["Carpark Number", "Total Lots", "Lots Available"]
+
+def test_encode_categories_shares_one_string_per_value():
+    carpark_information = [{"Carpark Number": "HE12", "Carpark Type": "SURFACE CAR PARK"},
+                           {"Carpark Number": "ACB", "Carpark Type": "BASEMENT CAR PARK"},
+                           {"Carpark Number": "BM29", "Carpark Type": "".join(["SURFACE ", "CAR PARK"])}]
+    carpark_categories = carpark.encode_categories(carpark_information, ["Carpark Type"])
+    category = carpark_categories["Carpark Type"]
+    assert category["Values"] == ["SURFACE CAR PARK", "BASEMENT CAR PARK"]
+    assert category["Lookup"] == {"SURFACE CAR PARK": 0, "BASEMENT CAR PARK": 1}
+    assert list(category["Codes"]) == [0, 1, 0]
+    assert category["Codes"].typecode == "B"
+    assert carpark_information[2]["Carpark Type"] is carpark_information[0]["Carpark Type"]
+
+def test_select_carparks_by_category():
+    carpark_information = [{"Carpark Number": f"C{number}", "Carpark Type": "BASEMENT CAR PARK" if number % 3 == 0
+                            else "SURFACE CAR PARK", "Carpark Basement": "Y" if number % 3 == 0 else "N"}
+                           for number in range(10)]
+    carpark_categories = carpark.encode_categories(carpark_information, ["Carpark Type", "Carpark Basement"])
+    basement_carparks = carpark.select_carparks_by_category(carpark_information, carpark_categories, "Carpark Type",
+                                                            "BASEMENT CAR PARK")
+    assert [carpark_data["Carpark Number"] for carpark_data in basement_carparks] == ["C0", "C3", "C6", "C9"]
+    assert carpark.select_carparks_by_category(carpark_information, carpark_categories, "Carpark Basement",
+                                               "N") == [carpark_data for carpark_data in carpark_information
+                                                        if carpark_data["Carpark Basement"] == "N"]
+    assert carpark.select_carparks_by_category(carpark_information, carpark_categories, "Carpark Type",
+                                               "MULTI-STOREY CAR PARK") == []
+
+def test_select_carparks_by_category_with_more_than_256_values():
+    carpark_information = [{"Carpark Number": f"C{number}", "Address": f"BLK {number % 300}"} for number in range(600)]
+    carpark_categories = carpark.encode_categories(carpark_information, ["Address"])
+    assert carpark_categories["Address"]["Codes"].typecode == "H"
+    selected_carparks = carpark.select_carparks_by_category(carpark_information, carpark_categories, "Address",
+                                                            "BLK 299")
+    assert [carpark_data["Carpark Number"] for carpark_data in selected_carparks] == ["C299", "C599"]
+
+def test_diagnose_row():
+    assert carpark.diagnose_row(["HE12", "105"], HEADERS) == "Expected 3 fields, found 2"
+    assert carpark.diagnose_row([" ", "105", "41"], HEADERS) == "Missing Carpark Number"
+    assert carpark.diagnose_row(["HE12", "105", "-1"], HEADERS) == "Lots Available '-1' is not a whole number"
+    assert carpark.diagnose_row(["HE12", "1O5", "41"], HEADERS) == "Total Lots '1O5' is not a whole number"
+
+def test_iterate_availability_rows_leaves_out_invalid_rows():
+    carpark_availability_file = io.StringIO("Timestamp: 2023-06-19T11:10:27+08:00\n"
+                                            "Carpark Number,Total Lots,Lots Available\n"
+                                            "HE12,105,41\n"
+                                            "\n"
+                                            "ACB,0,0\n"
+                                            "BM29,97,x\n"
+                                            " Y49 , 207 , 12 \n")
+    timestamp, headers = carpark.read_availability_headers(carpark_availability_file)
+    rejected_rows = []
+    rows = list(carpark.iterate_availability_rows(carpark_availability_file, headers, rejected_rows.append))
+
+    assert timestamp == "Timestamp: 2023-06-19T11:10:27+08:00"
+    assert rows == [{"Carpark Number": "HE12", "Total Lots": "105", "Lots Available": "41"},
+                    {"Carpark Number": "Y49", "Total Lots": "207", "Lots Available": "12"}]
+    assert rejected_rows == [{"Line": 5, "Reason": "Total Lots is 0", "Row": "ACB,0,0"},
+                             {"Line": 6, "Reason": "Lots Available 'x' is not a whole number", "Row": "BM29,97,x"}]
+
+def test_iterate_availability_rows_is_lazy():
+    carpark_availability_file = io.StringIO("HE12,105,41\nACB,93,61\n")
+    rows = carpark.iterate_availability_rows(carpark_availability_file, HEADERS)
+    assert next(rows)["Carpark Number"] == "HE12"
+    assert carpark_availability_file.readline() == "ACB,93,61\n"
+
+def test_read_carpark_availability_reads_gzip_files(tmp_path):
+    file_path = tmp_path / "carpark-availability-v1.csv.gz"
+    with gzip.open(file_path, "wt") as carpark_availability_file:
+        carpark_availability_file.write("Timestamp: 2023-06-19T11:10:27+08:00\n"
+                                        "Carpark Number,Total Lots,Lots Available\n"
+                                        "HE12,105,41\n")
+    carpark_availability, timestamp = carpark.read_carpark_availability(str(file_path))
+    assert carpark_availability == [{"Carpark Number": "HE12", "Total Lots": "105", "Lots Available": "41"}]
+    assert timestamp == "Timestamp: 2023-06-19T11:10:27+08:00"
+
+def test_describe_file_error():
+    assert carpark.describe_file_error("v9.csv", FileNotFoundError(2, "No such file")) == (
+        "Invalid file name, 'v9.csv' is not found, make sure that it is within the same directory.")
+    assert carpark.describe_file_error("v9.csv", ValueError("should contain the Total Lots of each carpark")) == (
+        "Invalid file name, 'v9.csv' should contain the Total Lots of each carpark.")
+    assert carpark.describe_file_error("v9.csv", IsADirectoryError(21, "Is a directory")) == (
+        "Invalid file name, 'v9.csv' could not be read, Is a directory.")
+
+def test_migrate_shelf_favourites_copies_once(tmp_path):
+    shelf_file_name = str(tmp_path / "user_data")
+    with shelve.open(shelf_file_name) as user_data:
+        user_data["Favourite Carparks"] = ["HE12", "ACB"]
+        user_data["Favourite Thresholds"] = {"ACB": 5}
+
+    with closing(carpark.open_favourites_store(str(tmp_path / "favourites.db"))) as favourites_store:
+        assert carpark.migrate_shelf_favourites(favourites_store, shelf_file_name, "alice") == 2
+        assert carpark.get_favourite_carparks(favourites_store, "alice") == ["HE12", "ACB"]
+        assert carpark.get_favourite_thresholds(favourites_store, "alice") == {"ACB": 5}
+
+        assert carpark.migrate_shelf_favourites(favourites_store, shelf_file_name, "bob") == 0
+        assert carpark.get_favourite_carparks(favourites_store, "bob") == []
+
+def test_migrate_shelf_favourites_without_a_shelf(tmp_path):
+    with closing(carpark.open_favourites_store(str(tmp_path / "favourites.db"))) as favourites_store:
+        assert carpark.migrate_shelf_favourites(favourites_store, str(tmp_path / "missing"), "alice") == 0
+        assert carpark.get_favourite_carparks(favourites_store, "alice") == []
+
+def test_migrate_shelf_favourites_is_tried_again_after_a_failed_read(tmp_path):
+    shelf_file_name = str(tmp_path / "user_data")
+    (tmp_path / "user_data").write_text("not a shelf")
+    with closing(carpark.open_favourites_store(str(tmp_path / "favourites.db"))) as favourites_store:
+        with pytest.raises(dbm.error[0]):
+            carpark.migrate_shelf_favourites(favourites_store, shelf_file_name, "alice")
+
+        (tmp_path / "user_data").unlink()
+        with shelve.open(shelf_file_name) as user_data:
+            user_data["Favourite Carparks"] = ["HE12"]
+        assert carpark.migrate_shelf_favourites(favourites_store, shelf_file_name, "alice") == 1
+
+def test_get_user_name_without_a_login_name(monkeypatch):
+    def getuser():
+        raise OSError("No username set")
+    monkeypatch.delenv("CARPARK_USER", raising=False)
+    monkeypatch.setattr(carpark.getpass, "getuser", getuser)
+    assert carpark.get_user_name() == "default"
+    monkeypatch.setenv("CARPARK_USER", "alice")
+    assert carpark.get_user_name() == "alice"
+
+def test_threshold_crossings_need_a_previous_snapshot():
+    previous_states = {}
+    alerts = carpark.check_threshold_crossings({"HE12": {"Lots Available": "3"}}, {"HE12": 10}, previous_states)
+    assert alerts == []
+    assert previous_states == {"HE12": True}
+
+def test_threshold_crossings_alert_once_in_each_direction():
+    thresholds = {"HE12": 10, "ACB": 5}
+    previous_states = {}
+    carpark.check_threshold_crossings({"HE12": {"Lots Available": "12"}, "ACB": {"Lots Available": "7"}},
+                                      thresholds, previous_states)
+
+    alerts = carpark.check_threshold_crossings({"HE12": {"Lots Available": "9"}, "ACB": {"Lots Available": "6"}},
+                                               thresholds, previous_states)
+    assert alerts == [{"Carpark Number": "HE12", "Lots Available": 9, "Threshold": 10, "Direction": "below"}]
+
+    alerts = carpark.check_threshold_crossings({"HE12": {"Lots Available": "2"}}, thresholds, previous_states)
+    assert alerts == []
+
+    alerts = carpark.check_threshold_crossings({"HE12": {"Lots Available": "10"}}, thresholds, previous_states)
+    assert alerts == [{"Carpark Number": "HE12", "Lots Available": 10, "Threshold": 10, "Direction": "above"}]
+
+def test_threshold_crossings_skip_carparks_missing_from_the_snapshot():
+    previous_states = {"HE12": False}
+    assert carpark.check_threshold_crossings({}, {"HE12": 10}, previous_states) == []
+    assert previous_states == {"HE12": False}
@@ -0,0 +1,75 @@
+import gzip
+import random
+
+import pytest
+
+import carpark_archive as cpa
+
+def write_snapshot(file_name, timestamp, lots_available):
+    #Writes a snapshot of one carpark with 100 lots
+    open_file = gzip.open if file_name.endswith(".gz") else open
+    with open_file(file_name, "wt") as snapshot_file:
+        snapshot_file.write(f"Timestamp: {timestamp},,\nCarpark Number,Total Lots,Lots Available\n"
+                            f"HE12,100,{lots_available}\n")
+
+def test_rolling_statistics_do_not_depend_on_the_order_snapshots_are_added():
+    random.seed(3)
+    snapshots = [(day * 7 * 24 * 60 * 60.0, random.random()) for day in range(20)]
+    in_order = cpa.new_carpark_statistics()
+    shuffled = cpa.new_carpark_statistics()
+    for snapshot_time, fraction in snapshots:
+        cpa.add_occupancy(in_order, 5, snapshot_time, fraction)
+    random.shuffle(snapshots)
+    for snapshot_time, fraction in snapshots:
+        cpa.add_occupancy(shuffled, 5, snapshot_time, fraction)
+    for name in ("Count", "Weight", "Sum", "Peak", "Updated"):
+        assert in_order[name][5] == pytest.approx(shuffled[name][5])
+
+def test_older_snapshots_count_less():
+    carpark_statistics = cpa.new_carpark_statistics()
+    cpa.add_occupancy(carpark_statistics, 0, 0.0, 1.0)
+    cpa.add_occupancy(carpark_statistics, 0, float(cpa.HALF_LIFE_SECONDS), 0.0)
+    assert carpark_statistics["Weight"][0] == pytest.approx(1.5)
+    assert carpark_statistics["Sum"][0] / carpark_statistics["Weight"][0] == pytest.approx(1 / 3)
+    assert carpark_statistics["Peak"][0] == pytest.approx(0.5)
+
+def test_ingest_adds_each_snapshot_once(tmp_path):
+    archive_folder = tmp_path / "archive"
+    archive_folder.mkdir()
+    write_snapshot(str(archive_folder / "a.csv"), "2023-06-19T11:10:27+08:00", 40)
+    write_snapshot(str(archive_folder / "a.csv.gz"), "2023-06-19T11:10:27+08:00", 40)
+    write_snapshot(str(archive_folder / "b.csv"), "2023-06-26T11:05:00+08:00", 20)
+    (archive_folder / "broken.csv").write_text("not a snapshot\n")
+    table_file_name = str(tmp_path / "occupancy")
+
+    assert cpa.ingest_archive(str(archive_folder), table_file_name, workers=1) == (2, 1, 1)
+    assert cpa.ingest_archive(str(archive_folder), table_file_name, workers=1) == (0, 1, 0)
+
+    occupancy = cpa.query_occupancy(table_file_name, "HE12", 0, 11)
+    assert occupancy["Snapshots"] == 2
+    #The week older snapshot, 60% full, weighs less than the newer one, 80% full
+    decay = 0.5 ** ((cpa.parse_snapshot_timestamp("Timestamp: 2023-06-26T11:05:00+08:00")
+                     - cpa.parse_snapshot_timestamp("Timestamp: 2023-06-19T11:10:27+08:00")).total_seconds()
+                    / cpa.HALF_LIFE_SECONDS)
+    assert occupancy["Mean"] == pytest.approx((0.6 * decay + 0.8) / (decay + 1))
+    assert occupancy["Mean"] > 0.7
+    assert occupancy["Peak"] == pytest.approx(0.8)
+    assert cpa.query_occupancy(table_file_name, "ACB", 0, 11) is None
+
+@pytest.mark.parametrize("text, day", [("Friday", 4), ("fri", 4), (" THU ", 3), ("sunday", 6)])
+def test_parse_day(text, day):
+    assert cpa.parse_day(text) == day
+
+@pytest.mark.parametrize("text", ["thuxyz", "th", "fr", "frid", "", "someday"])
+def test_parse_day_rejects_other_names(text):
+    with pytest.raises(ValueError):
+        cpa.parse_day(text)
+
+@pytest.mark.parametrize("text, hour", [("0", 0), ("18", 18), ("6pm", 18), ("12am", 0), ("12pm", 12)])
+def test_parse_hour(text, hour):
+    assert cpa.parse_hour(text) == hour
+
+@pytest.mark.parametrize("text", ["24", "13pm", "0am", "six"])
+def test_parse_hour_rejects_other_hours(text):
+    with pytest.raises(ValueError):
+        cpa.parse_hour(text)
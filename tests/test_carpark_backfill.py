@@ -0,0 +1,63 @@
+import gzip
+import random
+import asyncio
+import argparse
+from datetime import datetime
+
+import pytest
+
+import carpark_backfill as cpb
+
+def make_payload(timestamp, lots_available):
+    #Returns an API payload with two carparks
+    return {"items": [{"timestamp": timestamp,
+                       "carpark_data": [{"carpark_number": "HE12",
+                                         "carpark_info": [{"total_lots": "105", "lots_available": str(lots_available)}]},
+                                        {"carpark_number": "ACB",
+                                         "carpark_info": [{"total_lots": "93", "lots_available": "61"}]}]}]}
+
+RECORDINGS = [(datetime(2023, 6, 19, 8, 0), make_payload("2023-06-19T08:00:12+08:00", 40)),
+              (datetime(2023, 6, 19, 9, 0), make_payload("2023-06-19T09:00:08+08:00", 10))]
+
+def test_parse_date_time_without_offset():
+    assert cpb.parse_date_time("2023-06-19T08:00:45") == datetime(2023, 6, 19, 8, 0)
+
+def test_parse_date_time_converts_offsets_to_singapore():
+    assert cpb.parse_date_time("2023-06-19T00:30Z") == datetime(2023, 6, 19, 8, 30)
+    assert cpb.parse_date_time("2023-06-19T08:30+08:00") == datetime(2023, 6, 19, 8, 30)
+    assert cpb.parse_date_time("2023-06-18T20:30-04:00") == datetime(2023, 6, 19, 8, 30)
+
+def test_parse_date_time_rejects_invalid_text():
+    with pytest.raises(argparse.ArgumentTypeError):
+        cpb.parse_date_time("19/06/2023 08:00")
+
+def test_select_recording_takes_latest_at_or_before():
+    assert cpb.select_recording(RECORDINGS, "2023-06-19T08:59:00") is RECORDINGS[0][1]
+    assert cpb.select_recording(RECORDINGS, "2023-06-19T01:00:00Z") is RECORDINGS[1][1]
+    assert cpb.select_recording(RECORDINGS, "") is RECORDINGS[1][1]
+
+async def run_offline_backfill(archive_folder, date_times, failure_rate):
+    #Runs a backfill against the fake API on a free port of this machine
+    server = await asyncio.start_server(lambda reader, writer: cpb.handle_fake_connection(reader, writer, RECORDINGS,
+                                                                                          failure_rate),
+                                        "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await cpb.backfill(f"http://127.0.0.1:{port}/v1/transport/carpark-availability", date_times,
+                                  str(archive_folder), workers=4, rate=200, retries=8, backoff=0.01)
+
+def test_backfill_offline_with_retries_and_resume(tmp_path):
+    random.seed(1)
+    date_times = cpb.generate_date_times(datetime(2023, 6, 19, 8, 0), datetime(2023, 6, 19, 9, 30), 30)
+    results = asyncio.run(run_offline_backfill(tmp_path, date_times, failure_rate=0.3))
+    assert results == {"Fetched": 4, "Resumed": 0, "Failed": []}
+
+    with gzip.open(cpb.get_archive_file_name(str(tmp_path), datetime(2023, 6, 19, 8, 30)), "rt") as snapshot_file:
+        assert snapshot_file.read().splitlines() == ["Timestamp: 2023-06-19T08:00:12+08:00",
+                                                     "Carpark Number,Total Lots,Lots Available",
+                                                     "HE12,105,40", "ACB,93,61"]
+    with gzip.open(cpb.get_archive_file_name(str(tmp_path), datetime(2023, 6, 19, 9, 30)), "rt") as snapshot_file:
+        assert snapshot_file.readline().strip() == "Timestamp: 2023-06-19T09:00:08+08:00"
+
+    results = asyncio.run(run_offline_backfill(tmp_path, date_times, failure_rate=0.0))
+    assert results == {"Fetched": 0, "Resumed": 4, "Failed": []}
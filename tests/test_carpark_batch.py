@@ -0,0 +1,27 @@
+import carpark_batch as cpbt
+import carpark_coordinates as cpc
+
+def test_coordinate_queries_apply_min_lots_before_the_limit():
+    #A row of 30 carparks east of the query point, every other one without available lots
+    X_coordinates, Y_coordinates = cpc.convert_wgs84_to_svy21([1.3521], [103.8198])
+    carpark_information = [{"Carpark Number": f"C{number}", "Address": f"BLK {number}", "Carpark Type": "",
+                            "Type of Parking System": "", "X": str(X_coordinates[0] + 10 * number),
+                            "Y": str(Y_coordinates[0])} for number in range(30)]
+    carpark_availability = {f"C{number}": {"Total Lots": "10", "Lots Available": str(number % 2)}
+                            for number in range(30)}
+    results = cpbt.run_batch(carpark_information, carpark_availability, ["1.3521, 103.8198", "BLK 2"], 12, 1, 1)
+    assert [carpark["Carpark Number"] for carpark in results[0]["Carparks"]] == [f"C{number}"
+                                                                                 for number in range(1, 24, 2)]
+    #An address is ranked from the centre of the carparks at it, BLK 2 and BLK 20 to BLK 29
+    assert sorted(carpark["Carpark Number"] for carpark in results[1]["Carparks"]) == ["C21", "C23", "C25", "C27",
+                                                                                       "C29"]
+
+def test_address_queries_are_corrected_with_the_fuzzy_index():
+    X_coordinates, Y_coordinates = cpc.convert_wgs84_to_svy21([1.3521], [103.8198])
+    carpark_information = [{"Carpark Number": f"C{number}", "Address": f"BLK {number} ALJUNIED AVENUE 2",
+                            "Carpark Type": "", "Type of Parking System": "", "X": str(X_coordinates[0] + 10 * number),
+                            "Y": str(Y_coordinates[0])} for number in range(3)]
+    carpark_availability = {f"C{number}": {"Total Lots": "10", "Lots Available": "5"} for number in range(3)}
+    results = cpbt.run_batch(carpark_information, carpark_availability, ["aljuneid avenue 2", "nowhere"], 12, 1, 1)
+    assert sorted(carpark["Carpark Number"] for carpark in results[0]["Carparks"]) == ["C0", "C1", "C2"]
+    assert results[1]["Carparks"] == []
@@ -0,0 +1,73 @@
+import carpark_cache as cpq
+
+def get(query_cache, query, sources, result):
+    #Returns the cached result of the query, result if it is computed
+    return cpq.get_cached_result(query_cache, query, (), sources, lambda: result)
+
+def test_results_are_kept_while_their_sources_are_unchanged():
+    query_cache = cpq.new_query_cache()
+    cpq.refresh_source(query_cache, cpq.API_SOURCE, "2023-06-19T11:10:27+08:00")
+    assert get(query_cache, "filter_table", (cpq.API_SOURCE,), 1) == 1
+    cpq.refresh_source(query_cache, cpq.API_SOURCE, "2023-06-19T11:10:27+08:00")
+    assert get(query_cache, "filter_table", (cpq.API_SOURCE,), 2) == 1
+    assert (query_cache["Hits"], query_cache["Misses"], query_cache["Invalidations"]) == (1, 1, 0)
+
+def test_the_first_version_of_a_source_is_adopted():
+    query_cache = cpq.new_query_cache()
+    get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), "nearest")
+    get(query_cache, "filter_table", (cpq.REGISTRY_SOURCE, cpq.API_SOURCE), "table")
+    cpq.refresh_source(query_cache, cpq.REGISTRY_SOURCE, "1")
+    assert get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), None) == "nearest"
+    assert get(query_cache, "filter_table", (cpq.REGISTRY_SOURCE, cpq.API_SOURCE), None) == "table"
+    assert len(query_cache["Entries"]) == 2
+    assert query_cache["Invalidations"] == 0
+
+def test_a_new_api_snapshot_only_drops_results_that_read_the_api():
+    query_cache = cpq.new_query_cache()
+    cpq.refresh_source(query_cache, cpq.API_SOURCE, "2023-06-19T11:05:27+08:00")
+    get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), "nearest")
+    get(query_cache, "above_percentage", (cpq.REGISTRY_SOURCE, cpq.FILE_SOURCE), "above")
+    get(query_cache, "filter_table", (cpq.REGISTRY_SOURCE, cpq.API_SOURCE), "table")
+
+    cpq.refresh_source(query_cache, cpq.API_SOURCE, "2023-06-19T11:10:27+08:00")
+    assert len(query_cache["Entries"]) == 2
+    assert get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), None) == "nearest"
+    assert get(query_cache, "above_percentage", (cpq.REGISTRY_SOURCE, cpq.FILE_SOURCE), None) == "above"
+    assert get(query_cache, "filter_table", (cpq.REGISTRY_SOURCE, cpq.API_SOURCE), "new table") == "new table"
+
+def test_loading_a_file_drops_the_file_results():
+    query_cache = cpq.new_query_cache()
+    get(query_cache, "at_location", (cpq.REGISTRY_SOURCE, cpq.FILE_SOURCE), "v1")
+    get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), "nearest")
+    cpq.invalidate_source(query_cache, cpq.FILE_SOURCE)
+    cpq.invalidate_source(query_cache, cpq.FILE_SOURCE)
+    assert get(query_cache, "at_location", (cpq.REGISTRY_SOURCE, cpq.FILE_SOURCE), "v2") == "v2"
+    assert get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), None) == "nearest"
+    #Reading the first file drops the results computed without one
+    assert query_cache["Invalidations"] == 2
+
+def test_a_new_registry_drops_every_result_that_reads_it():
+    query_cache = cpq.new_query_cache()
+    cpq.refresh_source(query_cache, cpq.REGISTRY_SOURCE, "1")
+    get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), "old")
+    get(query_cache, "filter_table", (cpq.REGISTRY_SOURCE, cpq.API_SOURCE), "old")
+    cpq.refresh_source(query_cache, cpq.REGISTRY_SOURCE, "2")
+    assert len(query_cache["Entries"]) == 0
+    assert get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), "new") == "new"
+
+def test_least_recently_used_result_is_evicted():
+    query_cache = cpq.new_query_cache(2)
+    for location in ("a", "b"):
+        cpq.get_cached_result(query_cache, "at_location", (location,), (cpq.FILE_SOURCE,), lambda: location)
+    cpq.get_cached_result(query_cache, "at_location", ("a",), (cpq.FILE_SOURCE,), lambda: None)
+    cpq.get_cached_result(query_cache, "at_location", ("c",), (cpq.FILE_SOURCE,), lambda: "c")
+    assert [key[1] for key in query_cache["Entries"]] == [("a",), ("c",)]
+    assert query_cache["Evictions"] == 1
+
+def test_results_are_computed_without_a_cache_or_with_size_0():
+    assert get(None, "nearest", (cpq.REGISTRY_SOURCE,), 1) == 1
+    cpq.refresh_source(None, cpq.API_SOURCE, "t")
+    query_cache = cpq.new_query_cache(0)
+    get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), 1)
+    assert get(query_cache, "nearest", (cpq.REGISTRY_SOURCE,), 2) == 2
+    assert len(query_cache["Entries"]) == 0
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import carpark_coordinates as cpc
+
+def test_origin_converts_to_the_false_easting_and_northing():
+    X_coordinates, Y_coordinates = cpc.convert_wgs84_to_svy21([cpc.ORIGIN_LATITUDE], [cpc.ORIGIN_LONGITUDE])
+    assert X_coordinates[0] == pytest.approx(cpc.ORIGIN_EASTING, abs=1e-6)
+    assert Y_coordinates[0] == pytest.approx(cpc.ORIGIN_NORTHING, abs=1e-6)
+
+def test_svy21_round_trip_across_singapore():
+    random.seed(0)
+    X_coordinates = [random.uniform(2000, 50000) for _ in range(200)]
+    Y_coordinates = [random.uniform(20000, 50000) for _ in range(200)]
+    latitudes, longitudes = cpc.convert_svy21_to_wgs84(X_coordinates, Y_coordinates)
+    round_trip_X, round_trip_Y = cpc.convert_wgs84_to_svy21(latitudes, longitudes)
+    assert round_trip_X == pytest.approx(X_coordinates, abs=1e-3)
+    assert round_trip_Y == pytest.approx(Y_coordinates, abs=1e-3)
+
+def test_known_carpark_converts_to_its_neighbourhood():
+    #HE12, BLK 78/81 REDHILL LANE, within about 200m
+    latitudes, longitudes = cpc.convert_svy21_to_wgs84([26367.5806], [30069.2434])
+    assert latitudes[0] == pytest.approx(1.288, abs=2e-3)
+    assert longitudes[0] == pytest.approx(103.8185, abs=2e-3)
+
+def test_parse_latitude_longitude_only_accepts_singapore():
+    assert cpc.parse_latitude_longitude("1.3521, 103.8198") == (1.3521, 103.8198)
+    assert cpc.parse_latitude_longitude("1.3521 103.8198") == (1.3521, 103.8198)
+    assert cpc.parse_latitude_longitude("12 34") is None
+    assert cpc.parse_latitude_longitude("51.5, -0.12") is None
+    assert cpc.parse_latitude_longitude("BLK 270/271") is None
+
+def test_carpark_coordinates_are_cached_per_registry_version(tmp_path):
+    file_name = tmp_path / "carpark-information-full.csv"
+    file_name.write_text("Carpark Number,X,Y\nHE12,26367.5806,30069.2434\n")
+    carpark_registry = {"File Name": str(file_name),
+                        "Version": cpc.get_registry_version(str(file_name)),
+                        "Carpark Information": [{"Carpark Number": "HE12", "X": "26367.5806", "Y": "30069.2434"},
+                                                {"Carpark Number": "NOXY", "X": "", "Y": ""}]}
+    carpark_coordinates = cpc.get_carpark_coordinates(carpark_registry)
+    assert list(carpark_coordinates) == ["HE12"]
+    assert (tmp_path / "carpark-information-full.wgs84.json").exists()
+
+    #A new registry of the same version is read from the cache file without converting its carparks
+    cached_registry = dict(carpark_registry, **{"Carpark Information": []})
+    del cached_registry["Carpark Coordinates"]
+    assert cpc.get_carpark_coordinates(cached_registry) == carpark_coordinates
+
+    changed_registry = dict(cached_registry, Version="changed")
+    del changed_registry["Carpark Coordinates"]
+    assert cpc.get_carpark_coordinates(changed_registry) == {}
@@ -0,0 +1,61 @@
+import random
+
+import carpark_database as cpdb
+
+def open_database(tmp_path, count):
+    #Returns a database of count carparks spread over Singapore, and one without coordinates
+    random.seed(4)
+    information_file_name = tmp_path / "carpark-information-full.csv"
+    lines = ["Carpark Number,Address,X,Y"]
+    lines += [f"C{number},BLK {number},{random.uniform(2000, 50000):.4f},{random.uniform(20000, 50000):.4f}"
+              for number in range(count)]
+    lines.append("NOXY,BLK NOXY,,")
+    information_file_name.write_text("\n".join(lines) + "\n")
+    return cpdb.open_carpark_database(str(tmp_path / "carpark.db"), str(information_file_name))
+
+def test_near_point_box_gives_the_same_carparks_as_a_full_scan(tmp_path):
+    carpark_database = open_database(tmp_path, 300)
+    for _ in range(50):
+        X, Y = random.uniform(-10000, 60000), random.uniform(10000, 60000)
+        limit = random.choice([1, 10, 50, 400])
+        nearest_carparks = cpdb.query_carparks_near_point(carpark_database, X, Y, limit)
+        every_carpark = cpdb.query_carparks_near_point(carpark_database, X, Y, -1)
+        assert len(every_carpark) == 300
+        assert nearest_carparks == every_carpark[:limit]
+    carpark_database.close()
+
+def test_most_lots_of_an_empty_snapshot(tmp_path):
+    carpark_database = open_database(tmp_path, 1)
+    snapshot_id = cpdb.insert_availability_snapshot(carpark_database, "Timestamp: 2023-06-19T11:10:27+08:00", "file", [])
+    assert cpdb.query_carpark_with_most_lots(carpark_database, snapshot_id) == []
+    carpark_database.close()
+
+def test_missing_information_file_keeps_the_loaded_carparks(tmp_path, capsys):
+    open_database(tmp_path, 5).close()
+    carpark_database = cpdb.open_carpark_database(str(tmp_path / "carpark.db"), str(tmp_path / "missing.csv"))
+    assert "is not found" in capsys.readouterr().out
+    assert cpdb.count_carpark_information(carpark_database) == 6
+    carpark_database.close()
+
+def test_reading_the_same_snapshot_again_reuses_it(tmp_path):
+    carpark_database = open_database(tmp_path, 1)
+    carpark_availability = [{"Carpark Number": "C0", "Total Lots": "10", "Lots Available": "4", "Percentage": "40.0"}]
+    snapshot_id = cpdb.insert_availability_snapshot(carpark_database, "Timestamp: 1", "file", carpark_availability)
+    assert cpdb.insert_availability_snapshot(carpark_database, "Timestamp: 1", "file", carpark_availability) == snapshot_id
+    assert cpdb.count_carpark_availability(carpark_database, snapshot_id) == 1
+    assert cpdb.insert_availability_snapshot(carpark_database, "Timestamp: 2", "file", carpark_availability) != snapshot_id
+    carpark_database.close()
+
+def test_only_the_newest_snapshots_are_kept(tmp_path):
+    carpark_database = open_database(tmp_path, 1)
+    carpark_availability = [{"Carpark Number": "C0", "Total Lots": "10", "Lots Available": "4", "Percentage": "40.0"}]
+    snapshot_ids = [cpdb.insert_availability_snapshot(carpark_database, f"Timestamp: {number}", "file",
+                                                      carpark_availability)
+                    for number in range(cpdb.KEPT_SNAPSHOTS + 3)]
+    kept_snapshot_ids = [int(row["snapshot_id"]) for row in carpark_database.execute(
+        "SELECT snapshot_id FROM snapshots ORDER BY snapshot_id")]
+    assert kept_snapshot_ids == snapshot_ids[-cpdb.KEPT_SNAPSHOTS:]
+    availability_rows = carpark_database.execute('SELECT COUNT(*) AS "Count" FROM carpark_availability').fetchone()
+    assert int(availability_rows["Count"]) == cpdb.KEPT_SNAPSHOTS
+    assert cpdb.get_latest_snapshot(carpark_database) == (snapshot_ids[-1], f"Timestamp: {cpdb.KEPT_SNAPSHOTS + 2}")
+    carpark_database.close()
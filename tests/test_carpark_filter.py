@@ -0,0 +1,64 @@
+import pytest
+
+import carpark_filter as cpf
+
+CARPARK_INFORMATION = [{"Carpark Number": "HE12", "Address": "BLK 78/81 REDHILL LANE", "Gantry Height": "2.15",
+                        "Night Parking": "YES", "Carpark Deck": "0"},
+                       {"Carpark Number": "ACB", "Address": "BLK 270/271 ALBERT CENTRE BASEMENT CAR PARK",
+                        "Gantry Height": "1.80", "Night Parking": "YES", "Carpark Deck": "1"},
+                       {"Carpark Number": "BM29", "Address": "BLK 29 BENDEMEER ROAD", "Gantry Height": "2.10",
+                        "Night Parking": "no", "Carpark Deck": "5"},
+                       {"Carpark Number": "Y49", "Address": "BLK 49 YISHUN", "Gantry Height": "",
+                        "Night Parking": "YES", "Carpark Deck": "3"},
+                       {"Carpark Number": "TP39", "Address": "BLK 28 TOA PAYOH EAST", "Gantry Height": "4.50",
+                        "Night Parking": "YES", "Carpark Deck": "2"}]
+CARPARK_AVAILABILITY = {"HE12": {"Total Lots": "105", "Lots Available": "41"},
+                        "ACB": {"Total Lots": "100", "Lots Available": "80"},
+                        "BM29": {"Total Lots": "97", "Lots Available": "0"},
+                        "Y49": {"Total Lots": "200", "Lots Available": "150"}}
+
+@pytest.fixture
+def filter_table():
+    return cpf.build_filter_table(CARPARK_INFORMATION, CARPARK_AVAILABILITY)
+
+def find_carpark_numbers(filter_table, expression):
+    clauses = cpf.parse_filter(expression, list(filter_table["Columns"]))
+    return [carpark_data["Carpark Number"]
+            for carpark_data, _ in cpf.run_filter(filter_table, cpf.compile_filter(filter_table, clauses))]
+
+def test_build_filter_table_leaves_out_carparks_without_availability(filter_table):
+    assert [carpark_data["Carpark Number"] for carpark_data in filter_table["Rows"]] == ["HE12", "ACB", "BM29", "Y49"]
+    assert filter_table["Columns"]["Percentage"] == [39.0, 80.0, 0.0, 75.0]
+    assert filter_table["Columns"]["Gantry Height"] == [2.15, 1.8, 2.1, None]
+    assert filter_table["Indexes"]["Night Parking"] == {"YES": [0, 1, 3], "NO": [2]}
+
+def test_parse_filter():
+    headers = ["Carpark Number", "Address", "Gantry Height", "Night Parking", "Percentage"]
+    assert cpf.parse_filter('gantry height >= 2.1 AND night parking = yes and Address ~ "BLK 2 and 3" and '
+                            "Percentage > 30%", headers) == [("Gantry Height", ">=", 2.1),
+                                                             ("Night Parking", "=", "YES"),
+                                                             ("Address", "~", "BLK 2 AND 3"),
+                                                             ("Percentage", ">", 30.0)]
+
+@pytest.mark.parametrize("expression", ["Gantry Height", "Height > 2", "Gantry Height > high",
+                                        "Gantry Height ~ 2", "Night Parking > YES"])
+def test_parse_filter_rejects_invalid_clauses(expression):
+    with pytest.raises(ValueError):
+        cpf.parse_filter(expression, ["Gantry Height", "Night Parking"])
+
+def test_compile_filter_orders_clauses_by_selectivity(filter_table):
+    compiled_clauses = cpf.compile_filter(filter_table, [("Night Parking", "=", "YES"), ("Carpark Deck", ">", 4.0),
+                                                         ("Address", "~", "BLK")])
+    assert [compiled_clause["Count"] for compiled_clause in compiled_clauses] == [1, 3, 4]
+    assert compiled_clauses[0]["Select"]() == [2]
+
+@pytest.mark.parametrize("expression, carpark_numbers", [("Gantry Height >= 2.1", ["HE12", "BM29"]),
+                                                         ("Gantry Height != 2.1", ["HE12", "ACB"]),
+                                                         ("Gantry Height >= 2.1 and Night Parking = YES", ["HE12"]),
+                                                         ("Night Parking != YES", ["BM29"]),
+                                                         ("Address ~ blk 2 and Percentage >= 0", ["ACB", "BM29"]),
+                                                         ("Percentage > 50 and Carpark Deck <= 3", ["ACB", "Y49"]),
+                                                         ("Lots Available = 0", ["BM29"]),
+                                                         ("Carpark Deck < 0", [])])
+def test_run_filter(filter_table, expression, carpark_numbers):
+    assert find_carpark_numbers(filter_table, expression) == carpark_numbers
@@ -0,0 +1,26 @@
+import carpark_fuzzy as cpz
+
+ADDRESSES = ["BLK 270/271 ALBERT CENTRE BASEMENT CAR PARK", "BLK 15-18 HOUGANG AVENUE 3", "BLK 78/81 REDHILL LANE"]
+
+def test_correct_query_keeps_the_separators():
+    fuzzy_index = cpz.build_fuzzy_index(ADDRESSES)
+    assert cpz.correct_query(fuzzy_index, "blk 270/271 albrt centre") == "BLK 270/271 ALBERT CENTRE"
+    assert cpz.correct_query(fuzzy_index, " hougnag avenue 3 ") == "HOUGANG AVENUE 3"
+
+def test_correct_query_without_a_correction():
+    fuzzy_index = cpz.build_fuzzy_index(ADDRESSES)
+    assert cpz.correct_query(fuzzy_index, "BLK 270/271") is None
+    assert cpz.correct_query(fuzzy_index, "albert zzzzzz") is None
+
+def test_search_addresses_allows_typos():
+    fuzzy_index = cpz.build_fuzzy_index(ADDRESSES)
+    assert cpz.search_addresses(fuzzy_index, "redhil lane")[0] == "BLK 78/81 REDHILL LANE"
+
+def test_correct_query_uses_the_form_of_abbreviations_in_the_addresses():
+    fuzzy_index = cpz.build_fuzzy_index(ADDRESSES + ["BLK 118 ALJUNIED AVENUE 2", "BLK 2 BEDOK NORTH STREET 3",
+                                                     "BLK 9 JOO SENG RD"])
+    assert cpz.correct_query(fuzzy_index, "aljuneid ave 2") == "ALJUNIED AVENUE 2"
+    assert cpz.correct_query(fuzzy_index, "aljunied ave 2") == "ALJUNIED AVENUE 2"
+    assert cpz.correct_query(fuzzy_index, "bedok nth st 3") == "BEDOK NORTH STREET 3"
+    assert cpz.correct_query(fuzzy_index, "joo seng road") == "JOO SENG RD"
+    assert cpz.correct_query(fuzzy_index, "aljunied avenue 2") is None
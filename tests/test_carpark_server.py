@@ -0,0 +1,78 @@
+import asyncio
+import os
+
+import pytest
+
+import carpark_loadtest as cplt
+import carpark_server as cps
+
+REPOSITORY_FOLDER_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    dataset = cps.load_dataset(os.path.join(REPOSITORY_FOLDER_PATH, "carpark-information-full.csv"),
+                               os.path.join(REPOSITORY_FOLDER_PATH, "carpark-availability-v2.csv"),
+                               str(tmp_path_factory.mktemp("user") / "favourites.db"))
+    yield dataset
+    dataset["Favourites Store"].close()
+
+def test_count_route(dataset):
+    status, body = cps.handle_request(dataset, "GET", "/count")
+    assert status == 200
+    assert body["Carpark Information"] == len(dataset["Carpark Information"])
+    assert body["Carpark Availability"] == len(dataset["Carpark Availability"])
+    assert body["Timestamp"].startswith("Timestamp: ")
+
+def test_unknown_routes_methods_and_parameters(dataset):
+    assert cps.handle_request(dataset, "GET", "/missing")[0] == 404
+    assert cps.handle_request(dataset, "POST", "/count")[0] == 405
+    assert cps.handle_request(dataset, "GET", "/threshold")[0] == 400
+    assert cps.handle_request(dataset, "GET", "/threshold?percentage=101")[0] == 400
+    assert cps.handle_request(dataset, "GET", "/tiles?level=99")[0] == 400
+    assert cps.handle_request(dataset, "GET", "/nearest?lat=abc&lon=103.8")[0] == 400
+
+def test_threshold_route_only_returns_carparks_above_the_percentage(dataset):
+    status, body = cps.handle_request(dataset, "GET", "/threshold?percentage=90")
+    assert status == 200
+    assert body["Total Number"] == len(body["Carparks"]) > 0
+    assert all(float(carpark_data["Percentage"]) > 90 for carpark_data in body["Carparks"])
+
+def test_nearest_route_corrects_typos(dataset):
+    status, body = cps.handle_request(dataset, "GET", "/nearest?address=aljuneid")
+    assert status == 200
+    assert body["Corrected"] == "ALJUNIED"
+    assert body["Total Number"] > 0
+    assert all("ALJUNIED" in carpark_data["Address"] for carpark_data in body["Carparks"])
+
+def test_nearest_route_by_latitude_longitude(dataset):
+    status, body = cps.handle_request(dataset, "GET", "/nearest?lat=1.3016&lon=103.8126")
+    assert status == 200
+    assert 0 < body["Total Number"] <= cps.carpark.NEAREST_CARPARKS_LIMIT
+    assert body["Carparks"][0]["Latitude"] is not None
+
+def test_favourites_route_of_a_new_user(dataset):
+    assert cps.handle_request(dataset, "GET", "/favourites?user=nobody") == (200, {"User": "nobody",
+                                                                                  "Total Number": 0,
+                                                                                  "Carparks": []})
+
+def test_calculate_percentile():
+    latencies = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    assert cplt.calculate_percentile(latencies, 50) == 0.5
+    assert cplt.calculate_percentile(latencies, 99) == 1.0
+    assert cplt.calculate_percentile(latencies, 0) == 0.1
+    assert cplt.calculate_percentile([], 50) == 0.0
+
+def test_load_test_against_the_server(dataset):
+    async def run():
+        server = await asyncio.start_server(lambda reader, writer: cps.handle_connection(reader, writer, dataset),
+                                            "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await cplt.run_load_test("127.0.0.1", port, ["/count", "/most-lots", "/missing"], 3, 10)
+
+    results = asyncio.run(run())
+    #The requests are spread 4, 3, 3 over the connections, each cycling through the paths from the first
+    assert results["Requests"] == 10
+    assert results["Errors"] == 3
+    assert results["Error Messages"] == ["/missing: HTTP 404"] * 3
+    assert 0 < results["p50"] <= results["p99"] <= results["Max"]
@@ -0,0 +1,50 @@
+import carpark_shared as cpsh
+
+CARPARK_INFORMATION = [{"Carpark Number": "HE12", "Address": "BLK 78/81 REDHILL LANE", "Carpark Type": "SURFACE CAR PARK",
+                        "Type of Parking System": "ELECTRONIC PARKING", "X": "26367.5806", "Y": "30069.2434"},
+                       {"Carpark Number": "ACB", "Address": "BLK 270/271 ALBERT CENTRE BASEMENT CAR PARK",
+                        "Carpark Type": "BASEMENT CAR PARK", "Type of Parking System": "ELECTRONIC PARKING",
+                        "X": "30314.7936", "Y": "31490.4942"}]
+
+def test_publish_registry_swaps_in_the_registry_with_its_availability(tmp_path):
+    folder = str(tmp_path)
+    version = cpsh.publish_registry(folder, CARPARK_INFORMATION, {"HE12": {"Total Lots": "105", "Lots Available": "41"}},
+                                    "Timestamp: 2023-06-19T11:10:27+08:00")
+    pointer = cpsh.read_pointer(folder)
+    assert pointer["Version"] == version == 1
+    assert pointer["Availability"] == "availability-1.bin"
+
+    shared_dataset = cpsh.attach_shared_dataset(folder)
+    try:
+        assert shared_dataset["Timestamp"] == "Timestamp: 2023-06-19T11:10:27+08:00"
+        #The registry is sorted by carpark number so it can be searched in place
+        assert cpsh.find_carpark_index(shared_dataset, "ACB") == 0
+        assert cpsh.find_carpark_index(shared_dataset, "BM29") is None
+        he12 = cpsh.get_shared_carpark(shared_dataset, cpsh.find_carpark_index(shared_dataset, "HE12"))
+        assert he12["Address"] == "BLK 78/81 REDHILL LANE"
+        assert he12["X"] == 26367.5806
+        assert (he12["Total Lots"], he12["Lots Available"]) == (105, 41)
+        #A carpark missing from the snapshot has unknown lots
+        acb = cpsh.get_shared_carpark(shared_dataset, 0)
+        assert (acb["Total Lots"], acb["Lots Available"]) == (None, None)
+    finally:
+        cpsh.close_shared_dataset(shared_dataset)
+
+def test_refresh_moves_to_a_newer_availability(tmp_path):
+    folder = str(tmp_path)
+    cpsh.publish_registry(folder, CARPARK_INFORMATION, {}, "Timestamp: 1")
+    shared_dataset = cpsh.attach_shared_dataset(folder)
+    assert cpsh.refresh_shared_dataset(shared_dataset, folder) is shared_dataset
+
+    for lots_available in range(3):
+        version = cpsh.publish_availability(folder, {"ACB": {"Total Lots": "10", "Lots Available": str(lots_available)}},
+                                            f"Timestamp: {lots_available + 2}")
+    shared_dataset = cpsh.refresh_shared_dataset(shared_dataset, folder)
+    try:
+        assert shared_dataset["Version"] == version == 4
+        assert cpsh.get_shared_carpark(shared_dataset, 0)["Lots Available"] == 2
+    finally:
+        cpsh.close_shared_dataset(shared_dataset)
+    #Only the newest availability files are kept
+    assert sorted(path.name for path in tmp_path.glob("availability-*.bin")) == ["availability-3.bin",
+                                                                                  "availability-4.bin"]
@@ -0,0 +1,49 @@
+import gzip
+
+import pytest
+
+import carpark_stream as cpst
+
+AVAILABILITY_TEXT = ("Timestamp: 2023-06-19T11:10:27+08:00\n"
+                     "Carpark Number,Total Lots,Lots Available\n"
+                     "HE12,105,41\n"
+                     "ACB,0,0\n"
+                     "BM29,97,0\n"
+                     "Y49,200,150\n")
+
+def write_availability_file(tmp_path, file_name="carpark-availability-v1.csv"):
+    file_path = tmp_path / file_name
+    if file_name.endswith(".gz"):
+        with gzip.open(file_path, "wt") as availability_file:
+            availability_file.write(AVAILABILITY_TEXT)
+    else:
+        file_path.write_text(AVAILABILITY_TEXT)
+    return str(file_path)
+
+def test_count_pipeline_reads_gzip_files(tmp_path):
+    statistics = {}
+    headers, pipeline = cpst.build_pipeline(write_availability_file(tmp_path, "carpark-availability-v1.csv.gz"),
+                                            "count", statistics)
+    assert headers == []
+    assert cpst.count_rows(pipeline) == 3
+    assert statistics["Timestamp"] == "Timestamp: 2023-06-19T11:10:27+08:00"
+    assert statistics["Invalid"] == 1
+    assert statistics["Rejected"] == [{"Line": 4, "Reason": "Total Lots is 0", "Row": "ACB,0,0"}]
+
+def test_without_lots_pipeline(tmp_path):
+    headers, pipeline = cpst.build_pipeline(write_availability_file(tmp_path), "without-lots", {})
+    assert headers == ["Carpark Number"]
+    assert list(pipeline) == [["BM29"]]
+
+def test_above_pipeline_joins_addresses_to_the_filtered_rows(tmp_path):
+    headers, pipeline = cpst.build_pipeline(write_availability_file(tmp_path), "above", {}, 40.0,
+                                            {"Y49": "BLK 49 YISHUN"})
+    assert headers == ["Carpark Number", "Total Lots", "Lots Available", "Percentage", "Address"]
+    assert list(pipeline) == [["Y49", "200", "150", "75.0", "BLK 49 YISHUN"]]
+
+def test_pipeline_reads_nothing_until_it_is_consumed(tmp_path):
+    statistics = {}
+    _, pipeline = cpst.build_pipeline(str(tmp_path / "missing.csv"), "above", statistics)
+    assert statistics == {}
+    with pytest.raises(FileNotFoundError):
+        next(pipeline)
@@ -0,0 +1,52 @@
+import random
+
+import carpark_tiles as cpt
+
+def make_registry(count):
+    #Returns count carparks spread over Singapore, and one without coordinates
+    random.seed(2)
+    carpark_information = [{"Carpark Number": f"C{number}", "X": str(random.uniform(2000, 50000)),
+                            "Y": str(random.uniform(20000, 50000))} for number in range(count)]
+    carpark_information.append({"Carpark Number": "NOXY", "X": "", "Y": ""})
+    return carpark_information
+
+def make_availability(carpark_information, fraction):
+    #Returns a snapshot of a fraction of the carparks with random lots
+    carpark_availability = {}
+    for information_carpark in carpark_information:
+        if random.random() < fraction:
+            total_lots = random.randint(1, 500)
+            carpark_availability[information_carpark["Carpark Number"]] = {
+                "Total Lots": str(total_lots), "Lots Available": str(random.randint(0, total_lots))}
+    return carpark_availability
+
+def test_update_gives_the_same_pyramid_as_a_rebuild():
+    carpark_information = make_registry(500)
+    tile_pyramid = cpt.build_tile_pyramid(carpark_information, make_availability(carpark_information, 0.9))
+    for _ in range(5):
+        carpark_availability = make_availability(carpark_information, 0.8)
+        cpt.update_tile_pyramid(tile_pyramid, carpark_availability)
+        rebuilt_pyramid = cpt.build_tile_pyramid(carpark_information, carpark_availability)
+        assert tile_pyramid["Lots"] == rebuilt_pyramid["Lots"]
+        assert tile_pyramid["Levels"] == rebuilt_pyramid["Levels"]
+
+def test_update_only_touches_the_changed_tiles():
+    carpark_information = make_registry(50)
+    carpark_availability = make_availability(carpark_information, 1.0)
+    tile_pyramid = cpt.build_tile_pyramid(carpark_information, carpark_availability)
+    assert cpt.update_tile_pyramid(tile_pyramid, carpark_availability) == 0
+
+    changed_availability = dict(carpark_availability, C0={"Total Lots": "600", "Lots Available": "600"})
+    assert cpt.update_tile_pyramid(tile_pyramid, changed_availability) == len(cpt.TILE_SIZES)
+
+def test_query_tiles_in_a_bounding_box():
+    carpark_information = [{"Carpark Number": "A", "X": "1500", "Y": "1500"},
+                           {"Carpark Number": "B", "X": "1600", "Y": "1900"},
+                           {"Carpark Number": "C", "X": "9500", "Y": "1500"}]
+    carpark_availability = {"A": {"Total Lots": "100", "Lots Available": "25"},
+                            "B": {"Total Lots": "100", "Lots Available": "75"},
+                            "C": {"Total Lots": "10", "Lots Available": "x"}}
+    tile_pyramid = cpt.build_tile_pyramid(carpark_information, carpark_availability, [1000])
+    tiles = cpt.query_tiles(tile_pyramid, 0, (0, 0, 2999, 2999))
+    assert [(tile["Column"], tile["Row"], tile["Carparks"], tile["Occupancy"]) for tile in tiles] == [(1, 1, 2, 50.0)]
+    assert cpt.query_tiles(tile_pyramid, 0, (9000, 1000, 9999, 1999)) == []